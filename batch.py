@@ -0,0 +1,94 @@
+"""
+Batch tile generation.
+
+Builds the cross product of dictionary words, pattern names, HSV settings and
+seeds and generates every combination on a process pool. Each worker receives
+the pattern registry once when it starts, so tasks only carry the
+(word, pattern, hue, sat, val, seed) parameters plus the tile size and send
+back raw RGB bytes.
+Seeded tiles are byte-for-byte identical whether they come from a worker or
+from a serial run.
+
+On platforms that spawn workers (macOS, Windows) call generate_tiles from
+under an `if __name__ == "__main__":` guard.
+"""
+
+import itertools
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+import patterns
+from generator import TILE_COLOR_DICTIONARY, generate_tile_for_word
+
+def tile_grid(words=None, pattern_names=None, hues=(0.0,), sats=(1.0,), vals=(1.0,),
+              seeds=(None,)):
+    """
+    Return the list of (word, pattern, hue, sat, val, seed) combinations in
+    the order generate_tiles produces them. Defaults to every dictionary word
+    and every registered pattern, unseeded.
+    """
+    if words is None:
+        words = list(TILE_COLOR_DICTIONARY.keys())
+    if pattern_names is None:
+        pattern_names = sorted(patterns.PATTERN_GENERATORS.keys())
+    return list(itertools.product(words, pattern_names, hues, sats, vals, seeds))
+
+
+def _init_worker(registry, array_names):
+    """
+    Pool initializer: install the parent's pattern registry, including any
+    patterns a plugin registered after import.
+    """
+    patterns.PATTERN_GENERATORS.update(registry)
+    patterns.ARRAY_PATTERNS.update(array_names)
+
+
+def _generate_one(task):
+    word, pattern_name, hue, sat, val, seed, size = task
+    tile = generate_tile_for_word(word,
+                                  pattern_name=pattern_name,
+                                  hue_shift=hue,
+                                  sat_mult=sat,
+                                  val_mult=val,
+                                  seed=seed,
+                                  size=size)
+    return tile.convert("RGB").tobytes()
+
+
+def _collect(out, results):
+    for i, raw in enumerate(results):
+        out[i] = np.frombuffer(raw, dtype=np.uint8).reshape(out.shape[1:])
+
+
+def generate_tiles(words=None, pattern_names=None, hues=(0.0,), sats=(1.0,), vals=(1.0,),
+                   seeds=(None,), processes=None, as_images=False, chunksize=None,
+                   size=16):
+    """
+    Generate one size x size tile per combination from tile_grid().
+
+    processes: pool size; None uses every core, 0 or 1 runs in this process.
+    as_images: return a list of PIL images instead of a stacked
+               (N, size, size, 3) uint8 array.
+    """
+    tasks = [combo + (size,) for combo in tile_grid(words, pattern_names, hues, sats, vals, seeds)]
+    out = np.empty((len(tasks), size, size, 3), dtype=np.uint8)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    if processes <= 1 or len(tasks) <= 1:
+        _collect(out, map(_generate_one, tasks))
+    else:
+        if chunksize is None:
+            # A few chunks per worker keeps the pool busy without per-task overhead.
+            chunksize = max(1, len(tasks) // (processes * 4))
+        initargs = (dict(patterns.PATTERN_GENERATORS), set(patterns.ARRAY_PATTERNS))
+        with Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+            _collect(out, pool.imap(_generate_one, tasks, chunksize))
+
+    if as_images:
+        return [Image.fromarray(tile) for tile in out]
+    return out
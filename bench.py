@@ -0,0 +1,331 @@
+"""
+Benchmarks.
+
+    python bench.py startup [--runs N]
+    python bench.py patterns [-o results.json] [--compare baseline.json]
+    python bench.py project [--sides 256 1024 ...]
+
+`startup` first checks, in a fresh interpreter, that importing the headless
+modules (HEADLESS_MODULES) pulls in none of GUI_MODULES, then times cold
+`python -m tile_genie generate ...` calls and checks the same for them.
+Either check failing makes the exit status 1.
+
+`patterns` runs every registered pattern at several tile sizes and palette
+lengths and reports tiles per second, per-tile latency percentiles and the
+peak memory allocated per tile. Patterns registered by plugins are included
+when the plugin module is named with --plugin. With --compare, cases that
+got slower than the baseline by more than --threshold are flagged and the
+exit status is 1.
+
+`project` times saving and loading project files (project.py) for maps of
+growing size, with compressed and raw (memory-mapped) layers.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules the command line and batch tools use; none may import a GUI module.
+HEADLESS_MODULES = ("generator", "patterns", "tilemap", "gameboy", "project", "tile_genie")
+GUI_MODULES = ("tkinter", "PIL.ImageTk", "main")
+
+_REPORT_GUI = "print(','.join(m for m in {!r} if m in sys.modules))".format(GUI_MODULES)
+# Run in a fresh interpreter: generate one tile, then report which GUI
+# modules got imported along the way.
+_STARTUP_PROBE = (
+    "import sys, tile_genie;"
+    "tile_genie.main(['generate', 'grass', '--seed', '1', '-o', sys.argv[1]]);"
+    + _REPORT_GUI
+)
+
+
+def _gui_modules_in(code, *args):
+    """
+    Run code in a fresh interpreter and return the GUI modules it
+    imported (code must end by printing them, see _REPORT_GUI).
+    """
+    proc = subprocess.run([sys.executable, "-c", code] + list(args),
+                          cwd=HERE, capture_output=True, text=True, check=True)
+    return {m for m in proc.stdout.strip().split(",") if m}
+
+
+def check_headless_imports(modules=HEADLESS_MODULES):
+    """
+    Sorted GUI modules that importing `modules` pulls in (should be empty).
+    """
+    return sorted(_gui_modules_in("import sys, {};".format(", ".join(modules)) + _REPORT_GUI))
+
+
+def measure_startup(runs=10):
+    """
+    Wall-clock milliseconds for `runs` cold single-tile CLI calls.
+    Returns a dict with the samples, median and min, and the GUI modules
+    the headless path imported (should be empty).
+    """
+    samples = []
+    gui_modules = set()
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "tile.png")
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            found = _gui_modules_in(_STARTUP_PROBE, out)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+            gui_modules.update(found)
+    return {
+        "runs": runs,
+        "samples_ms": [round(s, 2) for s in samples],
+        "median_ms": round(statistics.median(samples), 2),
+        "min_ms": round(min(samples), 2),
+        "gui_modules_imported": sorted(gui_modules),
+    }
+
+
+def _bench_palette(length):
+    """
+    A palette of the given length, cycling the colors of a dictionary word.
+    """
+    from generator import get_color_palette
+
+    base = get_color_palette("grass")
+    return [base[i % len(base)] for i in range(length)]
+
+
+def _percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98], "max": max(samples)}
+
+
+def bench_pattern(name, size, palette_length, tiles=100, alloc_tiles=10):
+    """
+    Time `tiles` generations of one pattern (seeds 0..tiles-1, so every
+    tile is different and nothing comes from TILE_CACHE), then measure the
+    peak traced allocation of `alloc_tiles` more in a separate pass, since
+    tracemalloc slows everything down.
+    """
+    from generator import generate_16x16_tile_with_pattern
+    from patterns import is_array_pattern
+
+    palette = _bench_palette(palette_length)
+
+    def make(seed):
+        return generate_16x16_tile_with_pattern(palette, name, seed=seed, size=size)
+
+    make(0)  # warm up lazily built grids and tables
+    samples = []
+    start = time.perf_counter()
+    for seed in range(tiles):
+        t0 = time.perf_counter()
+        make(seed)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    elapsed = time.perf_counter() - start
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for seed in range(alloc_tiles):
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            make(seed)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "pattern": name,
+        "kind": "array" if is_array_pattern(name) else "draw",
+        "size": size,
+        "palette": palette_length,
+        "tiles": tiles,
+        "tiles_per_sec": round(tiles / elapsed, 1),
+        "latency_us": {k: round(v, 1) for k, v in _percentiles(samples).items()},
+        "alloc_peak_bytes": int(statistics.median(peaks)) if peaks else None,
+    }
+
+
+def bench_patterns(names=None, sizes=(8, 16, 32, 64), palette_lengths=(2, 4, 8),
+                   tiles=100, alloc_tiles=10, plugins=()):
+    """
+    Benchmark every registered pattern (or just `names`) at each tile size
+    and palette length. `plugins` are module names imported first so the
+    patterns they register are benchmarked too.
+    """
+    import numpy
+    import PIL
+    from patterns import PATTERN_GENERATORS
+
+    for module in plugins:
+        importlib.import_module(module)
+    if names is None:
+        names = sorted(PATTERN_GENERATORS)
+
+    results = []
+    for name in names:
+        for size in sizes:
+            for length in palette_lengths:
+                results.append(bench_pattern(name, size, length, tiles, alloc_tiles))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "pillow": PIL.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "plugins": list(plugins),
+        },
+        "results": results,
+    }
+
+
+def compare_results(current, baseline, threshold=0.2):
+    """
+    Cases whose tiles/sec dropped more than `threshold` (a fraction) below
+    the baseline run. Cases missing from either run are ignored.
+    """
+    def key(r):
+        return (r["pattern"], r["size"], r["palette"])
+
+    old = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        before = old.get(key(r))
+        if before is None:
+            continue
+        ratio = r["tiles_per_sec"] / before["tiles_per_sec"]
+        if ratio < 1.0 - threshold:
+            regressions.append({"pattern": r["pattern"], "size": r["size"],
+                                "palette": r["palette"],
+                                "baseline_tiles_per_sec": before["tiles_per_sec"],
+                                "tiles_per_sec": r["tiles_per_sec"],
+                                "ratio": round(ratio, 3)})
+    return regressions
+
+
+def _bench_project_map(side, distinct=256, seed=0):
+    """
+    A side x side map of `distinct` random tiles, laid out in 8x8 blocks
+    of one tile like a painted world map, with its registry.
+    """
+    import numpy as np
+    from PIL import Image
+    from tilemap import TileRegistry
+
+    rng = np.random.default_rng(seed)
+    registry = TileRegistry()
+    for _ in range(distinct):
+        registry.add(Image.fromarray(rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)))
+    blocks = rng.integers(0, distinct + 1, (-(-side // 8), -(-side // 8))).astype(np.uint16)
+    grid = np.repeat(np.repeat(blocks, 8, axis=0), 8, axis=1)[:side, :side]
+    return registry, np.ascontiguousarray(grid)
+
+
+def bench_project(sides=(256, 1024, 2048, 4096), repeats=3):
+    """
+    Save and load times of project files against map size: compressed and
+    raw layers, loaded into memory or memory-mapped, plus the time to read
+    every cell of a memory-mapped map. Best of `repeats` runs, in ms.
+    """
+    from project import load_project, save_project
+
+    def best(func):
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - t0) * 1000.0)
+        return round(min(times), 2)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "map.tgp")
+        for side in sides:
+            registry, grid = _bench_project_map(side)
+            for compress in (True, False):
+                row = {"side": side, "cells": grid.size,
+                       "layer": "zlib" if compress else "raw"}
+                row["save_ms"] = best(lambda: save_project(path, registry, {"map": grid}, 16,
+                                                           compress=compress))
+                row["file_bytes"] = os.path.getsize(path)
+                row["load_ms"] = best(lambda: load_project(path, use_mmap=False))
+                if not compress:
+                    row["load_mmap_ms"] = best(lambda: load_project(path))
+                    row["mmap_full_read_ms"] = best(lambda: int(load_project(path).grid.sum()))
+                results.append(row)
+    return {"results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("startup", help="cold-start time of the headless CLI")
+    p.add_argument("--runs", type=int, default=10)
+
+    p = sub.add_parser("project", help="project file save/load times against map size")
+    p.add_argument("--sides", type=int, nargs="+", default=[256, 1024, 2048, 4096],
+                   help="map sides in cells")
+    p.add_argument("--repeats", type=int, default=3)
+
+    p = sub.add_parser("patterns", help="throughput, latency and allocations of every pattern")
+    p.add_argument("--patterns", nargs="+", default=None, help="default: every registered pattern")
+    p.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    p.add_argument("--palettes", type=int, nargs="+", default=[2, 4, 8],
+                   help="palette lengths")
+    p.add_argument("--tiles", type=int, default=100, help="timed tiles per case")
+    p.add_argument("--alloc-tiles", type=int, default=10, help="tiles traced for allocations")
+    p.add_argument("--plugin", action="append", default=[],
+                   help="module to import first so its patterns are registered")
+    p.add_argument("-o", "--output", default=None, help="write JSON here instead of stdout")
+    p.add_argument("--compare", default=None, help="baseline JSON from an earlier run")
+    p.add_argument("--threshold", type=float, default=0.2,
+                   help="flag cases more than this fraction slower than the baseline")
+    args = parser.parse_args(argv)
+
+    if args.command == "startup":
+        imported = check_headless_imports()
+        if imported:
+            print("FAIL: importing {} pulls in {}".format(", ".join(HEADLESS_MODULES),
+                                                          ", ".join(imported)), file=sys.stderr)
+            return 1
+        result = measure_startup(args.runs)
+        print(json.dumps(result, indent=2))
+        if result["gui_modules_imported"]:
+            print("FAIL: headless CLI imported " + ", ".join(result["gui_modules_imported"]),
+                  file=sys.stderr)
+            return 1
+    elif args.command == "project":
+        print(json.dumps(bench_project(args.sides, args.repeats), indent=2))
+    elif args.command == "patterns":
+        sys.path.insert(0, os.getcwd())  # plugins live next to the caller
+        result = bench_patterns(args.patterns, args.sizes, args.palettes,
+                                max(2, args.tiles), args.alloc_tiles, args.plugin)
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+            result["regressions"] = compare_results(result, baseline, args.threshold)
+        text = json.dumps(result, indent=2)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        if result.get("regressions"):
+            for r in result["regressions"]:
+                print("REGRESSION: {pattern} size={size} palette={palette}: "
+                      "{tiles_per_sec} vs {baseline_tiles_per_sec} tiles/s".format(**r),
+                      file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Game Boy style color reduction.
+
+Used by the map editor's "Gameboy-ize Map" button and by
+`python -m tile_genie gameboyize`.
+
+Images are reduced to a small target palette with array operations: the
+nearest palette color is looked up once per distinct source color (not
+per pixel), optionally after ordered (Bayer) or Floyd-Steinberg
+dithering. The "classic" palette keeps the original rule that pure black
+and pure white become TRANSPARENT_GB.
+"""
+
+import numpy as np
+from PIL import Image
+
+from tilemap import EMPTY, TilePixels
+
+GB_COLORS = [
+    (7,24,33),      # #071821
+    (134,192,108),  # #86c06c
+    (224,248,207),  # #e0f8cf
+]
+TRANSPARENT_GB = (101,255,0)  # #65ff00
+
+PALETTES = {
+    "classic": GB_COLORS,
+    # original DMG LCD greens, darkest first
+    "dmg": [(15,56,15), (48,98,48), (139,172,15), (155,188,15)],
+    # the Game Boy Color's default palette for monochrome games
+    "gbc": [(0,0,0), (0,99,197), (123,255,49), (255,255,255)],
+}
+DITHER_MODES = ("none", "ordered", "floyd-steinberg")
+
+# 4x4 Bayer matrix as thresholds in (-0.5, 0.5). Tile sizes are multiples
+# of 4, so the pattern lines up across neighbouring tiles on the map.
+_BAYER4 = (np.array([[0, 8, 2, 10],
+                     [12, 4, 14, 6],
+                     [3, 11, 1, 9],
+                     [15, 7, 13, 5]]) + 0.5) / 16 - 0.5
+
+_NEAREST_BLOCK = 1 << 16  # pixels compared against the palette at a time
+
+
+def nearest_gb(rgb):
+    """
+    Nearest GB_COLORS entry to an RGB color; pure black and pure white
+    become TRANSPARENT_GB.
+    """
+    (r,g,b) = rgb[:3]
+    if (r,g,b)==(0,0,0) or (r,g,b)==(255,255,255):
+        return TRANSPARENT_GB
+    best=None
+    bestd=999999
+    for col in GB_COLORS:
+        dr=col[0]-r
+        dg=col[1]-g
+        db=col[2]-b
+        dist2=dr*dr+dg*dg+db*db
+        if dist2<bestd:
+            bestd=dist2
+            best=col
+    return best
+
+
+def parse_palette(spec):
+    """
+    A palette by name ("classic", "dmg", "gbc") or as comma-separated hex
+    colors, e.g. "#0f380f,#306230,#8bac0f,#9bbc0f". Raises ValueError.
+    """
+    if spec in PALETTES:
+        return list(PALETTES[spec])
+    colors = []
+    for part in spec.split(","):
+        hex_part = part.strip().lstrip("#")
+        if len(hex_part) != 6:
+            raise ValueError("not a palette name or #rrggbb color: {!r}".format(part.strip()))
+        try:
+            colors.append(tuple(int(hex_part[i:i+2], 16) for i in (0, 2, 4)))
+        except ValueError:
+            raise ValueError("not a #rrggbb color: {!r}".format(part.strip())) from None
+    if len(colors) < 2:
+        raise ValueError("a palette needs at least two colors")
+    return colors
+
+
+def nearest_index(pixels, colors):
+    """
+    Index into colors (k, 3) of the nearest color to each row of pixels
+    (n, 3), by squared RGB distance; ties go to the earlier color.
+    """
+    out = np.empty(len(pixels), dtype=np.intp)
+    for start in range(0, len(pixels), _NEAREST_BLOCK):
+        d = pixels[start:start+_NEAREST_BLOCK, None, :] - colors[None, :, :]
+        out[start:start+_NEAREST_BLOCK] = np.einsum("ijk,ijk->ij", d, d).argmin(axis=1)
+    return out
+
+
+def _nearest_per_color(rgb, colors):
+    """
+    nearest_index for an (h, w, 3) uint8 array, searched once per distinct
+    color in it.
+    """
+    packed = (rgb[..., 0].astype(np.int32) << 16) | (rgb[..., 1].astype(np.int32) << 8) | rgb[..., 2]
+    values, inverse = np.unique(packed.ravel(), return_inverse=True)
+    distinct = np.stack([values >> 16, (values >> 8) & 255, values & 255], axis=1)
+    return nearest_index(distinct, colors)[inverse].reshape(rgb.shape[:2])
+
+
+def _dither_spread(colors):
+    """
+    Per-channel strength of ordered dithering: the mean distance from
+    each palette color to its nearest neighbour, spread over three channels.
+    """
+    d = colors[:, None, :].astype(np.float64) - colors[None, :, :]
+    d2 = np.einsum("ijk,ijk->ij", d, d)
+    np.fill_diagonal(d2, np.inf)
+    return float(np.sqrt(d2.min(axis=1)).mean() / np.sqrt(3))
+
+
+def _floyd_steinberg(rgb, colors, skip):
+    """
+    Palette indices for rgb with Floyd-Steinberg error diffusion. Pixels
+    in skip are left out and pass no error on. The scan is inherently
+    serial, so it runs on plain Python floats (fast for tile-sized images).
+    """
+    h, w, _ = rgb.shape
+    work = rgb.astype(np.float64).tolist()
+    skip = skip.tolist()
+    pal = [tuple(float(v) for v in c) for c in colors.tolist()]
+    out = np.zeros((h, w), dtype=np.intp)
+    for y in range(h):
+        row = work[y]
+        below = work[y+1] if y + 1 < h else None
+        for x in range(w):
+            if skip[y][x]:
+                continue
+            r, g, b = row[x]
+            best, bestd = 0, None
+            for i, (pr, pg, pb) in enumerate(pal):
+                dist2 = (pr-r)*(pr-r) + (pg-g)*(pg-g) + (pb-b)*(pb-b)
+                if bestd is None or dist2 < bestd:
+                    best, bestd = i, dist2
+            out[y, x] = best
+            pr, pg, pb = pal[best]
+            er, eg, eb = r - pr, g - pg, b - pb
+            for px, wt in ((row[x+1] if x + 1 < w else None, 7/16),
+                           (below[x-1] if below is not None and x > 0 else None, 3/16),
+                           (below[x] if below is not None else None, 5/16),
+                           (below[x+1] if below is not None and x + 1 < w else None, 1/16)):
+                if px is not None:
+                    px[0] += er * wt
+                    px[1] += eg * wt
+                    px[2] += eb * wt
+    return out
+
+
+def palette_indices(img, palette="classic", dither="none"):
+    """
+    Reduce img to `palette` (a PALETTES name or a list of RGB tuples),
+    dithered with one of DITHER_MODES. Returns (index, colors): an (h, w)
+    array of indices into the (k, 3) colors array, where index k marks
+    the classic palette's transparent (pure black or white) pixels.
+    """
+    if dither not in DITHER_MODES:
+        raise ValueError("unknown dither mode {!r}".format(dither))
+    keyed = isinstance(palette, str) and palette == "classic"
+    colors = parse_palette(palette) if isinstance(palette, str) else palette
+    colors = np.array(colors, dtype=np.int32).reshape(-1, 3)
+
+    rgb = np.asarray(img.convert("RGB"))
+    h, w, _ = rgb.shape
+    if keyed:
+        sums = rgb.sum(axis=2, dtype=np.int32)
+        transparent = (sums == 0) | (sums == 3 * 255)
+    else:
+        transparent = np.zeros((h, w), dtype=bool)
+
+    if dither == "none":
+        index = _nearest_per_color(rgb, colors)
+    elif dither == "ordered":
+        threshold = np.tile(_BAYER4, (-(-h // 4), -(-w // 4)))[:h, :w]
+        shifted = rgb + (threshold * _dither_spread(colors))[..., None]
+        index = nearest_index(shifted.reshape(-1, 3), colors).reshape(h, w)
+    else:
+        index = _floyd_steinberg(rgb, colors, transparent)
+    index[transparent] = len(colors)
+    return index, colors
+
+
+def gameboyize_image(img, palette="classic", dither="none"):
+    """
+    Return an RGB copy of img reduced to `palette`, dithered with one of
+    DITHER_MODES (see palette_indices). With the default "classic" palette
+    and no dithering the result matches mapping every pixel through
+    nearest_gb.
+    """
+    index, colors = palette_indices(img, palette, dither)
+    lut = np.array(list(colors) + [TRANSPARENT_GB], dtype=np.uint8)
+    return Image.fromarray(lut[index], "RGB")
+
+
+# -----------------------------------------------------------------------------
+# Native tile data: 2bpp planar tiles, tilemap and GBC attributes
+# -----------------------------------------------------------------------------
+
+GB_TILE = 8             # hardware tiles are 8x8 pixels, 16 bytes each
+GB_BANK_TILES = 256     # tiles a tilemap byte can address (per VRAM bank on GBC)
+ATTR_BANK = 0x08        # GBC attribute bits
+ATTR_XFLIP = 0x20
+ATTR_YFLIP = 0x40
+
+
+def shade_colors(palette="dmg"):
+    """
+    The colors of a palette ordered as the four Game Boy shades, lightest
+    (shade 0) first, and the shade of each palette index (with the
+    classic palette's transparent index last, as shade 0).
+    Raises ValueError if the palette has more than four shades.
+    """
+    keyed = isinstance(palette, str) and palette == "classic"
+    colors = parse_palette(palette) if isinstance(palette, str) else list(palette)
+    if len(colors) + keyed > 4:
+        raise ValueError("a Game Boy palette has at most 4 shades, got {}".format(len(colors) + keyed))
+    luma = [299*r + 587*g + 114*b for r, g, b in colors]
+    order = sorted(range(len(colors)), key=lambda i: -luma[i])
+    shades = [TRANSPARENT_GB] if keyed else []
+    shade_of = np.zeros(len(colors) + 1, dtype=np.uint8)
+    for i in order:
+        shade_of[i] = len(shades)
+        shades.append(colors[i])
+    return shades, shade_of
+
+
+def pack_2bpp(shades):
+    """
+    Pack (n, 8, 8) shade arrays (values 0..3) into (n, 16) bytes of Game
+    Boy tile data: per row, the low bit plane then the high bit plane,
+    leftmost pixel in the top bit.
+    """
+    shades = np.asarray(shades, dtype=np.uint8)
+    out = np.empty((len(shades), 16), dtype=np.uint8)
+    out[:, 0::2] = np.packbits(shades & 1, axis=2)[:, :, 0]
+    out[:, 1::2] = np.packbits(shades >> 1, axis=2)[:, :, 0]
+    return out
+
+
+def _block_keys(data):
+    """
+    Two uint64 keys per 16-byte tile, comparable like the bytes.
+    """
+    keys = data.view(">u8").reshape(-1, 2)
+    return keys[:, 0], keys[:, 1]
+
+
+def map_to_2bpp(grid, registry, tile_size, palette="dmg", dither="none", gbc=False):
+    """
+    Game Boy tile data for a map: every tile is reduced to the palette's
+    four shades and cut into 8x8 hardware tiles, which are deduplicated.
+    Returns (tile_data, tilemap, attrmap): (n, 16) uint8 2bpp tile data,
+    the map as one uint8 tile index per 8x8 cell, and with gbc the GBC
+    attribute byte per cell (else None).
+
+    With gbc, tiles that are flips of each other are stored once and the
+    attribute flip bits pick the orientation, and tiles past the first 256
+    go to VRAM bank 1. Raises ValueError if the tiles don't fit.
+    """
+    _, shade_of = shade_colors(palette)
+    k = tile_size // GB_TILE
+    ids = np.unique(grid)
+    pixels = TilePixels(registry, tile_size)
+    shades = np.zeros((len(ids), tile_size, tile_size), dtype=np.uint8)
+    for n, tile_id in enumerate(ids):
+        if tile_id != EMPTY:
+            index, _ = palette_indices(Image.fromarray(pixels.get(int(tile_id))), palette, dither)
+            shades[n] = shade_of[index]
+    # (tiles, k, k, 8, 8): the hardware tiles of each map tile, row by row
+    blocks = shades.reshape(len(ids), k, GB_TILE, k, GB_TILE).swapaxes(2, 3).reshape(-1, GB_TILE, GB_TILE)
+    flips = np.zeros(len(blocks), dtype=np.uint8)
+    data = pack_2bpp(blocks)
+    if gbc:
+        # Keep the smallest of each tile's four orientations.
+        hi, lo = _block_keys(data)
+        for flip, variant in ((ATTR_XFLIP, blocks[:, :, ::-1]), (ATTR_YFLIP, blocks[:, ::-1, :]),
+                              (ATTR_XFLIP | ATTR_YFLIP, blocks[:, ::-1, ::-1])):
+            packed = pack_2bpp(variant)
+            vhi, vlo = _block_keys(packed)
+            better = (vhi < hi) | ((vhi == hi) & (vlo < lo))
+            data[better], flips[better] = packed[better], flip
+            hi, lo = np.where(better, vhi, hi), np.where(better, vlo, lo)
+    tile_data, index = np.unique(data, axis=0, return_inverse=True)
+    index = index.ravel()
+    limit = GB_BANK_TILES * (2 if gbc else 1)
+    if len(tile_data) > limit:
+        raise ValueError("the map uses {} distinct 8x8 tiles; at most {} fit{}".format(
+            len(tile_data), limit, "" if gbc else " (2x more with GBC attributes)"))
+
+    # Lay each map tile's k x k hardware tiles out on the 8x8 grid.
+    cell = np.searchsorted(ids, grid)
+    rows, cols = grid.shape
+
+    def spread(per_block):
+        per_tile = per_block.reshape(len(ids), k, k)[cell]  # (rows, cols, k, k)
+        return per_tile.swapaxes(1, 2).reshape(rows * k, cols * k)
+
+    tilemap = spread((index % GB_BANK_TILES).astype(np.uint8))
+    attrmap = None
+    if gbc:
+        attrmap = spread(flips | np.where(index >= GB_BANK_TILES, ATTR_BANK, 0).astype(np.uint8))
+    return tile_data, tilemap, attrmap
+
+
+def rgb555(color):
+    """
+    A color as the GBC's little-endian 15-bit palette entry.
+    """
+    r, g, b = color
+    return ((r >> 3) | (g >> 3) << 5 | (b >> 3) << 10).to_bytes(2, "little")
+
+
+def write_gb_assets(base, grid, registry, tile_size, palette="dmg", dither="none", gbc=False):
+    """
+    Write map_to_2bpp's output next to each other: base.2bpp (tile data),
+    base.tilemap (one index byte per 8x8 cell, row by row) and with gbc
+    base.attrmap (attribute bytes) and base.pal (the shades as one GBC
+    background palette). Returns the paths written.
+    """
+    tile_data, tilemap, attrmap = map_to_2bpp(grid, registry, tile_size, palette, dither, gbc)
+    out = {".2bpp": tile_data.tobytes(), ".tilemap": tilemap.tobytes()}
+    if gbc:
+        shades, _ = shade_colors(palette)
+        shades += shades[-1:] * (4 - len(shades))
+        out[".attrmap"] = attrmap.tobytes()
+        out[".pal"] = b"".join(rgb555(c) for c in shades)
+    paths = []
+    for ext, payload in out.items():
+        with open(base + ext, "wb") as f:
+            f.write(payload)
+        paths.append(base + ext)
+    return paths
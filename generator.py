@@ -0,0 +1,387 @@
+"""
+Tile generation core: the world-building color dictionary, palette
+adjustment, pattern rendering and the seeded tile cache.
+
+This module never imports tkinter, so it can be used on headless machines
+(see tile_genie.py for the command-line entry point).
+"""
+
+import random
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from PIL import Image
+
+# -----------------------------------------------------------------------------
+# 1) Massive World-Building Dictionary with 150+ Entries
+#    Each key is a terrain or thematic word, mapped to a list of sample RGB color tuples.
+# -----------------------------------------------------------------------------
+
+TILE_COLOR_DICTIONARY = {
+    "grass":        [(34,139,34), (50,205,50), (0,128,0), (124,252,0)],
+    "rock":         [(112,128,144), (119,136,153), (105,105,105), (128,128,128)],
+    "ocean":        [(0,105,148), (0,128,255), (28,107,160), (25,25,112)],
+    "desert":       [(237,201,175), (210,180,140), (244,164,96), (222,184,135)],
+    "forest":       [(34,139,34), (0,100,0), (27,94,32), (46,139,87)],
+    "mountain":     [(139,137,137), (205,201,201), (169,169,169), (188,184,177)],
+    "hills":        [(85,107,47), (107,142,35), (143,188,143), (154,205,50)],
+    "stone":        [(120,120,120), (140,140,140), (110,110,110), (90,90,90)],
+    "gravel":       [(128,128,128), (153,153,153), (102,102,102), (77,77,77)],
+    "mud":          [(70,50,30), (60,40,20), (80,60,40), (100,80,60)],
+    "snow":         [(255,250,250), (240,248,255), (245,245,245), (230,230,230)],
+    "ice":          [(176,224,230), (173,216,230), (224,255,255), (240,255,255)],
+    "glass":        [(180,180,255), (200,200,255), (220,220,255), (240,240,255)],
+    "lava":         [(255,69,0), (255,140,0), (255,0,0), (139,0,0)],
+    "sand":         [(194,178,128), (238,214,175), (244,164,96), (210,180,140)],
+    "cliff":        [(139,137,137), (160,160,160), (190,190,190), (211,211,211)],
+    "snowy":        [(248,248,255), (240,255,255), (245,245,245), (230,230,230)],
+    "volcano":      [(139,0,0), (205,38,38), (255,69,0), (105,105,105)],
+    "river":        [(0,191,255), (30,144,255), (70,130,180), (25,25,112)],
+    "riverbank":    [(34,139,34), (50,205,50), (139,69,19), (210,180,140)],
+    "basalt":       [(70,70,70), (90,90,90), (50,50,50), (30,30,30)],
+    "marble":       [(220,220,220), (255,250,250), (245,245,245), (230,230,230)],
+    "metal":        [(192,192,192), (169,169,169), (128,128,128), (255,215,0)],
+    "iron":         [(188,188,188), (183,183,183), (160,160,160), (130,130,130)],
+    "gold":         [(255,215,0), (238,201,0), (218,165,32), (184,134,11)],
+    "silver":       [(192,192,192), (211,211,211), (169,169,169), (128,128,128)],
+    "lapis":        [(38,97,156), (25,25,112), (0,0,139), (0,0,205)],
+    "emerald":      [(0,201,87), (0,139,69), (0,255,127), (46,139,87)],
+    "diamond":      [(185,242,255), (224,255,255), (175,238,238), (176,224,230)],
+    "obsidian":     [(53,56,57), (35,38,39), (27,29,30), (70,70,90)],
+    "netherrack":   [(96,35,35), (125,45,45), (74,22,22), (50,10,10)],
+    "endstone":     [(218,210,158), (232,224,174), (211,203,146), (190,182,122)],
+    "pebble":       [(139,137,137), (160,160,160), (120,120,120), (105,105,105)],
+    "coral":        [(255,127,80), (255,160,122), (240,128,128), (233,150,122)],
+    "sponge":       [(255,255,128), (255,255,153), (240,230,140), (238,232,170)],
+    "kelp":         [(34,139,34), (0,128,0), (85,107,47), (46,139,87)],
+    "seaweed":      [(46,139,87), (0,100,0), (0,128,0), (60,179,113)],
+    "fossil":       [(210,180,140), (205,133,63), (222,184,135), (139,69,19)],
+    "boulder":      [(128,128,128), (105,105,105), (119,136,153), (112,128,144)],
+    "slate":        [(112,128,144), (47,79,79), (69,90,100), (70,70,70)],
+    "clay":         [(221,221,221), (205,201,201), (196,196,196), (169,169,169)],
+    "terra":        [(139,69,19), (160,82,45), (210,105,30), (188,143,143)],
+    "cobblestone":  [(120,120,120), (90,90,90), (100,100,100), (130,130,130)],
+    "brick":        [(178,34,34), (165,42,42), (139,0,0), (150,40,40)],
+    "roof":         [(139,69,19), (105,105,105), (165,42,42), (128,128,128)],
+    "wood":         [(139,69,19), (160,82,45), (205,133,63), (222,184,135)],
+    "plank":        [(181,101,29), (210,105,30), (153,76,0), (139,69,19)],
+    "tree":         [(34,139,34), (0,128,0), (139,69,19), (160,82,45)],
+    "leaves":       [(0,100,0), (34,139,34), (50,205,50), (107,142,35)],
+    "cactus":       [(0,100,0), (34,139,34), (60,179,113), (107,142,35)],
+    "mushroom":     [(139,69,19), (222,184,135), (255,0,0), (240,230,140)],
+    "fire":         [(255,0,0), (255,69,0), (255,140,0), (255,215,0)],
+    "magma":        [(255,69,0), (255,140,0), (220,20,60), (178,34,34)],
+    "acid":         [(173,255,47), (127,255,0), (202,255,112), (143,188,143)],
+    "poison":       [(127,255,0), (110,139,61), (50,205,50), (154,205,50)],
+    "toxic":        [(0,255,127), (46,139,87), (173,255,47), (127,255,0)],
+    "radioactive":  [(0,250,154), (0,255,127), (127,255,0), (189,183,107)],
+    "plague":       [(128,0,0), (139,0,0), (165,42,42), (178,34,34)],
+    "light":        [(255,255,224), (255,255,240), (250,250,210), (255,250,205)],
+    "dark":         [(25,25,25), (50,50,50), (75,75,75), (0,0,0)],
+    "shadow":       [(40,40,40), (60,60,60), (80,80,80), (0,0,0)],
+    "portal":       [(138,43,226), (75,0,130), (148,0,211), (153,50,204)],
+    "magic":        [(186,85,211), (218,112,214), (147,112,219), (138,43,226)],
+    "arcane":       [(72,61,139), (106,90,205), (123,104,238), (147,112,219)],
+    "rune":         [(225,225,255), (200,200,255), (175,175,230), (150,150,205)],
+    "glyph":        [(255,228,225), (255,240,245), (238,221,130), (218,112,214)],
+    "enchanted":    [(128,0,128), (186,85,211), (216,191,216), (199,21,133)],
+    "fairy":        [(255,182,193), (255,192,203), (255,228,225), (255,240,245)],
+    "pixie":        [(255,228,225), (255,182,193), (255,105,180), (255,20,147)],
+    "sprite":       [(173,216,230), (135,206,250), (135,206,235), (176,196,222)],
+    "spirit":       [(211,211,255), (170,170,255), (192,192,192), (224,255,255)],
+    "ghost":        [(245,245,245), (230,230,230), (211,211,211), (192,192,192)],
+    "grave":        [(60,60,60), (45,45,45), (30,30,30), (90,90,90)],
+    "tomb":         [(70,70,70), (100,100,100), (130,130,130), (153,153,153)],
+    "crypt":        [(50,50,50), (70,70,70), (90,90,90), (100,100,100)],
+    "bone":         [(245,245,220), (255,228,196), (255,239,213), (240,230,140)],
+    "skull":        [(215,215,215), (192,192,192), (169,169,169), (245,245,245)],
+    "flesh":        [(255,160,122), (255,127,80), (255,99,71), (250,128,114)],
+    "blood":        [(139,0,0), (178,34,34), (220,20,60), (255,0,0)],
+    "carrion":      [(128,0,0), (139,0,0), (165,42,42), (178,34,34)],
+    "sandstone":    [(216,179,140), (237,201,175), (255,228,196), (210,180,140)],
+    "limestone":    [(230,230,220), (224,224,214), (211,211,185), (200,200,175)],
+    "granite":      [(143,143,143), (155,155,155), (165,168,170), (175,175,175)],
+    "meteor":       [(105,105,105), (119,136,153), (128,128,128), (178,34,34)],
+    "asteroid":     [(70,70,70), (90,90,90), (110,110,110), (130,130,130)],
+    "cosmic":       [(72,61,139), (75,0,130), (106,90,205), (123,104,238)],
+    "star":         [(255,255,224), (255,250,205), (240,230,140), (255,215,0)],
+    "nebula":       [(147,112,219), (138,43,226), (186,85,211), (218,112,214)],
+    "galaxy":       [(25,25,112), (72,61,139), (106,90,205), (138,43,226)],
+    "planet":       [(154,205,50), (233,150,122), (210,105,30), (160,82,45)],
+    "grassland":    [(124,252,0), (127,255,0), (0,250,154), (50,205,50)],
+    "savanna":      [(210,180,140), (222,184,135), (238,232,170), (189,183,107)],
+    "jungle":       [(0,100,0), (34,139,34), (85,107,47), (46,139,87)],
+    "rainforest":   [(34,139,34), (0,128,0), (60,179,113), (123,153,34)],
+    "wetland":      [(107,142,35), (154,205,50), (0,191,255), (70,130,180)],
+    "swamp":        [(47,79,79), (85,107,47), (50,205,50), (0,100,0)],
+    "bog":          [(80,100,60), (70,80,50), (85,107,47), (65,80,45)],
+    "marsh":        [(100,120,70), (90,110,60), (107,142,35), (154,205,50)],
+    "tundra":       [(230,230,250), (240,255,255), (245,245,245), (220,220,220)],
+    "iceberg":      [(173,216,230), (224,255,255), (240,255,255), (176,224,230)],
+    "frozen":       [(176,224,230), (173,216,230), (224,255,255), (220,220,255)],
+    "arctic":       [(245,245,255), (240,255,255), (230,230,250), (255,250,250)],
+    "underwater":   [(0,105,148), (0,128,255), (70,130,180), (25,25,112)],
+    "deepsea":      [(25,25,112), (0,0,128), (0,0,139), (0,100,160)],
+    "reef":         [(255,160,122), (255,127,80), (46,139,87), (0,128,128)],
+    "shore":        [(210,180,140), (238,214,175), (70,130,180), (25,25,112)],
+    "beach":        [(238,214,175), (222,184,135), (240,230,140), (70,130,180)],
+    "volcanic":     [(105,105,105), (139,0,0), (205,38,38), (70,70,70)],
+    "ash":          [(80,80,80), (100,100,100), (120,120,120), (140,140,140)],
+    "charred":      [(60,60,60), (80,80,80), (100,100,100), (120,120,120)],
+    "burnt":        [(139,69,19), (160,82,45), (105,105,105), (70,70,70)],
+    "crystal":      [(224,255,255), (175,238,238), (176,224,230), (173,216,230)],
+    "ruby":         [(224,17,95), (227,11,93), (178,34,34), (139,0,0)],
+    "sapphire":     [(15,82,186), (0,0,139), (25,25,112), (0,0,205)],
+    "amethyst":     [(153,102,204), (138,43,226), (186,85,211), (123,104,238)],
+    "quartz":       [(255,255,255), (245,245,245), (240,240,240), (230,230,230)],
+    "opal":         [(168,195,188), (178,223,238), (224,255,255), (152,251,152)],
+    "pearl":        [(234,224,200), (255,239,219), (255,245,238), (245,245,245)],
+    "enigma":       [(75,0,130), (106,90,205), (72,61,139), (128,0,128)],
+    "mystic":       [(138,43,226), (148,0,211), (186,85,211), (153,50,204)],
+    "mythic":       [(199,21,133), (218,112,214), (255,105,180), (219,112,147)],
+    "legend":       [(255,215,0), (238,221,130), (189,183,107), (218,165,32)],
+    "relic":        [(184,134,11), (218,165,32), (205,133,63), (139,69,19)],
+    "artifact":     [(220,220,220), (245,245,245), (192,192,192), (255,250,240)],
+    "ancient":      [(205,133,63), (160,82,45), (139,69,19), (110,40,19)],
+    "future":       [(192,192,192), (211,211,211), (60,60,60), (128,128,128)],
+    "cyber":        [(0,255,255), (0,250,154), (127,255,212), (0,255,127)],
+    "tech":         [(105,105,105), (128,128,128), (192,192,192), (220,220,220)],
+    "robotic":      [(200,200,200), (169,169,169), (105,105,105), (255,215,0)],
+    "mechanical":   [(139,137,137), (160,160,160), (190,190,190), (218,165,32)],
+    "steam":        [(169,169,169), (211,211,211), (192,192,192), (205,201,201)],
+    "clockwork":    [(205,201,201), (192,192,192), (218,165,32), (184,134,11)],
+    "brass":        [(181,166,66), (205,127,50), (184,134,11), (218,165,32)],
+    "ironwork":     [(188,188,188), (169,169,169), (192,192,192), (128,128,128)],
+    "wire":         [(90,90,90), (130,130,130), (160,160,160), (192,192,192)],
+    "circuit":      [(0,255,127), (127,255,0), (46,139,87), (60,179,113)],
+    "chip":         [(192,192,192), (128,128,128), (72,61,139), (255,255,224)],
+    "binary":       [(0,0,0), (255,255,255), (32,32,32), (224,224,224)],
+    "digital":      [(0,255,255), (127,255,212), (255,255,0), (124,252,0)],
+    "virtual":      [(186,85,211), (147,112,219), (0,255,255), (173,216,230)],
+    "hologram":     [(102,205,170), (0,255,255), (127,255,212), (0,206,209)],
+    "mirror":       [(245,245,245), (224,224,224), (211,211,211), (192,192,192)],
+    "glassland":    [(180,180,255), (200,200,255), (220,220,255), (240,240,255)],
+    "translucent":  [(255,255,255), (240,248,255), (224,255,255), (248,248,255)],
+    "phantom":      [(119,136,153), (105,105,105), (40,40,40), (70,70,70)],
+    "ethereal":     [(224,255,255), (255,250,240), (250,240,230), (230,230,250)],
+    "celestial":    [(135,206,235), (176,196,222), (220,220,255), (192,192,255)],
+    "astral":       [(123,104,238), (106,90,205), (72,61,139), (138,43,226)],
+    "heaven":       [(240,255,255), (224,255,255), (255,255,240), (255,250,250)],
+    "hell":         [(139,0,0), (178,34,34), (255,0,0), (70,70,70)],
+    "demon":        [(178,34,34), (139,0,0), (70,70,70), (40,40,40)],
+    "angel":        [(255,255,224), (255,250,205), (245,245,245), (224,255,255)],
+    "seraph":       [(255,245,238), (255,250,250), (230,230,250), (255,250,205)],
+    "dragon":       [(139,0,0), (205,38,38), (85,107,47), (46,139,87)],
+    "wyvern":       [(46,139,87), (0,128,128), (60,179,113), (34,139,34)],
+    "drake":        [(128,0,0), (178,34,34), (50,50,50), (60,60,60)],
+    "hydra":        [(0,100,0), (0,139,139), (60,179,113), (107,142,35)],
+    "serpent":      [(0,128,128), (0,100,0), (85,107,47), (128,0,0)],
+    "worm":         [(160,82,45), (139,69,19), (128,0,0), (184,134,11)],
+    "golem":        [(100,100,100), (130,130,130), (160,160,160), (70,70,70)],
+    "construct":    [(139,137,137), (120,120,120), (90,90,90), (180,180,180)],
+    "automaton":    [(192,192,192), (169,169,169), (128,128,128), (105,105,105)],
+    "puppet":       [(210,180,140), (139,69,19), (160,82,45), (100,80,60)],
+    "homunculus":   [(255,160,122), (205,133,63), (139,69,19), (178,34,34)],
+    "borg":         [(128,128,128), (192,192,192), (0,255,0), (0,128,0)],
+    "biomech":      [(139,69,19), (160,82,45), (192,192,192), (128,128,128)],
+    "biotech":      [(107,142,35), (0,128,0), (127,255,0), (60,179,113)],
+    "gene":         [(144,238,144), (152,251,152), (124,252,0), (0,255,127)],
+    "DNA":          [(255,0,255), (186,85,211), (147,112,219), (138,43,226)],
+    "virus":        [(128,0,0), (178,34,34), (220,20,60), (255,69,0)],
+    "bacteria":     [(189,183,107), (143,188,143), (127,255,0), (173,255,47)],
+    "fungus":       [(139,69,19), (222,184,135), (154,205,50), (107,142,35)],
+    "algae":        [(0,128,128), (0,100,0), (34,139,34), (46,139,87)],
+    "lichen":       [(107,142,35), (143,188,143), (154,205,50), (85,107,47)],
+    "mold":         [(96,128,56), (85,107,47), (110,139,61), (34,139,34)],
+    "yeast":        [(255,255,224), (255,250,205), (255,245,238), (253,245,230)],
+    "petri":        [(211,211,211), (255,255,224), (127,255,212), (127,255,0)],
+    "lab":          [(192,192,192), (211,211,211), (220,220,220), (240,248,255)],
+    "science":      [(173,216,230), (176,196,222), (224,255,255), (0,255,255)],
+    "alchemy":      [(238,221,130), (218,165,32), (184,134,11), (245,245,220)],
+    "potion":       [(255,20,147), (218,112,214), (186,85,211), (147,112,219)],
+    "tonic":        [(0,255,127), (60,179,113), (127,255,212), (255,105,180)],
+    "elixir":       [(255,69,0), (255,140,0), (0,255,255), (173,216,230)],
+    "brew":         [(139,69,19), (160,82,45), (222,184,135), (210,105,30)],
+    "mix":          [(255,192,203), (219,112,147), (186,85,211), (0,255,127)],
+    "amalgam":      [(255,215,0), (255,140,0), (220,20,60), (138,43,226)]
+}
+
+# -----------------------------------------------------------------------------
+# 2) Generation
+# -----------------------------------------------------------------------------
+
+def get_color_palette(word: str):
+    """
+    Return 4-color palette for a word or default to 'grass' if not found.
+    """
+    return TILE_COLOR_DICTIONARY.get(word.lower(), TILE_COLOR_DICTIONARY["grass"])
+
+def adjust_palette(palette, hue_shift=0.0, sat_mult=1.0, val_mult=1.0):
+    """
+    Return the palette with hue shifted and saturation/value scaled.
+    """
+    from colorsys import rgb_to_hsv, hsv_to_rgb
+
+    adjusted = []
+    for (r,g,b) in palette:
+        h,s,v = rgb_to_hsv(r/255,g/255,b/255)
+        h=(h+hue_shift)%1.0
+        s=min(max(s*sat_mult,0),1)
+        v=min(max(v*val_mult,0),1)
+        nr,ng,nb = hsv_to_rgb(h,s,v)
+        adjusted.append((int(nr*255),int(ng*255),int(nb*255)))
+    return adjusted
+
+# Tile sizes the editor and CLI offer. Patterns are designed at 16x16 and
+# scale to any size, but the map and exporters assume one of these.
+TILE_SIZES = (8, 16, 32, 64)
+
+# Palette-index layout of an array-pattern tile. blends is None when the
+# indices refer straight to the palette (see patterns.register_array_pattern).
+TileLayout = namedtuple("TileLayout", "indices blends")
+
+def generate_tile_layout(palette, pattern_name="solid", seed=None, size=16):
+    """
+    Run an array pattern for a size x size tile and return its TileLayout,
+    or None for draw-based patterns, which have no index map.
+    """
+    from patterns import PATTERN_GENERATORS, is_array_pattern
+
+    name = pattern_name.lower()
+    if name not in PATTERN_GENERATORS:
+        name = "solid"
+    if not is_array_pattern(name):
+        return None
+    result = PATTERN_GENERATORS[name](palette, np.random.default_rng(seed), size)
+    if isinstance(result, tuple):
+        return TileLayout(*result)
+    return TileLayout(result, None)
+
+def render_tile_layout(layout, palette, hue_shift=0.0, sat_mult=1.0, val_mult=1.0):
+    """
+    Color a TileLayout with the HSV-adjusted palette. Only the palette
+    entries are adjusted; the pixels are a single lookup.
+    """
+    from patterns import blend_palette
+
+    adjusted = adjust_palette(palette, hue_shift, sat_mult, val_mult)
+    if layout.blends is not None:
+        adjusted = blend_palette(adjusted, layout.blends)
+    # The extra entry is the 'unpainted' index every array pattern may use.
+    lut = np.vstack([np.asarray(adjusted, dtype=np.uint8).reshape(-1, 3),
+                     np.zeros((1, 3), dtype=np.uint8)])
+    return Image.fromarray(lut[layout.indices])
+
+def generate_16x16_tile_with_pattern(palette,
+                                     pattern_name="solid",
+                                     hue_shift=0.0,
+                                     sat_mult=1.0,
+                                     val_mult=1.0,
+                                     seed=None,
+                                     size=16):
+    """
+    Generate a size x size Pillow Image (16x16 by default; 8, 32 and 64 are
+    the sizes the editor offers) using the specified pattern & adjusted palette.
+
+    Array patterns return palette indices, so only the handful of palette
+    entries go through the HSV adjustment and the image is built with a
+    single lookup. Draw-based patterns still paint the tile pixel by pixel.
+
+    seed: the same seed always gives the same tile. Array patterns get their
+    own numpy Generator; draw-based patterns use the global `random` module,
+    which is seeded for the call and then restored. Draw-based patterns only
+    know how to paint 16x16, so their tile is resized (nearest) to size.
+    """
+    from patterns import PATTERN_GENERATORS
+
+    layout = generate_tile_layout(palette, pattern_name, seed, size)
+    if layout is not None:
+        return render_tile_layout(layout, palette, hue_shift, sat_mult, val_mult)
+
+    pattern_func = PATTERN_GENERATORS[pattern_name.lower()]
+    from PIL import ImageDraw
+
+    tile = Image.new("RGB", (16,16))
+    draw = ImageDraw.Draw(tile)
+    adjusted = adjust_palette(palette, hue_shift, sat_mult, val_mult)
+    if seed is None:
+        pattern_func(draw, adjusted)
+    else:
+        state = random.getstate()
+        random.seed(seed)
+        try:
+            pattern_func(draw, adjusted)
+        finally:
+            random.setstate(state)
+    if size != 16:
+        tile = tile.resize((size, size), Image.NEAREST)
+    return tile
+
+
+class TileCache:
+    """
+    Bounded LRU cache of generated tiles with hit/miss counters.
+    """
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        tile = self._data.get(key)
+        if tile is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return tile
+
+    def put(self, key, tile):
+        self._data[key] = tile
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._data)
+
+
+TILE_CACHE = TileCache()
+
+def generate_tile_for_word(word,
+                           pattern_name="solid",
+                           hue_shift=0.0,
+                           sat_mult=1.0,
+                           val_mult=1.0,
+                           seed=None,
+                           size=16):
+    """
+    Generate a size x size tile for a dictionary word. Seeded results are kept in
+    TILE_CACHE, keyed by (word, pattern, hue, sat, val, seed, size), so a
+    repeat request returns the same image object. Treat it as read-only.
+    Unseeded calls are random every time and bypass the cache.
+    """
+    palette = get_color_palette(word)
+    if seed is None:
+        return generate_16x16_tile_with_pattern(palette, pattern_name,
+                                                hue_shift, sat_mult, val_mult,
+                                                size=size)
+
+    key = (word.lower(), pattern_name.lower(), hue_shift, sat_mult, val_mult, seed, size)
+    tile = TILE_CACHE.get(key)
+    if tile is None:
+        tile = generate_16x16_tile_with_pattern(palette, pattern_name,
+                                                hue_shift, sat_mult, val_mult, seed, size)
+        TILE_CACHE.put(key, tile)
+    return tile
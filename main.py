@@ -3,7 +3,7 @@
 """
 Author: 10x Senior Architect Megalord Oversigma Gigachad Engineer
 Description:
-  This script generates 16x16 tiles based on a word entered (e.g., 'grass', 'rock', 'ocean').
+  This script generates 16x16 (or 8, 32, 64 px) tiles based on a word entered (e.g., 'grass', 'rock', 'ocean').
   It uses a large dictionary (150+ entries) of world-building words mapped to color palettes.
   A user can preview the tile in a Tkinter GUI, tweak color palettes using basic sliders,
   and export the tile as a .png. Perfect for Game Boy Color-style 2D world map building.
@@ -11,254 +11,111 @@ Description:
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import mmap
+import os
 import random
-from PIL import Image, ImageTk, ImageDraw
+import threading
+import time
+from PIL import Image, ImageTk
 from patterns import PATTERN_GENERATORS
-import copy
+from collections import OrderedDict
+import numpy as np
 
 TK_SILENCE_DEPRECATION = 1
 
 # -----------------------------------------------------------------------------
-# 1) Massive World-Building Dictionary with 150+ Entries
-#    Each key is a terrain or thematic word, mapped to a list of sample RGB color tuples.
+# 1) Dictionary & Generation
+#    The world-building dictionary and the tile generator live in generator.py
+#    so they can be used without Tk (see tile_genie.py).
 # -----------------------------------------------------------------------------
 
-TILE_COLOR_DICTIONARY = {
-    "grass":        [(34,139,34), (50,205,50), (0,128,0), (124,252,0)],
-    "rock":         [(112,128,144), (119,136,153), (105,105,105), (128,128,128)],
-    "ocean":        [(0,105,148), (0,128,255), (28,107,160), (25,25,112)],
-    "desert":       [(237,201,175), (210,180,140), (244,164,96), (222,184,135)],
-    "forest":       [(34,139,34), (0,100,0), (27,94,32), (46,139,87)],
-    "mountain":     [(139,137,137), (205,201,201), (169,169,169), (188,184,177)],
-    "hills":        [(85,107,47), (107,142,35), (143,188,143), (154,205,50)],
-    "stone":        [(120,120,120), (140,140,140), (110,110,110), (90,90,90)],
-    "gravel":       [(128,128,128), (153,153,153), (102,102,102), (77,77,77)],
-    "mud":          [(70,50,30), (60,40,20), (80,60,40), (100,80,60)],
-    "snow":         [(255,250,250), (240,248,255), (245,245,245), (230,230,230)],
-    "ice":          [(176,224,230), (173,216,230), (224,255,255), (240,255,255)],
-    "glass":        [(180,180,255), (200,200,255), (220,220,255), (240,240,255)],
-    "lava":         [(255,69,0), (255,140,0), (255,0,0), (139,0,0)],
-    "sand":         [(194,178,128), (238,214,175), (244,164,96), (210,180,140)],
-    "cliff":        [(139,137,137), (160,160,160), (190,190,190), (211,211,211)],
-    "snowy":        [(248,248,255), (240,255,255), (245,245,245), (230,230,230)],
-    "volcano":      [(139,0,0), (205,38,38), (255,69,0), (105,105,105)],
-    "river":        [(0,191,255), (30,144,255), (70,130,180), (25,25,112)],
-    "riverbank":    [(34,139,34), (50,205,50), (139,69,19), (210,180,140)],
-    "basalt":       [(70,70,70), (90,90,90), (50,50,50), (30,30,30)],
-    "marble":       [(220,220,220), (255,250,250), (245,245,245), (230,230,230)],
-    "metal":        [(192,192,192), (169,169,169), (128,128,128), (255,215,0)],
-    "iron":         [(188,188,188), (183,183,183), (160,160,160), (130,130,130)],
-    "gold":         [(255,215,0), (238,201,0), (218,165,32), (184,134,11)],
-    "silver":       [(192,192,192), (211,211,211), (169,169,169), (128,128,128)],
-    "lapis":        [(38,97,156), (25,25,112), (0,0,139), (0,0,205)],
-    "emerald":      [(0,201,87), (0,139,69), (0,255,127), (46,139,87)],
-    "diamond":      [(185,242,255), (224,255,255), (175,238,238), (176,224,230)],
-    "obsidian":     [(53,56,57), (35,38,39), (27,29,30), (70,70,90)],
-    "netherrack":   [(96,35,35), (125,45,45), (74,22,22), (50,10,10)],
-    "endstone":     [(218,210,158), (232,224,174), (211,203,146), (190,182,122)],
-    "pebble":       [(139,137,137), (160,160,160), (120,120,120), (105,105,105)],
-    "coral":        [(255,127,80), (255,160,122), (240,128,128), (233,150,122)],
-    "sponge":       [(255,255,128), (255,255,153), (240,230,140), (238,232,170)],
-    "kelp":         [(34,139,34), (0,128,0), (85,107,47), (46,139,87)],
-    "seaweed":      [(46,139,87), (0,100,0), (0,128,0), (60,179,113)],
-    "fossil":       [(210,180,140), (205,133,63), (222,184,135), (139,69,19)],
-    "boulder":      [(128,128,128), (105,105,105), (119,136,153), (112,128,144)],
-    "slate":        [(112,128,144), (47,79,79), (69,90,100), (70,70,70)],
-    "clay":         [(221,221,221), (205,201,201), (196,196,196), (169,169,169)],
-    "terra":        [(139,69,19), (160,82,45), (210,105,30), (188,143,143)],
-    "cobblestone":  [(120,120,120), (90,90,90), (100,100,100), (130,130,130)],
-    "brick":        [(178,34,34), (165,42,42), (139,0,0), (150,40,40)],
-    "roof":         [(139,69,19), (105,105,105), (165,42,42), (128,128,128)],
-    "wood":         [(139,69,19), (160,82,45), (205,133,63), (222,184,135)],
-    "plank":        [(181,101,29), (210,105,30), (153,76,0), (139,69,19)],
-    "tree":         [(34,139,34), (0,128,0), (139,69,19), (160,82,45)],
-    "leaves":       [(0,100,0), (34,139,34), (50,205,50), (107,142,35)],
-    "cactus":       [(0,100,0), (34,139,34), (60,179,113), (107,142,35)],
-    "mushroom":     [(139,69,19), (222,184,135), (255,0,0), (240,230,140)],
-    "fire":         [(255,0,0), (255,69,0), (255,140,0), (255,215,0)],
-    "magma":        [(255,69,0), (255,140,0), (220,20,60), (178,34,34)],
-    "acid":         [(173,255,47), (127,255,0), (202,255,112), (143,188,143)],
-    "poison":       [(127,255,0), (110,139,61), (50,205,50), (154,205,50)],
-    "toxic":        [(0,255,127), (46,139,87), (173,255,47), (127,255,0)],
-    "radioactive":  [(0,250,154), (0,255,127), (127,255,0), (189,183,107)],
-    "plague":       [(128,0,0), (139,0,0), (165,42,42), (178,34,34)],
-    "light":        [(255,255,224), (255,255,240), (250,250,210), (255,250,205)],
-    "dark":         [(25,25,25), (50,50,50), (75,75,75), (0,0,0)],
-    "shadow":       [(40,40,40), (60,60,60), (80,80,80), (0,0,0)],
-    "portal":       [(138,43,226), (75,0,130), (148,0,211), (153,50,204)],
-    "magic":        [(186,85,211), (218,112,214), (147,112,219), (138,43,226)],
-    "arcane":       [(72,61,139), (106,90,205), (123,104,238), (147,112,219)],
-    "rune":         [(225,225,255), (200,200,255), (175,175,230), (150,150,205)],
-    "glyph":        [(255,228,225), (255,240,245), (238,221,130), (218,112,214)],
-    "enchanted":    [(128,0,128), (186,85,211), (216,191,216), (199,21,133)],
-    "fairy":        [(255,182,193), (255,192,203), (255,228,225), (255,240,245)],
-    "pixie":        [(255,228,225), (255,182,193), (255,105,180), (255,20,147)],
-    "sprite":       [(173,216,230), (135,206,250), (135,206,235), (176,196,222)],
-    "spirit":       [(211,211,255), (170,170,255), (192,192,192), (224,255,255)],
-    "ghost":        [(245,245,245), (230,230,230), (211,211,211), (192,192,192)],
-    "grave":        [(60,60,60), (45,45,45), (30,30,30), (90,90,90)],
-    "tomb":         [(70,70,70), (100,100,100), (130,130,130), (153,153,153)],
-    "crypt":        [(50,50,50), (70,70,70), (90,90,90), (100,100,100)],
-    "bone":         [(245,245,220), (255,228,196), (255,239,213), (240,230,140)],
-    "skull":        [(215,215,215), (192,192,192), (169,169,169), (245,245,245)],
-    "flesh":        [(255,160,122), (255,127,80), (255,99,71), (250,128,114)],
-    "blood":        [(139,0,0), (178,34,34), (220,20,60), (255,0,0)],
-    "carrion":      [(128,0,0), (139,0,0), (165,42,42), (178,34,34)],
-    "sandstone":    [(216,179,140), (237,201,175), (255,228,196), (210,180,140)],
-    "limestone":    [(230,230,220), (224,224,214), (211,211,185), (200,200,175)],
-    "granite":      [(143,143,143), (155,155,155), (165,168,170), (175,175,175)],
-    "meteor":       [(105,105,105), (119,136,153), (128,128,128), (178,34,34)],
-    "asteroid":     [(70,70,70), (90,90,90), (110,110,110), (130,130,130)],
-    "cosmic":       [(72,61,139), (75,0,130), (106,90,205), (123,104,238)],
-    "star":         [(255,255,224), (255,250,205), (240,230,140), (255,215,0)],
-    "nebula":       [(147,112,219), (138,43,226), (186,85,211), (218,112,214)],
-    "galaxy":       [(25,25,112), (72,61,139), (106,90,205), (138,43,226)],
-    "planet":       [(154,205,50), (233,150,122), (210,105,30), (160,82,45)],
-    "grassland":    [(124,252,0), (127,255,0), (0,250,154), (50,205,50)],
-    "savanna":      [(210,180,140), (222,184,135), (238,232,170), (189,183,107)],
-    "jungle":       [(0,100,0), (34,139,34), (85,107,47), (46,139,87)],
-    "rainforest":   [(34,139,34), (0,128,0), (60,179,113), (123,153,34)],
-    "wetland":      [(107,142,35), (154,205,50), (0,191,255), (70,130,180)],
-    "swamp":        [(47,79,79), (85,107,47), (50,205,50), (0,100,0)],
-    "bog":          [(80,100,60), (70,80,50), (85,107,47), (65,80,45)],
-    "marsh":        [(100,120,70), (90,110,60), (107,142,35), (154,205,50)],
-    "tundra":       [(230,230,250), (240,255,255), (245,245,245), (220,220,220)],
-    "iceberg":      [(173,216,230), (224,255,255), (240,255,255), (176,224,230)],
-    "frozen":       [(176,224,230), (173,216,230), (224,255,255), (220,220,255)],
-    "arctic":       [(245,245,255), (240,255,255), (230,230,250), (255,250,250)],
-    "underwater":   [(0,105,148), (0,128,255), (70,130,180), (25,25,112)],
-    "deepsea":      [(25,25,112), (0,0,128), (0,0,139), (0,100,160)],
-    "reef":         [(255,160,122), (255,127,80), (46,139,87), (0,128,128)],
-    "shore":        [(210,180,140), (238,214,175), (70,130,180), (25,25,112)],
-    "beach":        [(238,214,175), (222,184,135), (240,230,140), (70,130,180)],
-    "volcanic":     [(105,105,105), (139,0,0), (205,38,38), (70,70,70)],
-    "ash":          [(80,80,80), (100,100,100), (120,120,120), (140,140,140)],
-    "charred":      [(60,60,60), (80,80,80), (100,100,100), (120,120,120)],
-    "burnt":        [(139,69,19), (160,82,45), (105,105,105), (70,70,70)],
-    "crystal":      [(224,255,255), (175,238,238), (176,224,230), (173,216,230)],
-    "ruby":         [(224,17,95), (227,11,93), (178,34,34), (139,0,0)],
-    "sapphire":     [(15,82,186), (0,0,139), (25,25,112), (0,0,205)],
-    "amethyst":     [(153,102,204), (138,43,226), (186,85,211), (123,104,238)],
-    "quartz":       [(255,255,255), (245,245,245), (240,240,240), (230,230,230)],
-    "opal":         [(168,195,188), (178,223,238), (224,255,255), (152,251,152)],
-    "pearl":        [(234,224,200), (255,239,219), (255,245,238), (245,245,245)],
-    "enigma":       [(75,0,130), (106,90,205), (72,61,139), (128,0,128)],
-    "mystic":       [(138,43,226), (148,0,211), (186,85,211), (153,50,204)],
-    "mythic":       [(199,21,133), (218,112,214), (255,105,180), (219,112,147)],
-    "legend":       [(255,215,0), (238,221,130), (189,183,107), (218,165,32)],
-    "relic":        [(184,134,11), (218,165,32), (205,133,63), (139,69,19)],
-    "artifact":     [(220,220,220), (245,245,245), (192,192,192), (255,250,240)],
-    "ancient":      [(205,133,63), (160,82,45), (139,69,19), (110,40,19)],
-    "future":       [(192,192,192), (211,211,211), (60,60,60), (128,128,128)],
-    "cyber":        [(0,255,255), (0,250,154), (127,255,212), (0,255,127)],
-    "tech":         [(105,105,105), (128,128,128), (192,192,192), (220,220,220)],
-    "robotic":      [(200,200,200), (169,169,169), (105,105,105), (255,215,0)],
-    "mechanical":   [(139,137,137), (160,160,160), (190,190,190), (218,165,32)],
-    "steam":        [(169,169,169), (211,211,211), (192,192,192), (205,201,201)],
-    "clockwork":    [(205,201,201), (192,192,192), (218,165,32), (184,134,11)],
-    "brass":        [(181,166,66), (205,127,50), (184,134,11), (218,165,32)],
-    "ironwork":     [(188,188,188), (169,169,169), (192,192,192), (128,128,128)],
-    "wire":         [(90,90,90), (130,130,130), (160,160,160), (192,192,192)],
-    "circuit":      [(0,255,127), (127,255,0), (46,139,87), (60,179,113)],
-    "chip":         [(192,192,192), (128,128,128), (72,61,139), (255,255,224)],
-    "binary":       [(0,0,0), (255,255,255), (32,32,32), (224,224,224)],
-    "digital":      [(0,255,255), (127,255,212), (255,255,0), (124,252,0)],
-    "virtual":      [(186,85,211), (147,112,219), (0,255,255), (173,216,230)],
-    "hologram":     [(102,205,170), (0,255,255), (127,255,212), (0,206,209)],
-    "mirror":       [(245,245,245), (224,224,224), (211,211,211), (192,192,192)],
-    "glassland":    [(180,180,255), (200,200,255), (220,220,255), (240,240,255)],
-    "translucent":  [(255,255,255), (240,248,255), (224,255,255), (248,248,255)],
-    "phantom":      [(119,136,153), (105,105,105), (40,40,40), (70,70,70)],
-    "ethereal":     [(224,255,255), (255,250,240), (250,240,230), (230,230,250)],
-    "celestial":    [(135,206,235), (176,196,222), (220,220,255), (192,192,255)],
-    "astral":       [(123,104,238), (106,90,205), (72,61,139), (138,43,226)],
-    "heaven":       [(240,255,255), (224,255,255), (255,255,240), (255,250,250)],
-    "hell":         [(139,0,0), (178,34,34), (255,0,0), (70,70,70)],
-    "demon":        [(178,34,34), (139,0,0), (70,70,70), (40,40,40)],
-    "angel":        [(255,255,224), (255,250,205), (245,245,245), (224,255,255)],
-    "seraph":       [(255,245,238), (255,250,250), (230,230,250), (255,250,205)],
-    "dragon":       [(139,0,0), (205,38,38), (85,107,47), (46,139,87)],
-    "wyvern":       [(46,139,87), (0,128,128), (60,179,113), (34,139,34)],
-    "drake":        [(128,0,0), (178,34,34), (50,50,50), (60,60,60)],
-    "hydra":        [(0,100,0), (0,139,139), (60,179,113), (107,142,35)],
-    "serpent":      [(0,128,128), (0,100,0), (85,107,47), (128,0,0)],
-    "worm":         [(160,82,45), (139,69,19), (128,0,0), (184,134,11)],
-    "golem":        [(100,100,100), (130,130,130), (160,160,160), (70,70,70)],
-    "construct":    [(139,137,137), (120,120,120), (90,90,90), (180,180,180)],
-    "automaton":    [(192,192,192), (169,169,169), (128,128,128), (105,105,105)],
-    "puppet":       [(210,180,140), (139,69,19), (160,82,45), (100,80,60)],
-    "homunculus":   [(255,160,122), (205,133,63), (139,69,19), (178,34,34)],
-    "borg":         [(128,128,128), (192,192,192), (0,255,0), (0,128,0)],
-    "biomech":      [(139,69,19), (160,82,45), (192,192,192), (128,128,128)],
-    "biotech":      [(107,142,35), (0,128,0), (127,255,0), (60,179,113)],
-    "gene":         [(144,238,144), (152,251,152), (124,252,0), (0,255,127)],
-    "DNA":          [(255,0,255), (186,85,211), (147,112,219), (138,43,226)],
-    "virus":        [(128,0,0), (178,34,34), (220,20,60), (255,69,0)],
-    "bacteria":     [(189,183,107), (143,188,143), (127,255,0), (173,255,47)],
-    "fungus":       [(139,69,19), (222,184,135), (154,205,50), (107,142,35)],
-    "algae":        [(0,128,128), (0,100,0), (34,139,34), (46,139,87)],
-    "lichen":       [(107,142,35), (143,188,143), (154,205,50), (85,107,47)],
-    "mold":         [(96,128,56), (85,107,47), (110,139,61), (34,139,34)],
-    "yeast":        [(255,255,224), (255,250,205), (255,245,238), (253,245,230)],
-    "petri":        [(211,211,211), (255,255,224), (127,255,212), (127,255,0)],
-    "lab":          [(192,192,192), (211,211,211), (220,220,220), (240,248,255)],
-    "science":      [(173,216,230), (176,196,222), (224,255,255), (0,255,255)],
-    "alchemy":      [(238,221,130), (218,165,32), (184,134,11), (245,245,220)],
-    "potion":       [(255,20,147), (218,112,214), (186,85,211), (147,112,219)],
-    "tonic":        [(0,255,127), (60,179,113), (127,255,212), (255,105,180)],
-    "elixir":       [(255,69,0), (255,140,0), (0,255,255), (173,216,230)],
-    "brew":         [(139,69,19), (160,82,45), (222,184,135), (210,105,30)],
-    "mix":          [(255,192,203), (219,112,147), (186,85,211), (0,255,127)],
-    "amalgam":      [(255,215,0), (255,140,0), (220,20,60), (138,43,226)]
-}
+from generator import (TILE_COLOR_DICTIONARY, TILE_SIZES, get_color_palette,
+                       generate_16x16_tile_with_pattern, generate_tile_layout,
+                       render_tile_layout)
+from gameboy import DITHER_MODES, PALETTES, gameboyize_image, parse_palette, write_gb_assets
+from project import load_project, save_project
+from shapes import shape_cells, stroke_cells
+from tilemap import (EMPTY, GridSwap, MapEdit, MapHistory, TilePixels, TileRegistry,
+                     export_map_png, fit_grid, flood_fill, new_grid, remap_tiles)
+
+# The map canvas shows chunks of about CHUNK_PX x CHUNK_PX pixels, each one
+# canvas image composited from its cells. Only chunks in the viewport, plus
+# CHUNK_MARGIN chunks around it, exist on the canvas.
+CHUNK_PX = 512
+CHUNK_MARGIN = 1
+MAP_VIEW_PX = 800   # largest canvas size the window asks for
+ZOOM_LEVELS = (0.25, 0.5, 1, 2, 4, 8)
+# Tiles pre-scaled for the display are cached per zoom level: the most
+# recently used levels are kept, each within a byte budget.
+ZOOM_CACHE_LEVELS = 3
+ZOOM_CACHE_BYTES = 32 * 1024 * 1024
+# A chunk with more changed cells than this is recomposited as a whole
+# instead of having each cell copied into it.
+CELL_BLIT_MAX = 64
+# Tile photos kept between passes for copying single cells.
+BLIT_PHOTOS_KEPT = 16
+PROJECT_EXT = ".tgp"
+# Changed maps are saved in the background this often; a running save is
+# checked on every AUTOSAVE_POLL_MS.
+AUTOSAVE_MS = 60 * 1000
+AUTOSAVE_POLL_MS = 100
 
 # -----------------------------------------------------------------------------
 # 2) Utility Functions
 # -----------------------------------------------------------------------------
 
-import math
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser
-from PIL import Image, ImageTk, ImageDraw
-import copy
+from PIL import Image, ImageTk
 
-# from patterns import PATTERN_GENERATORS
-# from your_dictionary_module import TILE_COLOR_DICTIONARY
-#   (We assume the big dictionary is defined above.)
 
-def get_color_palette(word: str):
+def is_mapped(array):
     """
-    Return 4-color palette for a word or default to 'grass' if not found.
+    True when array's data lives in a memory-mapped file, e.g. a layer
+    load_project mapped.
     """
-    return TILE_COLOR_DICTIONARY.get(word.lower(), TILE_COLOR_DICTIONARY["grass"])
+    base=array
+    while base is not None:
+        if isinstance(base,(np.memmap,mmap.mmap)):
+            return True
+        base=getattr(base,"base",None)
+    return False
 
-def generate_16x16_tile_with_pattern(palette,
-                                     pattern_name="solid",
-                                     hue_shift=0.0,
-                                     sat_mult=1.0,
-                                     val_mult=1.0):
+
+class PhotoCache:
     """
-    Generate a 16x16 Pillow Image using the specified pattern & adjusted palette.
+    Shared, reference-counted PhotoImages. Every canvas item showing the
+    same key (e.g. a tile id at a cell size) uses one PhotoImage; it is
+    released when the last item using it lets go.
     """
-    from colorsys import rgb_to_hsv, hsv_to_rgb
 
-    tile = Image.new("RGB", (16,16))
-    draw = ImageDraw.Draw(tile)
+    def __init__(self):
+        self._photos = {}  # key -> [PhotoImage, refcount]
 
-    adjusted = []
-    for (r,g,b) in palette:
-        h,s,v = rgb_to_hsv(r/255,g/255,b/255)
-        h=(h+hue_shift)%1.0
-        s=min(max(s*sat_mult,0),1)
-        v=min(max(v*val_mult,0),1)
-        nr,ng,nb = hsv_to_rgb(h,s,v)
-        adjusted.append((int(nr*255),int(ng*255),int(nb*255)))
+    def acquire(self, key, make_image):
+        """
+        The PhotoImage for key, built from make_image() on first use.
+        Pair every acquire with a release.
+        """
+        entry = self._photos.get(key)
+        if entry is None:
+            entry = self._photos[key] = [ImageTk.PhotoImage(make_image()), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, key):
+        entry = self._photos.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._photos[key]
 
-    from patterns import PATTERN_GENERATORS
-    pattern_func = PATTERN_GENERATORS.get(pattern_name.lower(), PATTERN_GENERATORS["solid"])
-    pattern_func(draw, adjusted)
-    return tile
+    def clear(self):
+        self._photos.clear()
 
+    def __len__(self):
+        return len(self._photos)
 
 # -----------------------------------------------------------------------------
 # Pixel Editor with Full Tools
@@ -266,7 +123,7 @@ def generate_16x16_tile_with_pattern(palette,
 
 class TileEditorWithTools(tk.Toplevel):
     """
-    A 'mini map editor' for a single 16×16 tile:
+    A 'mini map editor' for a single tile (16×16 by default, any square size):
       - Tools: paint, erase, select, bucket, line, rect, circle, sampler
       - Continuous paint
       - Floating tile cursor for paint (optionally not for sampler, to match your design)
@@ -282,29 +139,33 @@ class TileEditorWithTools(tk.Toplevel):
     TOOL_CIRCLE  = "⚪"
     TOOL_SAMPLER = "👁️"
 
+    # Undo history budget; steps store only the pixels they changed.
+    HISTORY_BYTES = 8 * 1024 * 1024
+
     def __init__(self, parent, tile_pil, on_save_callback):
         """
         parent: main window
-        tile_pil: 16x16 PIL Image (RGB)
+        tile_pil: square PIL Image (RGB); 8, 16, 32 or 64 px
         on_save_callback: function(new_pil) -> saves result
         """
         super().__init__(parent)
         self.title("Tile Editor - Full Tools")
         self.resizable(False, False)
 
-        # Keep a local 16x16 "map_data" approach?
+        # Keep a local per-pixel "map_data" approach?
         # We can store each pixel as a (r,g,b). For simplicity, store just a PIL Image.
         self.tile_pil = tile_pil.convert("RGB").copy()
         self.on_save_callback = on_save_callback
 
-        # We'll have an internal canvas 16*16 "pixel_size" => let's do 20 px per pixel
-        self.pixel_size = 20
-        self.width_px = 16
-        self.height_px = 16
+        # The editor canvas stays around 320px wide: 20 px per pixel for a 16x16
+        # tile, down to 5 px per pixel for 64x64.
+        self.width_px, self.height_px = self.tile_pil.size
+        self.pixel_size = max(5, 320 // max(self.width_px, self.height_px))
 
         # Tools
         self.current_tool = tk.StringVar(value=self.TOOL_PAINT)
         self.stroke_width_var = tk.IntVar(value=1)
+        self.shape_filled_var = tk.BooleanVar(value=False)
         # We can do "select" or "sampler" if we like, but let's keep them minimal or replicate.
 
         self.selected_color = (255,0,0)  # default painting color
@@ -315,9 +176,8 @@ class TileEditorWithTools(tk.Toplevel):
         self.selected_cells = set()
         self.shift_down = False  # if user wants line from last click, etc. we can do advanced?
 
-        # We'll store an internal "undo_stack" for the tile. Or keep it simpler?
-        self.undo_stack = []
-        self.redo_stack = []
+        # Undo history of changed pixels (old/new RGB per pixel, per stroke)
+        self.history = MapHistory(max_bytes=self.HISTORY_BYTES, dtype=np.uint8)
 
         # Build UI
         self.create_widgets()
@@ -326,9 +186,6 @@ class TileEditorWithTools(tk.Toplevel):
         # Keybind
         self.setup_keybindings()
 
-        # record initial state
-        self.record_undo()
-
     def create_widgets(self):
         top_frame = tk.Frame(self)
         top_frame.pack(side=tk.TOP, fill=tk.X)
@@ -344,6 +201,7 @@ class TileEditorWithTools(tk.Toplevel):
         # stroke
         tk.Label(top_frame, text="Stroke:").pack(side=tk.LEFT)
         tk.Spinbox(top_frame, from_=1, to=10, textvariable=self.stroke_width_var, width=3).pack(side=tk.LEFT)
+        tk.Checkbutton(top_frame, text="Filled", variable=self.shape_filled_var).pack(side=tk.LEFT)
 
         # color pick
         tk.Button(top_frame, text="Pick Color", command=self.pick_color).pack(side=tk.LEFT, padx=5)
@@ -382,32 +240,40 @@ class TileEditorWithTools(tk.Toplevel):
 
     def load_tile_into_canvas(self):
         """
-        Draw each pixel as a small rectangle.
+        Draw each pixel as a small rectangle. Later edits recolor these
+        rectangles in place (see _set_pixel_color).
         """
         self.canvas.delete("all")
+        self.cursor_ghost_id = None
         pix = self.tile_pil.load()
-        for y in range(16):
-            for x in range(16):
+        self.pixel_items = []
+        for y in range(self.height_px):
+            row = []
+            for x in range(self.width_px):
                 color = pix[x,y]
                 x0 = x*self.pixel_size
                 y0 = y*self.pixel_size
                 x1 = x0+self.pixel_size
                 y1 = y0+self.pixel_size
-                self.canvas.create_rectangle(x0,y0,x1,y1,
-                                             fill=self._rgb_to_hex(color),
-                                             outline="", tags="pixel")
+                row.append(self.canvas.create_rectangle(x0,y0,x1,y1,
+                                                        fill=self._rgb_to_hex(color),
+                                                        outline="", tags="pixel"))
+            self.pixel_items.append(row)
 
     def _update_pixel(self, x, y, color):
         """
-        Set pixel x,y to color in self.tile_pil, update canvas.
+        Set pixel x,y to color in self.tile_pil, update canvas, and note the
+        change for undo.
         """
-        if x<0 or x>=16 or y<0 or y>=16: return
-        self.tile_pil.putpixel((x,y), color)
-        x0 = x*self.pixel_size
-        y0 = y*self.pixel_size
-        x1 = x0+self.pixel_size
-        y1 = y0+self.pixel_size
-        self.canvas.create_rectangle(x0,y0,x1,y1, fill=self._rgb_to_hex(color), outline="")
+        if x<0 or x>=self.width_px or y<0 or y>=self.height_px: return
+        old = self.tile_pil.getpixel((x,y))
+        if old==color: return
+        self.history.touch(y, x, old, color)
+        self._set_pixel_color(x, y, color)
+
+    def _set_pixel_color(self, x, y, color):
+        self.tile_pil.putpixel((x,y), tuple(color))
+        self.canvas.itemconfig(self.pixel_items[y][x], fill=self._rgb_to_hex(color))
 
     def on_canvas_click(self, event):
         px,py = event.x, event.y
@@ -418,15 +284,14 @@ class TileEditorWithTools(tk.Toplevel):
             self.shape_start_cell=(cx,cy)
             return
 
-        if not (0<=cx<16 and 0<=cy<16):
+        if not (0<=cx<self.width_px and 0<=cy<self.height_px):
             return
 
+        # Paint and erase strokes become one undo step on release.
         if tool==self.TOOL_PAINT:
             self._do_paint_pixel(cx,cy)
-            self.record_undo()
         elif tool==self.TOOL_ERASE:
             self._do_erase_pixel(cx,cy)
-            self.record_undo()
         elif tool==self.TOOL_SELECT:
             # not super meaningful in a single tile context,
             # but we can store selected pixel in a set.
@@ -448,7 +313,7 @@ class TileEditorWithTools(tk.Toplevel):
         if tool in (self.TOOL_LINE,self.TOOL_RECT,self.TOOL_CIRCLE):
             return
 
-        if 0<=cx<16 and 0<=cy<16 and (cx,cy)!=self.last_cell:
+        if 0<=cx<self.width_px and 0<=cy<self.height_px and (cx,cy)!=self.last_cell:
             if tool==self.TOOL_PAINT:
                 self._do_paint_pixel(cx,cy)
             elif tool==self.TOOL_ERASE:
@@ -470,6 +335,8 @@ class TileEditorWithTools(tk.Toplevel):
                 self._do_shape(tool, sx,sy, cx,cy)
                 self.record_undo()
             self.shape_start_cell=None
+        if self.history.pending:
+            self.record_undo()
         self.last_cell=None
 
     def on_canvas_motion(self,event):
@@ -498,28 +365,21 @@ class TileEditorWithTools(tk.Toplevel):
     # Paint / Erase / Bucket / shape
     # -------------------------------------------------------------------------
     def _do_paint_pixel(self,x,y):
-        stroke = self.stroke_width_var.get()
-        rad = (stroke-1)//2
-        for dy in range(-rad,rad+1):
-            for dx in range(-rad,rad+1):
-                nx, ny = x+dx, y+dy
-                if 0<=nx<16 and 0<=ny<16:
-                    self._update_pixel(nx,ny,self.selected_color)
+        self._stamp(x,y,self.selected_color)
 
     def _do_erase_pixel(self,x,y):
-        stroke=self.stroke_width_var.get()
-        rad=(stroke-1)//2
-        for dy in range(-rad,rad+1):
-            for dx in range(-rad,rad+1):
-                nx, ny = x+dx,y+dy
-                if 0<=nx<16 and 0<=ny<16:
-                    self._update_pixel(nx,ny,(255,255,255))  # "erasing" => set to white?
+        self._stamp(x,y,(255,255,255))  # "erasing" => set to white?
+
+    def _stamp(self,x,y,color):
+        ys,xs=stroke_cells([y],[x],self.stroke_width_var.get(),self.width_px,self.height_px)
+        for py,px in zip(ys.tolist(),xs.tolist()):
+            self._update_pixel(px,py,color)
 
     def _do_bucket(self,cx,cy):
         orig = self.tile_pil.getpixel((cx,cy))
         if orig==self.selected_color:
             return
-        w,h=16,16
+        w,h=self.width_px,self.height_px
         st=[(cx,cy)]
         visited=set()
         while st:
@@ -536,104 +396,43 @@ class TileEditorWithTools(tk.Toplevel):
                     st.append((x,y+1))
 
     def _do_shape(self, tool, sx,sy, ex,ey):
-        stroke=self.stroke_width_var.get()
-        if tool==self.TOOL_LINE:
-            self._draw_line(sx,sy,ex,ey,stroke)
-        elif tool==self.TOOL_RECT:
-            self._draw_rect(sx,sy,ex,ey,stroke)
-        elif tool==self.TOOL_CIRCLE:
-            self._draw_circle(sx,sy,ex,ey,stroke)
-
-    def _draw_line(self,sx,sy,ex,ey,stroke):
-        dx=abs(ex-sx)
-        dy=abs(ey-sy)
-        x,y=sx,sy
-        sxn=1 if ex>sx else -1
-        syn=1 if ey>sy else -1
-        err=dx-dy
-        rad=(stroke-1)//2
-        while True:
-            for rdy in range(-rad,rad+1):
-                for rdx in range(-rad,rad+1):
-                    nx=x+rdx
-                    ny=y+rdy
-                    if 0<=nx<16 and 0<=ny<16:
-                        self._update_pixel(nx,ny,self.selected_color)
-            if x==ex and y==ey:
-                break
-            e2=2*err
-            if e2> -dy:
-                err-=dy
-                x+=sxn
-            if e2< dx:
-                err+=dx
-                y+=syn
-
-    def _draw_rect(self,sx,sy,ex,ey,stroke):
-        x1,y1=min(sx,ex), min(sy,ey)
-        x2,y2=max(sx,ex), max(sy,ey)
-        rad=(stroke-1)//2
-        def paint_cell(cx,cy):
-            if 0<=cx<16 and 0<=cy<16:
-                self._update_pixel(cx,cy,self.selected_color)
-        for cx in range(x1,x2+1):
-            for thick in range(-rad,rad+1):
-                paint_cell(cx,y1+thick)
-                paint_cell(cx,y2+thick)
-        for cy in range(y1,y2+1):
-            for thick in range(-rad,rad+1):
-                paint_cell(x1+thick,cy)
-                paint_cell(x2+thick,cy)
-
-    def _draw_circle(self,sx,sy,ex,ey,stroke):
-        x1,y1=min(sx,ex),min(sy,ey)
-        x2,y2=max(sx,ex),max(sy,ey)
-        w=x2-x1
-        h=y2-y1
-        cx=(x1+x2)/2
-        cy=(y1+y2)/2
-        rx=w/2
-        ry=h/2
-        rad=(stroke-1)//2
-        steps=int(360*max(w,h))
-        for step in range(steps+1):
-            if steps==0: break
-            theta=2*math.pi*step/steps
-            fx=cx+rx*math.cos(theta)
-            fy=cy+ry*math.sin(theta)
-            tx,ty=int(round(fx)),int(round(fy))
-            for rdy in range(-rad,rad+1):
-                for rdx in range(-rad,rad+1):
-                    nx=tx+rdx
-                    ny=ty+rdy
-                    if 0<=nx<16 and 0<=ny<16:
-                        self._update_pixel(nx,ny,self.selected_color)
+        shape={self.TOOL_LINE:"line",self.TOOL_RECT:"rect",self.TOOL_CIRCLE:"ellipse"}[tool]
+        ys,xs=shape_cells(shape,sx,sy,ex,ey,self.width_px,self.height_px,
+                          stroke=self.stroke_width_var.get(),filled=self.shape_filled_var.get())
+        for y,x in zip(ys.tolist(),xs.tolist()):
+            self._update_pixel(x,y,self.selected_color)
 
     # -------------------------------------------------------------------------
     # Undo/Redo
     # -------------------------------------------------------------------------
     def record_undo(self):
-        st = self.tile_pil.copy()
-        self.undo_stack.append(st)
-        self.redo_stack.clear()
+        """
+        Close the current stroke: its changed pixels become one undo step.
+        """
+        self.history.commit()
 
     def on_undo(self,e=None):
-        if len(self.undo_stack)>1:
-            self.redo_stack.append(self.undo_stack.pop())
-            top = self.undo_stack[-1]
-            self.tile_pil=top.copy()
-            self.load_tile_into_canvas()
-        else:
+        self.record_undo()
+        step = self.history.undo()
+        if step is None:
             messagebox.showinfo("Undo","No more steps.")
+            return
+        self._replay(step.ys, step.xs, step.old)
 
     def on_redo(self,e=None):
-        if self.redo_stack:
-            st = self.redo_stack.pop()
-            self.undo_stack.append(self.tile_pil.copy())
-            self.tile_pil=st.copy()
-            self.load_tile_into_canvas()
-        else:
+        self.record_undo()
+        step = self.history.redo()
+        if step is None:
             messagebox.showinfo("Redo","No redo steps available.")
+            return
+        self._replay(step.ys, step.xs, step.new)
+
+    def _replay(self, ys, xs, colors):
+        """
+        Write a step's pixels back, touching only those canvas rectangles.
+        """
+        for y, x, color in zip(ys.tolist(), xs.tolist(), colors.tolist()):
+            self._set_pixel_color(x, y, color)
 
     # -------------------------------------------------------------------------
     # Save / Cancel
@@ -663,7 +462,7 @@ class TileGeneratorApp(tk.Tk):
     - Arrow keys => cycle dictionary words (word_var).
     - Undo/Redo with Cmd+Z/Cmd+Shift+Z.
     - "Gameboy-ize" button.
-    - "Edit Selected Tile" button in Recent Tiles => opens PixelEditor for 16x16 edit.
+    - "Edit Selected Tile" button in Recent Tiles => opens PixelEditor for pixel-level edits.
     """
 
     def __init__(self):
@@ -691,6 +490,14 @@ class TileGeneratorApp(tk.Tk):
         self.val_var = tk.DoubleVar(value=1.0)
 
         self.generated_tile_pil = None
+        self.generated_seed = None
+        # Index map + source palette of the last generated tile, so the
+        # Hue/Sat/Val sliders only recolor it instead of regenerating.
+        self.generated_layout = None
+        self.generated_palette = None
+        self.generated_pattern = None
+        self.generated_size = None
+        self._recolor_pending = False
 
         self.recent_tiles = []
         self.selected_recent_tile_index = None
@@ -703,7 +510,20 @@ class TileGeneratorApp(tk.Tk):
         self.tile_size = 16
         self.map_width = 16
         self.map_height = 16
-        self.map_data = [[None for _ in range(self.map_width)] for _ in range(self.map_height)]
+        # The map is a grid of tile ids into self.tileset (see tilemap.py).
+        # It is drawn as chunks of cells, one canvas image per chunk:
+        # map_chunks maps (chunk row, chunk col) -> (PhotoImage, canvas item)
+        # and dirty_chunks maps a chunk waiting to be updated to its changed
+        # cells, or None to recomposite the whole chunk.
+        # zoom_cache maps a cell size on screen to its TilePixels.
+        self.tileset = TileRegistry()
+        self.map_grid = new_grid(self.map_width, self.map_height)
+        self.zoom = 1
+        self.zoom_cache = OrderedDict()
+        self.map_pixels = None
+        self.map_chunks = {}
+        self.dirty_chunks = {}
+        self._chunk_flush_pending = False
 
         self.shift_down = False
         self.ctrl_down = False
@@ -711,23 +531,46 @@ class TileGeneratorApp(tk.Tk):
 
         self.dragging_multi = False
         self.drag_origin_cell = None
-        self.drag_ghost_ids = []
+        self.drag_ghost_ids = []  # (canvas item, photo key)
         self.multi_offsets = []
         self.last_cell = None
         self.shape_start_cell = None
         self.stroke_width_var = tk.IntVar(value=1)
+        self.shape_filled_var = tk.BooleanVar(value=False)
 
         # Cursor ghost
         self.cursor_ghost_id = None
-
-        # Undo/Redo
-        self.undo_stack = []
-        self.redo_stack = []
+        self.cursor_ghost_key = None
+
+        # Tile images shown by canvas items (ghosts), one per tile and zoom
+        self.photos = PhotoCache()
+        # Tile photos recently copied into chunks, by photo key, held so
+        # that repeated blits of a tile convert it once (see _blit_cell)
+        self.blit_photos = OrderedDict()
+
+        # Undo/Redo: cell diffs of the id grid, capped in memory (see tilemap.MapHistory)
+        self.history = MapHistory()
+        # Cell writes not yet applied to map_grid (see begin_map_edit)
+        self.map_edit = MapEdit()
+
+        # The project file last saved or opened, and any layers of it other
+        # than the map (kept as loaded and saved back while their size fits)
+        self.project_path = None
+        self.extra_layers = {}
+        # Background autosave: map_revision counts map changes, and the grid
+        # a running save reads (_autosave_grid) is copied before the next
+        # write to it (see _own_map_grid), so taking the snapshot is free.
+        self.map_revision = 0
+        self.saved_revision = 0
+        self._autosave_thread = None
+        self._autosave_grid = None
+        self._autosave_revision = 0
+        self._autosave_progress = 0.0
+        self._autosave_error = None
 
         self.create_widgets()
         self.setup_keybindings()
-
-        self.record_undo_state()  # initial state in undo stack
+        self.after(AUTOSAVE_MS, self.autosave_tick)
 
     # -------------------------------------------------------------------------
     # UI
@@ -769,17 +612,17 @@ class TileGeneratorApp(tk.Tk):
         tk.Label(frame, text="Hue Shift:").grid(row=2, column=0, sticky="e")
         ttk.Scale(frame, from_=0.0, to=1.0, variable=self.hue_shift_var,
                   orient="horizontal", length=100,
-                  command=lambda x: self.update_preview()).grid(row=2, column=1)
+                  command=lambda x: self.schedule_recolor()).grid(row=2, column=1)
 
         tk.Label(frame, text="Sat Mult:").grid(row=3, column=0, sticky="e")
         ttk.Scale(frame, from_=0.0, to=2.0, variable=self.sat_var,
                   orient="horizontal", length=100,
-                  command=lambda x: self.update_preview()).grid(row=3, column=1)
+                  command=lambda x: self.schedule_recolor()).grid(row=3, column=1)
 
         tk.Label(frame, text="Val Mult:").grid(row=4, column=0, sticky="e")
         ttk.Scale(frame, from_=0.0, to=2.0, variable=self.val_var,
                   orient="horizontal", length=100,
-                  command=lambda x: self.update_preview()).grid(row=4, column=1)
+                  command=lambda x: self.schedule_recolor()).grid(row=4, column=1)
 
         # Generate
         tk.Button(frame, text="Generate", command=self.generate_tile).grid(row=5, column=0, columnspan=2, pady=4)
@@ -826,6 +669,15 @@ class TileGeneratorApp(tk.Tk):
         tk.Label(frame, text="Stroke Width:").grid(row=1, column=0, sticky="e")
         tk.Spinbox(frame, from_=1, to=10, textvariable=self.stroke_width_var, width=5).grid(row=1, column=1, padx=2)
 
+        tk.Checkbutton(frame, text="Filled shapes", variable=self.shape_filled_var).grid(row=3, column=4, columnspan=3, sticky="w")
+
+        # bucket: contiguous region or every matching tile, optionally capped
+        self.bucket_replace_all_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame, text="Bucket: replace all", variable=self.bucket_replace_all_var).grid(row=1, column=2, columnspan=2, sticky="w")
+        tk.Label(frame, text="Fill cap (0=none):").grid(row=1, column=4, columnspan=2, sticky="e")
+        self.fill_cap_var = tk.IntVar(value=0)
+        tk.Spinbox(frame, from_=0, to=1000000, increment=100, textvariable=self.fill_cap_var, width=8).grid(row=1, column=6, columnspan=2, padx=2, sticky="w")
+
         # map dims
         tk.Label(frame, text="Width (tiles):").grid(row=2, column=0, sticky="e")
         self.map_width_var = tk.IntVar(value=16)
@@ -837,13 +689,51 @@ class TileGeneratorApp(tk.Tk):
 
         tk.Button(frame, text="Resize Map", command=self.resize_map).grid(row=2, column=4, padx=5)
 
+        # zoom (view only)
+        tk.Label(frame, text="Zoom:").grid(row=3, column=2, sticky="e")
+        self.zoom_var = tk.StringVar(value="100%")
+        zoom_box = ttk.Combobox(frame, textvariable=self.zoom_var, state="readonly", width=5,
+                                values=["{:g}%".format(z*100) for z in ZOOM_LEVELS])
+        zoom_box.grid(row=3, column=3, padx=2, sticky="w")
+        zoom_box.bind("<<ComboboxSelected>>", self.on_zoom_changed)
+
+        # tile size: Generate uses it right away; the map switches to it on Resize Map
+        tk.Label(frame, text="Tile Size (px):").grid(row=3, column=0, sticky="e")
+        self.tile_size_var = tk.IntVar(value=self.tile_size)
+        ttk.Combobox(frame, textvariable=self.tile_size_var, values=TILE_SIZES,
+                     state="readonly", width=5).grid(row=3, column=1, padx=2, sticky="w")
+
         # export map
-        tk.Button(frame, text="Export Map to PNG", command=self.export_map).grid(row=3, column=0, columnspan=5, pady=4)
+        tk.Button(frame, text="Export Map to PNG", command=self.export_map).grid(row=4, column=0, columnspan=5, pady=4)
+        self.export_progress = ttk.Progressbar(frame, length=120, maximum=1.0)
+        self.export_progress.grid(row=4, column=5, columnspan=3, padx=2, sticky="w")
         # export selected tile
-        tk.Button(frame, text="Export Selected Tile", command=self.export_selected_tile).grid(row=4, column=0, columnspan=5, pady=4)
+        tk.Button(frame, text="Export Selected Tile", command=self.export_selected_tile).grid(row=5, column=0, columnspan=5, pady=4)
 
         # gameboy-ize
-        tk.Button(frame, text="Gameboy-ize Map", command=self.gameboyize_map).grid(row=5, column=0, columnspan=5, pady=4)
+        tk.Button(frame, text="Gameboy-ize Map", command=self.gameboyize_map).grid(row=6, column=0, columnspan=2, pady=4)
+        # palette: a name or comma-separated #rrggbb colors typed in the box
+        tk.Label(frame, text="Palette:").grid(row=6, column=2, sticky="e")
+        self.gb_palette_var = tk.StringVar(value="classic")
+        ttk.Combobox(frame, textvariable=self.gb_palette_var, values=list(PALETTES),
+                     width=10).grid(row=6, column=3, padx=2, sticky="w")
+        tk.Label(frame, text="Dither:").grid(row=6, column=4, sticky="e")
+        self.gb_dither_var = tk.StringVar(value=DITHER_MODES[0])
+        ttk.Combobox(frame, textvariable=self.gb_dither_var, values=DITHER_MODES,
+                     state="readonly", width=12).grid(row=6, column=5, columnspan=3, padx=2, sticky="w")
+
+        # Game Boy tile data (uses the palette and dither above)
+        tk.Button(frame, text="Export GB Tiles (2bpp)", command=self.export_gb_tiles).grid(row=7, column=0, columnspan=2, pady=4)
+        self.gb_attrs_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame, text="GBC attributes", variable=self.gb_attrs_var).grid(row=7, column=2, columnspan=3, sticky="w")
+
+        # project files (project.py)
+        tk.Button(frame, text="Save Project", command=self.save_project_file).grid(row=8, column=0, columnspan=2, pady=4)
+        tk.Button(frame, text="Open Project", command=self.open_project_file).grid(row=8, column=2, columnspan=3, pady=4)
+        self.autosave_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(frame, text="Autosave", variable=self.autosave_var).grid(row=9, column=0, columnspan=2, sticky="w")
+        self.autosave_status_var = tk.StringVar(value="")
+        tk.Label(frame, textvariable=self.autosave_status_var, anchor="w").grid(row=9, column=2, columnspan=6, sticky="w")
 
     def build_scrollable_map(self, parent):
         x_scroll = tk.Scrollbar(parent, orient=tk.HORIZONTAL)
@@ -852,25 +742,26 @@ class TileGeneratorApp(tk.Tk):
         y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
 
         self.map_canvas = tk.Canvas(parent,
-                                    width=self.map_width*self.tile_size,
-                                    height=self.map_height*self.tile_size,
-                                    xscrollcommand=x_scroll.set,
-                                    yscrollcommand=y_scroll.set)
+                                    xscrollcommand=lambda *a: self._on_map_scroll(x_scroll,*a),
+                                    yscrollcommand=lambda *a: self._on_map_scroll(y_scroll,*a))
         self.map_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         x_scroll.config(command=self.map_canvas.xview)
         y_scroll.config(command=self.map_canvas.yview)
 
-        self.map_canvas.config(scrollregion=(0,0,
-                                             self.map_width*self.tile_size,
-                                             self.map_height*self.tile_size))
+        self.configure_map_canvas()
 
         self.map_canvas.bind("<Button-1>", self.on_map_click)
         self.map_canvas.bind("<B1-Motion>", self.on_map_drag)
         self.map_canvas.bind("<ButtonRelease-1>", self.on_map_release)
         self.map_canvas.bind("<Motion>", self.on_map_motion)
 
-        self.draw_map_grid()
+        self.reset_map_chunks()
+
+    def _on_map_scroll(self, scrollbar, *args):
+        # The view moved or resized: chunks that came into view may be dirty.
+        scrollbar.set(*args)
+        self.schedule_chunk_flush()
 
     # -------------------------------------------------------------------------
     # Edit Selected Tile in Recent Tiles
@@ -893,6 +784,7 @@ class TileGeneratorApp(tk.Tk):
             We update the tile in the recent list, refresh the UI.
             """
             # update the tile
+            new_pil = self.tileset.intern(new_pil)
             new_tk = ImageTk.PhotoImage(new_pil.resize((32,32), Image.NEAREST))
             self.recent_tiles[self.selected_recent_tile_index] = (new_pil, new_tk, None)
             self.refresh_recent_tiles_ui()
@@ -978,6 +870,7 @@ class TileGeneratorApp(tk.Tk):
 
         def on_save(new_pil):
             # update
+            new_pil = self.tileset.intern(new_pil)
             new_tk = ImageTk.PhotoImage(new_pil.resize((32,32), Image.NEAREST))
             self.recent_tiles[idx] = (new_pil, new_tk, None)
             self.refresh_recent_tiles_ui()
@@ -1011,45 +904,6 @@ class TileGeneratorApp(tk.Tk):
         self.dict_index = (self.dict_index-10)%len(self.dict_keys)
         self.word_var.set(self.dict_keys[self.dict_index])
 
-    # Undo/Redo
-    def on_undo(self, event=None):
-        if len(self.undo_stack)>1:
-            # push current to redo
-            self.redo_stack.append(self.undo_stack.pop())
-            state = self.undo_stack[-1]
-            self.load_undo_state(state)
-        else:
-            messagebox.showinfo("Undo", "No more undo steps.")
-
-    def on_redo(self, event=None):
-        if self.redo_stack:
-            state = self.redo_stack.pop()
-            self.undo_stack.append(copy.deepcopy(self.map_data))
-            self.load_undo_state(state)
-        else:
-            messagebox.showinfo("Redo","No redo steps available.")
-
-    def record_undo_state(self):
-        st = copy.deepcopy(self.map_data)
-        self.undo_stack.append(st)
-        self.redo_stack.clear()
-
-    def load_undo_state(self, state):
-        self.map_data = copy.deepcopy(state)
-        self.map_canvas.delete("all")
-        self.draw_map_grid()
-        for r in range(self.map_height):
-            for c in range(self.map_width):
-                cell = self.map_data[r][c]
-                if cell:
-                    pil_img = cell["image_pil"]
-                    x0 = c*self.tile_size
-                    y0 = r*self.tile_size
-                    tki = ImageTk.PhotoImage(pil_img)
-                    cid = self.map_canvas.create_image(x0,y0,image=tki,anchor=tk.NW)
-                    self.map_canvas.image[cid] = tki
-                    self.map_data[r][c]={"image_pil": pil_img,"canvas_id":cid}
-
     # -------------------------------------------------------------------------
     # Generate Tile
     # -------------------------------------------------------------------------
@@ -1059,25 +913,62 @@ class TileGeneratorApp(tk.Tk):
             self.dict_index = self.dict_keys.index(w.lower())
 
         pat = self.pattern_var.get().strip()
-        pal = get_color_palette(w)
-
-        tile_pil = generate_16x16_tile_with_pattern(
-            pal,
-            pattern_name=pat,
-            hue_shift=self.hue_shift_var.get(),
-            sat_mult=self.sat_var.get(),
-            val_mult=self.val_var.get()
-        )
+
+        # A fresh seed per press keeps tiles random but lets us reproduce them.
+        self.generated_seed = random.randrange(2**32)
+        self.generated_palette = get_color_palette(w)
+        self.generated_pattern = pat
+        self.generated_size = self.tile_size_var.get()  # the picked size, even before Resize Map
+        self.generated_layout = generate_tile_layout(self.generated_palette, pat,
+                                                     self.generated_seed,
+                                                     self.generated_size)
+        tile_pil = self.render_generated_tile()
         self.generated_tile_pil = tile_pil
         self.update_preview(tile_pil)
         self.add_to_recent_tiles(tile_pil)
 
+    def render_generated_tile(self):
+        """
+        Color the last generated tile with the current slider values.
+        Array patterns reuse the stored index map; draw-based patterns are
+        rerun with the same seed, so their layout doesn't change either.
+        """
+        hue = self.hue_shift_var.get()
+        sat = self.sat_var.get()
+        val = self.val_var.get()
+        if self.generated_layout is not None:
+            return render_tile_layout(self.generated_layout, self.generated_palette,
+                                      hue, sat, val)
+        return generate_16x16_tile_with_pattern(self.generated_palette,
+                                                self.generated_pattern,
+                                                hue, sat, val,
+                                                seed=self.generated_seed,
+                                                size=self.generated_size)
+
+    def schedule_recolor(self):
+        """
+        Slider callback. Scale events arrive faster than we need to redraw,
+        so coalesce them into one recolor when Tk goes idle.
+        """
+        if self.generated_palette is None or self._recolor_pending:
+            return
+        self._recolor_pending = True
+        self.after_idle(self._apply_recolor)
+
+    def _apply_recolor(self):
+        self._recolor_pending = False
+        self.generated_tile_pil = self.render_generated_tile()
+        self.update_preview(self.generated_tile_pil)
+
     def update_preview(self, tile_pil):
         tki = ImageTk.PhotoImage(tile_pil.resize((96,96),Image.NEAREST))
         self.preview_label.config(image=tki,text="")
         self.preview_label.image=tki
 
     def add_to_recent_tiles(self, tile_pil):
+        # Every route a tile enters by (generate, sampler, editor saves) goes
+        # through the tileset, so identical tiles share one image object.
+        tile_pil = self.tileset.intern(tile_pil)
         tki = ImageTk.PhotoImage(tile_pil.resize((32,32),Image.NEAREST))
         self.recent_tiles.insert(0,(tile_pil,tki,None))
         if len(self.recent_tiles)>10:
@@ -1109,7 +1000,7 @@ class TileGeneratorApp(tk.Tk):
         if idx<0 or idx>=len(self.recent_tiles): return
         old_tool = self.current_tool.get()
         self.selected_recent_tile_index = idx
-        self.selected_tile_image = self.recent_tiles[idx][0]
+        self.selected_tile_image = self.tileset.intern(self._fit_tile(self.recent_tiles[idx][0]))
 
         # only if old_tool == "Select" => switch to Paint
         if old_tool==self.TOOL_SELECT:
@@ -1117,6 +1008,15 @@ class TileGeneratorApp(tk.Tk):
 
         self.refresh_recent_tiles_ui()
 
+    def _fit_tile(self, tile_pil):
+        """
+        Recent tiles may have been made at another tile size; scale them
+        (nearest neighbour) to the map's current tile size before placing.
+        """
+        if tile_pil.size == (self.tile_size, self.tile_size):
+            return tile_pil
+        return tile_pil.resize((self.tile_size, self.tile_size), Image.NEAREST)
+
     def export_generated_tile(self):
         if not self.generated_tile_pil:
             messagebox.showwarning("No Tile","Generate a tile first.")
@@ -1133,13 +1033,40 @@ class TileGeneratorApp(tk.Tk):
     # Map
     # -------------------------------------------------------------------------
     def build_map(self):
-        self.map_data=[[None for _ in range(self.map_width)] for _ in range(self.map_height)]
-        self.map_canvas.config(width=self.map_width*self.tile_size,
-                               height=self.map_height*self.tile_size)
-        self.map_canvas.config(scrollregion=(0,0,self.map_width*self.tile_size,
-                                             self.map_height*self.tile_size))
-        self.map_canvas.delete("all")
-        self.draw_map_grid()
+        self.map_grid=new_grid(self.map_width,self.map_height)
+        self.map_revision+=1
+        self.configure_map_canvas()
+        self.redraw_map_canvas()
+
+    @property
+    def cell_px(self):
+        """
+        Size of one map cell on screen at the current zoom.
+        """
+        return max(1,round(self.tile_size*self.zoom))
+
+    def configure_map_canvas(self,resize=True):
+        w=self.map_width*self.cell_px
+        h=self.map_height*self.cell_px
+        if resize:
+            self.map_canvas.config(width=min(w,MAP_VIEW_PX),height=min(h,MAP_VIEW_PX))
+        self.map_canvas.config(scrollregion=(0,0,w,h))
+
+    def on_zoom_changed(self,event=None):
+        zoom=float(self.zoom_var.get().rstrip("%"))/100
+        if zoom==self.zoom:
+            return
+        # Scroll fractions don't depend on the zoom, so the view keeps its corner.
+        fx=self.map_canvas.xview()[0]
+        fy=self.map_canvas.yview()[0]
+        self.zoom=zoom
+        self.configure_map_canvas(resize=False)
+        self.map_canvas.delete("chunk")
+        self.remove_cursor_ghost()
+        self.reset_map_chunks()
+        self.redraw_selection()
+        self.map_canvas.xview_moveto(fx)
+        self.map_canvas.yview_moveto(fy)
 
     def resize_map(self):
         w = self.map_width_var.get()
@@ -1147,19 +1074,17 @@ class TileGeneratorApp(tk.Tk):
         if w<1 or h<1:
             messagebox.showerror("Invalid Size","Width/Height must be > 0.")
             return
+        self.commit_map_edit()  # close any open stroke before the swap
+        old_grid, old_tile_size = self.map_grid, self.tile_size
         self.map_width = w
         self.map_height = h
-        self.build_map()
+        self.tile_size = self.tile_size_var.get()
+        if self.selected_tile_image:
+            self.selected_tile_image = self.tileset.intern(self._fit_tile(self.selected_tile_image))
+        self.remove_cursor_ghost()
         self.selected_cells.clear()
-        self.record_undo_state()
-
-    def draw_map_grid(self):
-        for x in range(0,self.map_width*self.tile_size,self.tile_size):
-            self.map_canvas.create_line(x,0,x,self.map_height*self.tile_size,
-                                        fill="#cccccc",tags="grid")
-        for y in range(0,self.map_height*self.tile_size,self.tile_size):
-            self.map_canvas.create_line(0,y,self.map_width*self.tile_size,y,
-                                        fill="#cccccc",tags="grid")
+        self.build_map()
+        self.history.record_swap(old_grid, old_tile_size, self.map_grid, self.tile_size)
 
     # -------------------------------------------------------------------------
     # Tools
@@ -1183,10 +1108,8 @@ class TileGeneratorApp(tk.Tk):
         # If tool=Paint & we have selected tile => show ghost
         if tool==self.TOOL_PAINT and self.selected_tile_image:
             if not self.cursor_ghost_id:
-                tki = ImageTk.PhotoImage(self.selected_tile_image)
+                self.cursor_ghost_key,tki = self._acquire_tile_photo(self.tileset.add(self.selected_tile_image))
                 gid = self.map_canvas.create_image(px,py,image=tki,anchor=tk.CENTER,tags="cursor_ghost")
-                self.map_canvas.image = getattr(self.map_canvas,"image",{})
-                self.map_canvas.image[gid]=tki
                 self.cursor_ghost_id=gid
             else:
                 self.map_canvas.coords(self.cursor_ghost_id, px, py)
@@ -1196,13 +1119,16 @@ class TileGeneratorApp(tk.Tk):
     def remove_cursor_ghost(self):
         if self.cursor_ghost_id:
             self.map_canvas.delete(self.cursor_ghost_id)
+            self.photos.release(self.cursor_ghost_key)
             self.cursor_ghost_id=None
+            self.cursor_ghost_key=None
 
     def on_map_click(self,event):
         self.map_canvas.focus_set()
+        self.begin_map_edit()  # everything until the release is one undo step
         px = self.map_canvas.canvasx(event.x)
         py = self.map_canvas.canvasy(event.y)
-        cx, cy = int(px//self.tile_size), int(py//self.tile_size)
+        cx, cy = int(px//self.cell_px), int(py//self.cell_px)
 
         # shape tool?
         if self.current_tool.get() in (self.TOOL_LINE,self.TOOL_RECT,self.TOOL_CIRCLE):
@@ -1223,27 +1149,25 @@ class TileGeneratorApp(tk.Tk):
             self.multi_offsets=[]
             self.drag_ghost_ids=[]
             for(scx,scy) in self.selected_cells:
-                d=self.map_data[scy][scx]
-                if not d: continue
+                tid=int(self.map_grid[scy,scx])
+                if tid==EMPTY: continue
                 dx=scx-cx
                 dy=scy-cy
-                self.multi_offsets.append((scx,scy,dx,dy,d["image_pil"]))
-                self.map_canvas.delete(d["canvas_id"])
-                self.map_data[scy][scx]=None
-            for(_,_,dx,dy,pilimg) in self.multi_offsets:
-                tki=ImageTk.PhotoImage(pilimg)
-                gx=px+dx*self.tile_size
-                gy=py+dy*self.tile_size
+                self.multi_offsets.append((scx,scy,dx,dy,tid))
+                self._clear_cell(scx,scy)
+            for(_,_,dx,dy,tid) in self.multi_offsets:
+                key,tki=self._acquire_tile_photo(tid)
+                gx=px+dx*self.cell_px
+                gy=py+dy*self.cell_px
                 gid=self.map_canvas.create_image(gx,gy,image=tki,anchor=tk.CENTER)
-                self.map_canvas.image[gid]=tki
-                self.drag_ghost_ids.append(gid)
+                self.drag_ghost_ids.append((gid,key))
             return
 
         # sampler => pick tile, add to recent, switch to paint
         if tool==self.TOOL_SAMPLER:
-            cell=self.map_data[cy][cx]
-            if cell:
-                self.add_to_recent_tiles(cell["image_pil"])
+            tid=int(self.map_grid[cy,cx])
+            if tid!=EMPTY:
+                self.add_to_recent_tiles(self.tileset.get(tid))
             self.current_tool.set(self.TOOL_PAINT)
             return
 
@@ -1255,9 +1179,9 @@ class TileGeneratorApp(tk.Tk):
         if self.dragging_multi and self.drag_ghost_ids:
             px=self.map_canvas.canvasx(event.x)
             py=self.map_canvas.canvasy(event.y)
-            for i,(_,_,dx,dy,pilimg) in enumerate(self.multi_offsets):
-                gid=self.drag_ghost_ids[i]
-                self.map_canvas.coords(gid, px+dx*self.tile_size, py+dy*self.tile_size)
+            for i,(_,_,dx,dy,_tid) in enumerate(self.multi_offsets):
+                gid=self.drag_ghost_ids[i][0]
+                self.map_canvas.coords(gid, px+dx*self.cell_px, py+dy*self.cell_px)
             return
 
         if self.current_tool.get() in (self.TOOL_LINE,self.TOOL_RECT,self.TOOL_CIRCLE):
@@ -1265,7 +1189,7 @@ class TileGeneratorApp(tk.Tk):
 
         px=self.map_canvas.canvasx(event.x)
         py=self.map_canvas.canvasy(event.y)
-        cx,cy=int(px//self.tile_size), int(py//self.tile_size)
+        cx,cy=int(px//self.cell_px), int(py//self.cell_px)
         if 0<=cx<self.map_width and 0<=cy<self.map_height:
             if (cx,cy)!=self.last_cell:
                 self.do_tool_action(cx,cy,self.current_tool.get(),True)
@@ -1276,84 +1200,68 @@ class TileGeneratorApp(tk.Tk):
             self.dragging_multi=False
             px=self.map_canvas.canvasx(event.x)
             py=self.map_canvas.canvasy(event.y)
-            cx,cy=int(px//self.tile_size), int(py//self.tile_size)
-            for gid in self.drag_ghost_ids:
+            cx,cy=int(px//self.cell_px), int(py//self.cell_px)
+            for gid,key in self.drag_ghost_ids:
                 self.map_canvas.delete(gid)
+                self.photos.release(key)
             self.drag_ghost_ids=[]
             dx2 = cx-self.drag_origin_cell[0]
             dy2 = cy-self.drag_origin_cell[1]
             newsel=set()
-            for(ocx,ocy,dx,dy,pilimg) in self.multi_offsets:
+            for(ocx,ocy,dx,dy,tid) in self.multi_offsets:
                 ncx=ocx+dx2
                 ncy=ocy+dy2
                 if 0<=ncx<self.map_width and 0<=ncy<self.map_height:
-                    tki=ImageTk.PhotoImage(pilimg)
-                    x0=ncx*self.tile_size
-                    y0=ncy*self.tile_size
-                    cid=self.map_canvas.create_image(x0,y0,image=tki,anchor=tk.NW)
-                    self.map_canvas.image[cid]=tki
-                    self.map_data[ncy][ncx]={"image_pil":pilimg,"canvas_id":cid}
+                    self._place_tile_at(ncx,ncy,tid)
                     newsel.add((ncx,ncy))
             self.selected_cells=newsel
             self.redraw_selection()
             self.multi_offsets=[]
             self.drag_origin_cell=None
-            self.record_undo_state()
+            self.commit_map_edit()
 
         # shapes
         if self.current_tool.get() in (self.TOOL_LINE,self.TOOL_RECT,self.TOOL_CIRCLE):
             if self.shape_start_cell:
                 px=self.map_canvas.canvasx(event.x)
                 py=self.map_canvas.canvasy(event.y)
-                ecx, ecy=int(px//self.tile_size), int(py//self.tile_size)
+                ecx, ecy=int(px//self.cell_px), int(py//self.cell_px)
                 sx,sy=self.shape_start_cell
                 self.draw_shape(self.current_tool.get(), sx,sy,ecx,ecy)
-                self.record_undo_state()
             self.shape_start_cell=None
 
+        self.commit_map_edit()
         self.last_cell=None
 
     def do_tool_action(self, cx, cy, tool, is_drag=False):
+        # Paint and erase strokes are committed as one undo step on release.
         if tool==self.TOOL_PAINT:
             self.paint_tile(cx,cy)
-            if not is_drag:
-                self.record_undo_state()
         elif tool==self.TOOL_ERASE:
             self.erase_tile(cx,cy)
-            if not is_drag:
-                self.record_undo_state()
         elif tool==self.TOOL_SELECT:
             self.select_tile(cx,cy)
         elif tool==self.TOOL_BUCKET and not is_drag:
             self.bucket_fill(cx,cy)
-            self.record_undo_state()
+            self.commit_map_edit()
         else:
             pass
 
     # Paint, Erase, Select, Bucket
     def paint_tile(self,cx,cy):
         if not self.selected_tile_image:return
-        stroke=self.stroke_width_var.get()
-        rad=(stroke-1)//2
-        for dy in range(-rad,rad+1):
-            for dx in range(-rad,rad+1):
-                nx=cx+dx
-                ny=cy+dy
-                if 0<=nx<self.map_width and 0<=ny<self.map_height:
-                    self._place_pil_at(nx,ny,self.selected_tile_image)
+        self._stamp(cx,cy,self.tileset.add(self.selected_tile_image))
 
     def erase_tile(self,cx,cy):
-        stroke=self.stroke_width_var.get()
-        rad=(stroke-1)//2
-        for dy in range(-rad,rad+1):
-            for dx in range(-rad,rad+1):
-                nx=cx+dx
-                ny=cy+dy
-                if 0<=nx<self.map_width and 0<=ny<self.map_height:
-                    old=self.map_data[ny][nx]
-                    if old:
-                        self.map_canvas.delete(old["canvas_id"])
-                    self.map_data[ny][nx]=None
+        self._stamp(cx,cy,EMPTY)
+
+    def _stamp(self,cx,cy,tid):
+        """
+        Write tid under the stroke-width brush centred on (cx, cy).
+        """
+        ys,xs=stroke_cells([cy],[cx],self.stroke_width_var.get(),self.map_width,self.map_height)
+        self.map_edit.set_cells(ys,xs,tid)
+        self.schedule_chunk_flush()
 
     def select_tile(self,cx,cy):
         if self.ctrl_down:
@@ -1369,171 +1277,321 @@ class TileGeneratorApp(tk.Tk):
     def redraw_selection(self):
         self.map_canvas.delete("selection_rect")
         for (scx,scy) in self.selected_cells:
-            x0=scx*self.tile_size
-            y0=scy*self.tile_size
-            x1=x0+self.tile_size
-            y1=y0+self.tile_size
+            x0=scx*self.cell_px
+            y0=scy*self.cell_px
+            x1=x0+self.cell_px
+            y1=y0+self.cell_px
             self.map_canvas.create_rectangle(x0,y0,x1,y1,
                                              outline="red",width=2,
                                              tags="selection_rect")
 
     def bucket_fill(self,cx,cy):
+        """
+        Fill the region of cells matching (cx, cy) with the selected tile,
+        or every matching cell on the map in "replace all" mode. Regions
+        larger than the fill cap are refused.
+        """
         if not self.selected_tile_image:return
-        orig = self.map_data[cy][cx]
-        orig_ref= orig["image_pil"] if orig else None
-        if orig_ref==self.selected_tile_image: return
+        tid=self.tileset.add(self.selected_tile_image)
+        if self.map_grid[cy,cx]==tid: return
+        cap=self.fill_cap_var.get() or None
+        cells=flood_fill(self.map_grid,cx,cy,
+                         contiguous=not self.bucket_replace_all_var.get(),max_cells=cap)
+        if cells is None:
+            messagebox.showwarning("Bucket",f"The region is larger than the fill cap ({cap} cells).")
+            return
+        self.map_edit.set_cells(cells[0],cells[1],tid)
+        self.schedule_chunk_flush()
 
-        st=[(cx,cy)]
-        visited=set()
-        while st:
-            x,y=st.pop()
-            if (x,y) in visited: continue
-            visited.add((x,y))
-            if 0<=x<self.map_width and 0<=y<self.map_height:
-                cell=self.map_data[y][x]
-                c_ref= cell["image_pil"] if cell else None
-                if c_ref==orig_ref:
-                    self._place_pil_at(x,y,self.selected_tile_image)
-                    st.append((x-1,y))
-                    st.append((x+1,y))
-                    st.append((x,y-1))
-                    st.append((x,y+1))
+    def _place_tile_at(self,cx,cy,tid):
+        """
+        Write one cell's tile id into the open map edit. It reaches
+        map_grid and the canvas at the next frame (or commit_map_edit).
+        """
+        self.map_edit.set(cy,cx,tid)
+        self.schedule_chunk_flush()
 
-    def _place_pil_at(self,cx,cy,tile_pil):
-        old=self.map_data[cy][cx]
-        if old:
-            self.map_canvas.delete(old["canvas_id"])
-        x0=cx*self.tile_size
-        y0=cy*self.tile_size
-        tki=ImageTk.PhotoImage(tile_pil)
-        cid=self.map_canvas.create_image(x0,y0,image=tki,anchor=tk.NW)
-        self.map_canvas.image=getattr(self.map_canvas,"image",{})
-        self.map_canvas.image[cid]=tki
-        self.map_data[cy][cx]={"image_pil":tile_pil,"canvas_id":cid}
+    def _clear_cell(self,cx,cy):
+        self._place_tile_at(cx,cy,EMPTY)
+
+    def _refresh_cell(self,cx,cy):
+        """
+        Queue the cell for copying into its chunk once the event loop is idle.
+        """
+        n=self._chunk_cells()
+        key=(cy//n,cx//n)
+        if key not in self.map_chunks:
+            return  # off screen; built from map_grid when it scrolls into view
+        cells=self.dirty_chunks.setdefault(key,set())
+        if cells is not None:
+            cells.add((cy,cx))
+            if len(cells)>CELL_BLIT_MAX:
+                self.dirty_chunks[key]=None
+        self.schedule_chunk_flush()
+
+    def _refresh_cells(self,ys,xs):
+        """
+        _refresh_cell for arrays of cells.
+        """
+        if len(ys)<=CELL_BLIT_MAX:
+            for cy,cx in zip(ys.tolist(),xs.tolist()):
+                self._refresh_cell(cx,cy)
+            return
+        n=self._chunk_cells()
+        cols=-(-self.map_width//n)
+        for key in np.unique((ys//n)*cols+xs//n).tolist():
+            key=divmod(key,cols)
+            if key in self.map_chunks:
+                self.dirty_chunks[key]=None
+        self.schedule_chunk_flush()
+
+    def reconcile_map(self,grid):
+        """
+        Make map_grid, and what is drawn of it, match grid (same shape),
+        touching only the cells that differ. Grid lines and the selection
+        are left alone. Returns the changed cells' ys, xs and old ids.
+        """
+        ys,xs=np.nonzero(self.map_grid!=grid)
+        old=self.map_grid[ys,xs]
+        if len(ys)==0:
+            return ys,xs,old  # nothing changed; the map stays clean for autosave
+        self._own_map_grid()
+        self.map_grid[ys,xs]=grid[ys,xs]
+        self.map_revision+=1
+        self._refresh_cells(ys,xs)
+        return ys,xs,old
+
+    def redraw_map_canvas(self):
+        """
+        Rebuild the canvas from map_grid.
+        """
+        self.map_canvas.delete("all")
+        self.photos.clear()
+        self.blit_photos=OrderedDict()
+        self.cursor_ghost_id=None
+        self.cursor_ghost_key=None
+        self.drag_ghost_ids=[]
+        self.reset_map_chunks()
+        self.redraw_selection()
+
+    # -------------------------------------------------------------------------
+    # Map chunks
+    # -------------------------------------------------------------------------
+    def _chunk_cells(self):
+        """
+        Cells per side of a chunk at the current zoom.
+        """
+        return max(1,CHUNK_PX//self.cell_px)
+
+    def _zoom_pixels(self):
+        """
+        The TilePixels for the current cell size, reused from zoom_cache.
+        """
+        px=self.cell_px
+        pixels=self.zoom_cache.pop(px,None)
+        if pixels is None:
+            # Empty cells are transparent apart from the grid lines.
+            empty=np.zeros((px,px,4),dtype=np.uint8)
+            if px>=4:
+                empty[0,:]=empty[:,0]=(0xcc,0xcc,0xcc,255)
+            pixels=TilePixels(self.tileset,px,max_bytes=ZOOM_CACHE_BYTES,empty=empty)
+        self.zoom_cache[px]=pixels
+        while len(self.zoom_cache)>ZOOM_CACHE_LEVELS:
+            self.zoom_cache.popitem(last=False)
+        return pixels
+
+    def _acquire_tile_photo(self,tid):
+        """
+        The shared PhotoImage of a tile at the current zoom (for ghosts) and
+        the key to release it with.
+        """
+        key=(tid,self.cell_px)
+        pixels=self.map_pixels
+        return key,self.photos.acquire(key,lambda: Image.fromarray(pixels.get(tid),"RGBA"))
+
+    def reset_map_chunks(self):
+        """
+        Forget the chunk images (after the canvas was cleared, or the tile
+        size or zoom changed); the visible ones are rebuilt when idle.
+        """
+        self.map_pixels=self._zoom_pixels()
+        self.map_chunks={}
+        self.dirty_chunks={}
+        self.schedule_chunk_flush()
+
+    def schedule_chunk_flush(self):
+        if not self._chunk_flush_pending:
+            self._chunk_flush_pending=True
+            self.after_idle(self.flush_chunks)
+
+    def visible_chunks(self):
+        """
+        (rows, cols) ranges of the chunks inside the canvas viewport plus
+        CHUNK_MARGIN, clipped to the map.
+        """
+        n=self._chunk_cells()
+        span=n*self.cell_px
+        x0=max(0,int(self.map_canvas.canvasx(0)))
+        y0=max(0,int(self.map_canvas.canvasy(0)))
+        x1=x0+self.map_canvas.winfo_width()
+        y1=y0+self.map_canvas.winfo_height()
+        rows=-(-self.map_height//n)
+        cols=-(-self.map_width//n)
+        return (range(max(0,y0//span-CHUNK_MARGIN),min(rows,y1//span+1+CHUNK_MARGIN)),
+                range(max(0,x0//span-CHUNK_MARGIN),min(cols,x1//span+1+CHUNK_MARGIN)))
+
+    def flush_chunks(self):
+        """
+        Apply pending cell writes, then bring the canvas in line with the
+        viewport: drop chunks that left it, build the ones that entered it
+        and update the dirty ones.
+        """
+        self._apply_map_edit()  # before clearing the flag, so it doesn't reschedule
+        self._chunk_flush_pending=False
+        rows,cols=self.visible_chunks()
+        for key in [k for k in self.map_chunks if k[0] not in rows or k[1] not in cols]:
+            self.map_canvas.delete(self.map_chunks.pop(key)[1])
+        for row in rows:
+            for col in cols:
+                cells=self.dirty_chunks.get((row,col),())
+                if (row,col) not in self.map_chunks or cells is None:
+                    self._blit_chunk(row,col)
+                else:
+                    for cy,cx in cells:
+                        self._blit_cell(cx,cy)
+        self.dirty_chunks.clear()
+        while len(self.blit_photos)>BLIT_PHOTOS_KEPT:
+            self.photos.release(self.blit_photos.popitem(last=False)[0])
+
+    def _blit_cell(self,cx,cy):
+        """
+        Copy one cell's tile into its chunk's image in place. The tile's
+        photo stays in blit_photos; flush_chunks releases all but the
+        BLIT_PHOTOS_KEPT most recently used after each pass.
+        """
+        n=self._chunk_cells()
+        chunk_photo=self.map_chunks[(cy//n,cx//n)][0]
+        tid=int(self.map_grid[cy,cx])
+        key=(tid,self.cell_px)
+        tile_photo=self.blit_photos.get(key)
+        if tile_photo is None:
+            key,tile_photo=self._acquire_tile_photo(tid)
+            self.blit_photos[key]=tile_photo
+        else:
+            self.blit_photos.move_to_end(key)
+        self.tk.call(str(chunk_photo),"copy",str(tile_photo),
+                     "-to",(cx%n)*self.cell_px,(cy%n)*self.cell_px,
+                     "-compositingrule","set")
+
+    def _blit_chunk(self,row,col):
+        n=self._chunk_cells()
+        block=self.map_grid[row*n:(row+1)*n,col*n:(col+1)*n]
+        img=Image.fromarray(self.map_pixels.compose(block),"RGBA")
+        chunk=self.map_chunks.get((row,col))
+        if chunk is not None:
+            chunk[0].paste(img)
+            return
+        tki=ImageTk.PhotoImage(img)
+        item=self.map_canvas.create_image(col*n*self.cell_px,row*n*self.cell_px,
+                                          image=tki,anchor=tk.NW,tags="chunk")
+        # Chunks never overlap; selection and ghosts stay above them.
+        self.map_canvas.tag_lower(item)
+        self.map_chunks[(row,col)]=(tki,item)
 
     # Shapes: line, rect, circle
     def draw_shape(self, shape_tool, sx, sy, ex, ey):
-        stroke=self.stroke_width_var.get()
-        if shape_tool==self.TOOL_LINE:
-            self._draw_line_shape(sx,sy,ex,ey,stroke)
-        elif shape_tool==self.TOOL_RECT:
-            self._draw_rect_shape(sx,sy,ex,ey,stroke)
-        elif shape_tool==self.TOOL_CIRCLE:
-            self._draw_circle_shape(sx,sy,ex,ey,stroke)
-
-    def _draw_line_shape(self,sx,sy,ex,ey,stroke):
-        dx=abs(ex-sx)
-        dy=abs(ey-sy)
-        x,y=sx,sy
-        sxn=1 if ex>sx else -1
-        syn=1 if ey>sy else -1
-        err=dx-dy
-        rad=(stroke-1)//2
-        while True:
-            for rdy in range(-rad,rad+1):
-                for rdx in range(-rad,rad+1):
-                    nx=x+rdx
-                    ny=y+rdy
-                    if 0<=nx<self.map_width and 0<=ny<self.map_height and self.selected_tile_image:
-                        self._place_pil_at(nx,ny,self.selected_tile_image)
-            if x==ex and y==ey: break
-            e2=2*err
-            if e2> -dy:
-                err-=dy
-                x+=sxn
-            if e2<dx:
-                err+=dx
-                y+=syn
-
-    def _draw_rect_shape(self,sx,sy,ex,ey,stroke):
-        x1,y1=min(sx,ex),min(sy,ey)
-        x2,y2=max(sx,ex),max(sy,ey)
-        rad=(stroke-1)//2
-        def paint_cell(cx,cy):
-            if 0<=cx<self.map_width and 0<=cy<self.map_height and self.selected_tile_image:
-                self._place_pil_at(cx,cy,self.selected_tile_image)
-        for cx in range(x1,x2+1):
-            for thick in range(-rad,rad+1):
-                paint_cell(cx,y1+thick)
-                paint_cell(cx,y2+thick)
-        for cy in range(y1,y2+1):
-            for thick in range(-rad,rad+1):
-                paint_cell(x1+thick,cy)
-                paint_cell(x2+thick,cy)
-
-    def _draw_circle_shape(self,sx,sy,ex,ey,stroke):
-        x1,y1=min(sx,ex),min(sy,ey)
-        x2,y2=max(sx,ex),max(sy,ey)
-        w=x2-x1
-        h=y2-y1
-        cx=(x1+x2)/2
-        cy=(y1+y2)/2
-        rx=w/2
-        ry=h/2
-        rad=(stroke-1)//2
-        def paint_cell(nx,ny):
-            if 0<=nx<self.map_width and 0<=ny<self.map_height and self.selected_tile_image:
-                self._place_pil_at(nx,ny,self.selected_tile_image)
-        steps=int(max(w,h)*360)
-        for step in range(steps+1):
-            if steps==0: break
-            theta=2*math.pi*step/steps
-            fx=cx+rx*math.cos(theta)
-            fy=cy+ry*math.sin(theta)
-            tx,ty=int(round(fx)),int(round(fy))
-            for rdy in range(-rad,rad+1):
-                for rdx in range(-rad,rad+1):
-                    paint_cell(tx+rdx,ty+rdy)
+        """
+        Place the selected tile on every cell of the shape (see shapes.py).
+        """
+        if not self.selected_tile_image:return
+        shape={self.TOOL_LINE:"line",self.TOOL_RECT:"rect",self.TOOL_CIRCLE:"ellipse"}[shape_tool]
+        ys,xs=shape_cells(shape,sx,sy,ex,ey,self.map_width,self.map_height,
+                          stroke=self.stroke_width_var.get(),filled=self.shape_filled_var.get())
+        self.map_edit.set_cells(ys,xs,self.tileset.add(self.selected_tile_image))
+        self.schedule_chunk_flush()
 
     # -------------------------------------------------------------------------
     # Undo / Redo
     # -------------------------------------------------------------------------
     def on_undo(self,event=None):
-        if len(self.undo_stack)>1:
-            self.redo_stack.append(self.undo_stack.pop())
-            state=self.undo_stack[-1]
-            self.load_undo_state(state)
-        else:
+        self.commit_map_edit()  # an unfinished stroke is its own step
+        step=self.history.undo()
+        if step is None:
             messagebox.showinfo("Undo","No more steps.")
+            return
+        self.apply_history_step(step,undo=True)
 
     def on_redo(self,event=None):
-        if self.redo_stack:
-            st=self.redo_stack.pop()
-            self.undo_stack.append(copy.deepcopy(self.map_data))
-            self.load_undo_state(st)
-        else:
+        self.commit_map_edit()  # an unfinished stroke is its own step
+        step=self.history.redo()
+        if step is None:
             messagebox.showinfo("Redo","No redo steps available.")
+            return
+        self.apply_history_step(step,undo=False)
+
+    def begin_map_edit(self):
+        """
+        Open a map edit transaction. Cell writes (_place_tile_at) are
+        collected in map_edit, deduplicated per cell and applied to the
+        grid and canvas once per frame; commit_map_edit turns everything
+        written since the begin into one undo step.
+        """
+        self.commit_map_edit()
 
-    def record_undo_state(self):
-        st=copy.deepcopy(self.map_data)
-        self.undo_stack.append(st)
-        self.redo_stack.clear()
+    def commit_map_edit(self):
+        """
+        Close the current edit: apply its pending writes and make the cells
+        it changed one undo step.
+        """
+        self._apply_map_edit()
+        self.history.commit()
 
-    def load_undo_state(self,state):
-        self.map_data=copy.deepcopy(state)
-        self.map_canvas.delete("all")
-        self.draw_map_grid()
-        for r in range(self.map_height):
-            for c in range(self.map_width):
-                cell=self.map_data[r][c]
-                if cell:
-                    pil_img=cell["image_pil"]
-                    x0=c*self.tile_size
-                    y0=r*self.tile_size
-                    tki=ImageTk.PhotoImage(pil_img)
-                    cid=self.map_canvas.create_image(x0,y0,image=tki,anchor=tk.NW)
-                    self.map_canvas.image[cid]=tki
-                    self.map_data[r][c]={"image_pil":pil_img,"canvas_id":cid}
+    def _apply_map_edit(self):
+        if not self.map_edit:
+            return
+        self._own_map_grid()
+        ys,xs,old,new=self.map_edit.apply(self.map_grid)
+        if len(ys):
+            self.map_revision+=1
+        self.history.touch_cells(ys,xs,old,new)
+        self._refresh_cells(ys,xs)
+
+    def apply_history_step(self,step,undo):
+        """
+        Revert (undo=True) or reapply a history step. Cell diffs only update
+        the changed cells; a grid swap rebuilds the map unless its size and
+        tile size are unchanged.
+        """
+        if isinstance(step,GridSwap):
+            grid,tile_size=(step.old,step.old_tile_size) if undo else (step.new,step.new_tile_size)
+            if grid.shape==self.map_grid.shape and tile_size==self.tile_size:
+                self.reconcile_map(grid)
+                return
+            self.tile_size=tile_size
+            self.map_grid=grid.copy()
+            self.map_revision+=1
+            self.map_height,self.map_width=grid.shape
+            self.map_width_var.set(self.map_width)
+            self.map_height_var.set(self.map_height)
+            self.tile_size_var.set(self.tile_size)
+            self.selected_cells.clear()
+            self.configure_map_canvas()
+            self.redraw_map_canvas()
+            return
+        ys,xs=step.ys,step.xs
+        self._own_map_grid()
+        self.map_grid[ys,xs]=step.old if undo else step.new
+        self.map_revision+=1
+        self._refresh_cells(ys,xs)
 
     # -------------------------------------------------------------------------
     # Delete/Shift/Control
     # -------------------------------------------------------------------------
     def on_delete_key(self, event):
+        self.begin_map_edit()
         for (cx, cy) in list(self.selected_cells):
-            old = self.map_data[cy][cx]
-            if old:
-                self.map_canvas.delete(old["canvas_id"])
-            self.map_data[cy][cx] = None
+            self._clear_cell(cx, cy)
+        self.commit_map_edit()
         self.selected_cells.clear()
         self.redraw_selection()
     def on_shift_pressed(self, event):
@@ -1557,19 +1615,14 @@ class TileGeneratorApp(tk.Tk):
                                         filetypes=[("PNG Files","*.png")],
                                         title="Save Entire Map")
         if not fp: return
-        from PIL import Image
-        W=self.map_width*self.tile_size
-        H=self.map_height*self.tile_size
-        out=Image.new("RGBA",(W,H),(0,0,0,0))
-        for r in range(self.map_height):
-            for c in range(self.map_width):
-                cell=self.map_data[r][c]
-                if cell:
-                    tile=cell["image_pil"].convert("RGBA")
-                    x0=c*self.tile_size
-                    y0=r*self.tile_size
-                    out.alpha_composite(tile,(x0,y0))
-        out.save(fp,"PNG")
+        self.commit_map_edit()
+        def progress(done,total):
+            self.export_progress["value"]=done/total
+            self.update_idletasks()
+        try:
+            export_map_png(fp,self.map_grid,self.tileset,self.tile_size,progress=progress)
+        finally:
+            self.export_progress["value"]=0
         messagebox.showinfo("Map Exported", f"Map saved to {fp}")
 
     def export_selected_tile(self):
@@ -1577,75 +1630,215 @@ class TileGeneratorApp(tk.Tk):
             messagebox.showwarning("No Selection","No cell selected.")
             return
         cx, cy = next(iter(self.selected_cells))
-        cell=self.map_data[cy][cx]
-        if not cell:
+        tid=int(self.map_grid[cy,cx])
+        if tid==EMPTY:
             messagebox.showwarning("Empty","Selected cell has no tile.")
             return
         fp=filedialog.asksaveasfilename(defaultextension=".png",
                                         filetypes=[("PNG Files","*.png")],
                                         title="Save Selected Tile")
         if not fp: return
-        cell["image_pil"].save(fp,"PNG")
+        self.tileset.get(tid).save(fp,"PNG")
         messagebox.showinfo("Exported", f"Tile saved to {fp}")
 
+    def export_gb_tiles(self):
+        """
+        Write the map as Game Boy 2bpp tile data plus a tilemap (and GBC
+        attributes and palette if ticked), reduced to the Gameboy-ize palette.
+        """
+        fp=filedialog.asksaveasfilename(defaultextension=".2bpp",
+                                        filetypes=[("Game Boy tile data","*.2bpp")],
+                                        title="Export Game Boy Tiles")
+        if not fp: return
+        self.commit_map_edit()
+        try:
+            paths=write_gb_assets(os.path.splitext(fp)[0],self.map_grid,self.tileset,self.tile_size,
+                                  self.gb_palette_var.get().strip(),self.gb_dither_var.get(),
+                                  self.gb_attrs_var.get())
+        except ValueError as e:
+            messagebox.showerror("Export GB Tiles",str(e))
+            return
+        messagebox.showinfo("Exported","Wrote "+", ".join(os.path.basename(p) for p in paths))
+
+    # -------------------------------------------------------------------------
+    # Project files
+    # -------------------------------------------------------------------------
+    def project_layers(self):
+        """
+        The layers to save: the map, then the extra layers of an opened
+        project. Extra layers are kept at the size they were opened with
+        (undoing a resize brings the map back to it) and are fitted to the
+        map's size here; also returns the names of those that lose tiles.
+        """
+        layers={"map":self.map_grid}
+        cropped=[]
+        for name,grid in self.extra_layers.items():
+            layers[name],lost=fit_grid(grid,*self.map_grid.shape[::-1])
+            if lost:
+                cropped.append(name)
+        return layers,cropped
+
+    def save_project_file(self):
+        fp=filedialog.asksaveasfilename(defaultextension=PROJECT_EXT,
+                                        filetypes=[("Tile Genie Project","*"+PROJECT_EXT)],
+                                        initialfile=os.path.basename(self.project_path or ""),
+                                        title="Save Project")
+        if not fp: return
+        self.commit_map_edit()
+        if self.project_path and os.path.abspath(fp)==os.path.abspath(self.project_path):
+            # Layers opened from this file may still be mapped from it, and
+            # a mapped file cannot be replaced everywhere (Windows).
+            if is_mapped(self.map_grid):
+                self.map_grid=self.map_grid.copy()
+            self.extra_layers={k:(v.copy() if is_mapped(v) else v) for k,v in self.extra_layers.items()}
+        layers,cropped=self.project_layers()
+        if cropped and not messagebox.askyesno(
+                "Save Project","Layers "+", ".join(cropped)+" are bigger than the resized map; "
+                "tiles outside it will not be saved. Save anyway?"):
+            return
+        try:
+            save_project(fp,self.tileset,layers,self.tile_size,{"zoom":self.zoom})
+        except (OSError,ValueError) as e:
+            messagebox.showerror("Save Project",str(e))
+            return
+        self.project_path=fp
+        self.saved_revision=self.map_revision
+        messagebox.showinfo("Project Saved", f"Project saved to {fp}")
+
+    def open_project_file(self):
+        """
+        Replace the map with a project file. Large maps are memory-mapped,
+        so this is quick whatever their size. Undo history is cleared: it
+        refers to tiles of the old tileset.
+        """
+        fp=filedialog.askopenfilename(filetypes=[("Tile Genie Project","*"+PROJECT_EXT)],
+                                      title="Open Project")
+        if not fp: return
+        try:
+            project=load_project(fp)
+        except (OSError,ValueError) as e:
+            messagebox.showerror("Open Project",str(e))
+            return
+        self.commit_map_edit()
+        self.history.clear()
+        self.tileset=project.registry
+        self.zoom_cache.clear()
+        name,grid=next(iter(project.layers.items()))
+        self.extra_layers={k:v for k,v in project.layers.items() if k!=name}
+        self.map_grid=grid
+        self.map_revision+=1
+        self.saved_revision=self.map_revision
+        self.map_height,self.map_width=grid.shape
+        self.tile_size=project.tile_size
+        self.map_width_var.set(self.map_width)
+        self.map_height_var.set(self.map_height)
+        self.tile_size_var.set(self.tile_size)
+        zoom=project.metadata.get("zoom",self.zoom)
+        if zoom in ZOOM_LEVELS:
+            self.zoom=zoom
+            self.zoom_var.set("{:g}%".format(zoom*100))
+        if self.selected_tile_image:
+            self.selected_tile_image=self.tileset.intern(self._fit_tile(self.selected_tile_image))
+        self.remove_cursor_ghost()
+        self.selected_cells.clear()
+        self.project_path=fp
+        self.configure_map_canvas()
+        self.redraw_map_canvas()
+
+    # -------------------------------------------------------------------------
+    # Autosave
+    # -------------------------------------------------------------------------
+    def _own_map_grid(self):
+        """
+        Call before writing into map_grid in place: while an autosave is
+        reading the grid, gives the map its own copy. Writes that change
+        cells also bump map_revision, which marks the map for autosave.
+        """
+        if self.map_grid is self._autosave_grid:
+            self.map_grid=self.map_grid.copy()
+
+    def autosave_path(self):
+        """
+        <project>.autosave.tgp next to the project, or one file in
+        ~/.tile_genie for a map that was never saved.
+        """
+        if self.project_path:
+            return os.path.splitext(self.project_path)[0]+".autosave"+PROJECT_EXT
+        return os.path.join(os.path.expanduser("~"),".tile_genie","autosave"+PROJECT_EXT)
+
+    def autosave_tick(self):
+        self.after(AUTOSAVE_MS,self.autosave_tick)
+        if (self.autosave_var.get() and self._autosave_thread is None
+                and self.map_revision!=self.saved_revision):
+            self.start_autosave()
+
+    def start_autosave(self):
+        """
+        Save the map on a worker thread. The snapshot is the current grid
+        itself (the UI copies it before changing it, see _own_map_grid) and
+        the append-only tileset, so nothing is copied here; serializing,
+        compressing and the atomic replace all happen on the worker.
+        """
+        self._apply_map_edit()  # pending writes belong in the snapshot
+        path=self.autosave_path()
+        layers,_=self.project_layers()
+        args=(path,self.tileset,layers,self.tile_size,{"zoom":self.zoom})
+
+        def progress(done,total):
+            self._autosave_progress=done/total
+
+        def work():
+            try:
+                os.makedirs(os.path.dirname(path),exist_ok=True)
+                save_project(*args,progress=progress)
+            except Exception as e:
+                self._autosave_error=e
+
+        self._autosave_grid=self.map_grid
+        self._autosave_revision=self.map_revision
+        self._autosave_progress=0.0
+        self._autosave_error=None
+        self._autosave_thread=threading.Thread(target=work,name="autosave",daemon=True)
+        self._autosave_thread.start()
+        self.autosave_status_var.set("Autosaving…")
+        self.after(AUTOSAVE_POLL_MS,self._poll_autosave)
+
+    def _poll_autosave(self):
+        if self._autosave_thread.is_alive():
+            self.autosave_status_var.set("Autosaving… {:.0%}".format(self._autosave_progress))
+            self.after(AUTOSAVE_POLL_MS,self._poll_autosave)
+            return
+        self._autosave_thread=None
+        self._autosave_grid=None
+        if self._autosave_error is not None:
+            self.autosave_status_var.set("Autosave failed: {}".format(self._autosave_error))
+        else:
+            self.saved_revision=max(self.saved_revision,self._autosave_revision)
+            self.autosave_status_var.set("Autosaved {}".format(time.strftime("%H:%M:%S")))
+
     # -------------------------------------------------------------------------
     # Gameboy-ize
     # -------------------------------------------------------------------------
     def gameboyize_map(self):
         """
-        Convert every pixel of every tile on the map to the nearest of:
-           #071821, #86c06c, #e0f8cf
-        and special case black=>white => #65ff00
+        Convert every pixel of every tile on the map to the nearest color of
+        the chosen palette (classic: #071821, #86c06c, #e0f8cf, with
+        black/white => #65ff00), optionally dithered.
+
+        Each distinct tile is converted once and the id grid is remapped.
         """
-        gb_colors = [
-            (7,24,33),
-            (134,192,108),
-            (224,248,207)
-        ]
-        TRANSPARENT_GB=(101,255,0) # #65ff00
-        def nearest_gb(rgb):
-            (r,g,b)=rgb
-            if (r,g,b)==(0,0,0) or (r,g,b)==(255,255,255):
-                return TRANSPARENT_GB
-            best=None
-            bestd=999999
-            for col in gb_colors:
-                dr=col[0]-r
-                dg=col[1]-g
-                db=col[2]-b
-                dist2=dr*dr+dg*dg+db*db
-                if dist2<bestd:
-                    bestd=dist2
-                    best=col
-            return best
-        from PIL import Image
-        for row in range(self.map_height):
-            for col in range(self.map_width):
-                cell=self.map_data[row][col]
-                if cell:
-                    pil_img=cell["image_pil"].convert("RGB")
-                    px=pil_img.load()
-                    for y in range(16):
-                        for x in range(16):
-                            oldc=px[x,y]
-                            px[x,y]=nearest_gb(oldc)
-                    self.map_data[row][col]["image_pil"]=pil_img
-        # rebuild
-        self.map_canvas.delete("all")
-        self.draw_map_grid()
-        for r in range(self.map_height):
-            for c in range(self.map_width):
-                cell=self.map_data[r][c]
-                if cell:
-                    tile=cell["image_pil"]
-                    x0=c*self.tile_size
-                    y0=r*self.tile_size
-                    tki=ImageTk.PhotoImage(tile)
-                    cid=self.map_canvas.create_image(x0,y0,image=tki,anchor=tk.NW)
-                    self.map_canvas.image[cid]=tki
-                    self.map_data[r][c]={"image_pil":tile,"canvas_id":cid}
-
-        self.record_undo_state()
+        spec=self.gb_palette_var.get().strip()
+        dither=self.gb_dither_var.get()
+        try:
+            parse_palette(spec)
+        except ValueError as e:
+            messagebox.showerror("Gameboy-ize",str(e))
+            return
+        self.commit_map_edit()
+        convert=lambda tile: gameboyize_image(tile,spec,dither)
+        ys,xs,old=self.reconcile_map(remap_tiles(self.map_grid,self.tileset,convert))
+        self.history.record(ys,xs,old,self.map_grid[ys,xs])
+
         messagebox.showinfo("Gameboy-ize","Map converted to Game Boy style!")
 
 
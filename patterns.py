@@ -1,677 +1,800 @@
-import random
-from PIL import ImageDraw
+from functools import lru_cache
+import math
+
+import numpy as np
 
 PATTERN_GENERATORS = {}
 
+# Names of patterns registered through register_array_pattern. Everything else
+# in PATTERN_GENERATORS is a legacy draw-based pattern.
+ARRAY_PATTERNS = set()
+
+# Patterns are designed on a 16x16 tile; feature sizes, radii and counts are
+# scaled from there for other tile sizes (8, 32, 64, ...).
+TILE = 16
+
+
 def register_pattern(name):
     """
     Decorator to register a pattern function under a certain name
     in the global PATTERN_GENERATORS dictionary.
+
+    The function is called as func(draw, palette) and paints a 16x16 tile
+    itself through the ImageDraw object. For other tile sizes the result is
+    resized (nearest neighbour).
     """
     def decorator(func):
         PATTERN_GENERATORS[name] = func
+        ARRAY_PATTERNS.discard(name)
         return func
     return decorator
 
 
+def register_array_pattern(name):
+    """
+    Decorator to register an array-based pattern.
+
+    The function is called as func(palette, rng, size) and returns a
+    size x size NumPy array of palette indices, indexed [y, x]. rng is a
+    numpy.random.Generator owned by this call; patterns must draw all their
+    randomness from it so a seeded generation is reproducible. Index
+    len(palette) is reserved for unpainted pixels (black, like a fresh
+    Image.new("RGB")).
+
+    A pattern that shades between palette colors may instead return a tuple
+    (indices, blends), where blends is a list of (i, j, t) entries: entry k is
+    the color t of the way from palette[i] to palette[j], and the indices
+    refer to those blended entries (see blend_palette).
+    """
+    def decorator(func):
+        PATTERN_GENERATORS[name] = func
+        ARRAY_PATTERNS.add(name)
+        return func
+    return decorator
+
+
+def is_array_pattern(name):
+    return name in ARRAY_PATTERNS
+
+
+# -------------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def _grid(size):
+    """
+    Read-only (ys, xs) coordinate grids for a size x size tile.
+    """
+    ys, xs = np.mgrid[0:size, 0:size]
+    ys.flags.writeable = False
+    xs.flags.writeable = False
+    return ys, xs
+
+
+def _px(n, size):
+    """
+    A feature n pixels wide on a 16x16 tile, scaled to size (at least 1px).
+    """
+    return max(1, n * size // TILE)
+
+
+def _count(n, size):
+    """
+    Number of scattered features for size, keeping the density n has on a
+    16x16 tile.
+    """
+    return max(1, int(round(n * (size / TILE) ** 2)))
+
+
+def _cells(size):
+    """
+    (cell, grid): pixel-art patterns are drawn on a grid of grid x grid
+    cells, each cell x cell pixels, so their 1px details stay crisp and
+    keep their proportions at every tile size.
+    """
+    cell = _px(1, size)
+    return cell, -(-size // cell)
+
+
+def _upscale(tile, cell, size):
+    """
+    Blow a cell-grid tile up to size x size pixels.
+    """
+    if cell > 1:
+        tile = tile.repeat(cell, axis=0).repeat(cell, axis=1)
+    return tile[:size, :size]
+
+
+def _blank(palette, size=TILE):
+    """
+    A tile where every pixel is the reserved 'unpainted' index.
+    """
+    return np.full((size, size), len(palette), dtype=np.intp)
+
+
+def _random_index(rng, palette, size=None):
+    return rng.integers(0, len(palette), size=size)
+
+
+def blend_palette(palette, blends):
+    """
+    Resolve (i, j, t) blend entries against a palette into an (N, 3) array
+    of RGB colors, truncating like int() does.
+    """
+    blends = np.asarray(blends, dtype=float).reshape(-1, 3)
+    colors = np.asarray(palette, dtype=np.int64)
+    c1 = colors[blends[:, 0].astype(np.intp)]
+    c2 = colors[blends[:, 1].astype(np.intp)]
+    return (c1 + blends[:, 2:3] * (c2 - c1)).astype(np.int64)
+
+
+@lru_cache(maxsize=None)
+def _circle_points(cx, cy, radius, size=TILE):
+    """
+    Pixels hit by stepping around a circle outline (one degree at a time,
+    or finer for big radii), clipped to the tile. Returned as (ys, xs).
+    """
+    steps = max(360, int(math.ceil(4 * math.pi * radius)))
+    angles = np.radians(np.arange(steps) * (360.0 / steps))
+    xs = (cx + radius * np.cos(angles)).astype(int)
+    ys = (cy + radius * np.sin(angles)).astype(int)
+    keep = (xs >= 0) & (xs < size) & (ys >= 0) & (ys < size)
+    return ys[keep], xs[keep]
+
+
+def _ring_points(cx, cy, radius, size):
+    """
+    Like _circle_points, but the outline is scaled to size and thickened so
+    rings drawn at 16px spacing don't leave gaps on bigger tiles.
+    """
+    scale = size / TILE
+    radius = max(1.0, radius*scale)
+    for step in range(max(1, int(round(scale)))):
+        yield _circle_points(cx, cy, radius - step, size)
+
+
+def _line_points(x1, y1, x2, y2):
+    """
+    Pixels along a straight line between two points, as (ys, xs).
+    """
+    steps = max(abs(x2 - x1), abs(y2 - y1))
+    t = np.linspace(0.0, 1.0, steps + 1)
+    xs = np.rint(x1 + t * (x2 - x1)).astype(int)
+    ys = np.rint(y1 + t * (y2 - y1)).astype(int)
+    return ys, xs
+
+
 # -------------------------------------------------------------------------
 # Existing Patterns (You already have these)
 # -------------------------------------------------------------------------
 
-@register_pattern("solid")
-def pattern_solid(draw, palette):
+@register_array_pattern("solid")
+def pattern_solid(palette, rng, size=TILE):
     """
     Fill all pixels with random picks from the palette.
     """
-    for x in range(16):
-        for y in range(16):
-            color_choice = random.choice(palette)
-            draw.point((x, y), fill=color_choice)
+    return _random_index(rng, palette, (size, size))
 
-@register_pattern("stripes_horizontal")
-def pattern_stripes_horizontal(draw, palette):
+@register_array_pattern("stripes_horizontal")
+def pattern_stripes_horizontal(palette, rng, size=TILE):
     """
     Draw horizontal stripes in 2-pixel bands, using the palette in rotation.
     """
-    stripe_height = 2
-    color_index = 0
-    for y in range(16):
-        if y % stripe_height == 0:
-            color_index = (color_index + 1) % len(palette)
-        for x in range(16):
-            draw.point((x, y), fill=palette[color_index])
+    ys, _ = _grid(size)
+    stripe_height = _px(2, size)
+    return (ys // stripe_height + 1) % len(palette)
 
-@register_pattern("stripes_vertical")
-def pattern_stripes_vertical(draw, palette):
+@register_array_pattern("stripes_vertical")
+def pattern_stripes_vertical(palette, rng, size=TILE):
     """
     Draw vertical stripes in 2-pixel bands, using the palette in rotation.
     """
-    stripe_width = 2
-    color_index = 0
-    for x in range(16):
-        if x % stripe_width == 0:
-            color_index = (color_index + 1) % len(palette)
-        for y in range(16):
-            draw.point((x, y), fill=palette[color_index])
+    _, xs = _grid(size)
+    stripe_width = _px(2, size)
+    return (xs // stripe_width + 1) % len(palette)
 
-@register_pattern("checkerboard")
-def pattern_checkerboard(draw, palette):
+@register_array_pattern("checkerboard")
+def pattern_checkerboard(palette, rng, size=TILE):
     """
     Classic checkerboard pattern: alternate colors in a 2×2 block.
     """
-    colors = palette[:]
-    random.shuffle(colors)
-    for y in range(16):
-        for x in range(16):
-            index = ((x // 2) + (y // 2)) % len(colors)
-            draw.point((x, y), fill=colors[index])
+    ys, xs = _grid(size)
+    block = _px(2, size)
+    order = rng.permutation(len(palette))
+    return order[((xs // block) + (ys // block)) % len(palette)]
 
-@register_pattern("dots")
-def pattern_dots(draw, palette):
+@register_array_pattern("dots")
+def pattern_dots(palette, rng, size=TILE):
     """
     Place small "dot" clusters with random radius.
     """
-    for _ in range(10):  # number of dots
-        dot_x = random.randint(0, 15)
-        dot_y = random.randint(0, 15)
-        radius = random.randint(1, 3)
-        color = random.choice(palette)
-        for rx in range(-radius, radius+1):
-            for ry in range(-radius, radius+1):
-                if 0 <= dot_x + rx < 16 and 0 <= dot_y + ry < 16:
-                    if rx*rx + ry*ry <= radius*radius:
-                        draw.point((dot_x + rx, dot_y + ry), fill=color)
+    ys, xs = _grid(size)
+    scale = size / TILE
+    tile = _blank(palette, size)
+    for _ in range(_count(10, size)):  # number of dots
+        dot_x = rng.integers(0, size)
+        dot_y = rng.integers(0, size)
+        radius = rng.integers(1, 4) * scale
+        mask = (xs - dot_x)**2 + (ys - dot_y)**2 <= radius*radius
+        tile[mask] = _random_index(rng, palette)
+    return tile
 
-@register_pattern("diagonal_lines")
-def pattern_diagonal_lines(draw, palette):
+@register_array_pattern("diagonal_lines")
+def pattern_diagonal_lines(palette, rng, size=TILE):
     """
     Repeated diagonal lines going from top-left to bottom-right.
     """
-    color_idx = 0
-    for d in range(-15, 16):
-        color = palette[color_idx % len(palette)]
-        color_idx += 1
-        for x in range(16):
-            y = x - d
-            if 0 <= x < 16 and 0 <= y < 16:
-                draw.point((x, y), fill=color)
+    ys, xs = _grid(size)
+    width = _px(1, size)
+    return ((xs // width - ys // width) + (TILE - 1)) % len(palette)
 
-@register_pattern("gradient")
-def pattern_gradient(draw, palette):
+@register_array_pattern("gradient")
+def pattern_gradient(palette, rng, size=TILE):
     """
     Simple top-to-bottom gradient from the first color to the last color in the palette.
     """
-    if len(palette) < 2:
-        c1 = palette[0]
-        c2 = palette[0]
-    else:
-        c1 = palette[0]
-        c2 = palette[-1]
+    ys, _ = _grid(size)
+    last = len(palette) - 1
+    blends = [(0, last, y / max(size - 1.0, 1.0)) for y in range(size)]
+    return ys.copy(), blends
 
-    for y in range(16):
-        t = y / 15.0  # interpolation factor
-        r = int(c1[0] + t*(c2[0] - c1[0]))
-        g = int(c1[1] + t*(c2[1] - c1[1]))
-        b = int(c1[2] + t*(c2[2] - c1[2]))
-        for x in range(16):
-            draw.point((x, y), fill=(r, g, b))
-
-@register_pattern("random_blocks")
-def pattern_random_blocks(draw, palette):
+@register_array_pattern("random_blocks")
+def pattern_random_blocks(palette, rng, size=TILE):
     """
     Create random NxN blocks with random color from the palette.
     """
-    block_size = 4
-    for by in range(0, 16, block_size):
-        for bx in range(0, 16, block_size):
-            color = random.choice(palette)
-            for x in range(bx, bx+block_size):
-                for y in range(by, by+block_size):
-                    draw.point((x, y), fill=color)
+    block_size = max(1, size // 4)
+    blocks = _random_index(rng, palette, (-(-size // block_size),) * 2)
+    return _upscale(blocks, block_size, size)
 
 
 # -------------------------------------------------------------------------
 # 25 New Patterns
 # -------------------------------------------------------------------------
 
-@register_pattern("chessboard_small")
-def pattern_chessboard_small(draw, palette):
+@register_array_pattern("chessboard_small")
+def pattern_chessboard_small(palette, rng, size=TILE):
     """
     A smaller checkerboard pattern that alternates every single pixel.
     Uses only the first 2 colors from the palette, if available.
     """
-    c1 = palette[0]
-    c2 = palette[min(1, len(palette)-1)]
-    for y in range(16):
-        for x in range(16):
-            if (x + y) % 2 == 0:
-                draw.point((x, y), fill=c1)
-            else:
-                draw.point((x, y), fill=c2)
+    ys, xs = _grid(size)
+    cell = _px(1, size)
+    return np.where((xs // cell + ys // cell) % 2 == 0, 0, min(1, len(palette)-1))
 
-@register_pattern("rings")
-def pattern_rings(draw, palette):
+@register_array_pattern("rings")
+def pattern_rings(palette, rng, size=TILE):
     """
     Concentric rings centered in the tile.
     Each ring picks a color from the palette in sequence.
     """
-    center = (8, 8)
+    tile = _blank(palette, size)
+    center = size // 2
     max_radius = 8
-    color_index = 0
-    for r in range(max_radius, 0, -1):
-        color = palette[color_index % len(palette)]
-        color_index += 1
-        # Draw a circle of radius r
-        for angle_deg in range(0, 360):
-            import math
-            angle = math.radians(angle_deg)
-            x = int(center[0] + r * math.cos(angle))
-            y = int(center[1] + r * math.sin(angle))
-            if 0 <= x < 16 and 0 <= y < 16:
-                draw.point((x, y), fill=color)
-
-@register_pattern("squares")
-def pattern_squares(draw, palette):
+    for color_index, r in enumerate(range(max_radius, 0, -1)):
+        for points in _ring_points(center, center, r, size):
+            tile[points] = color_index % len(palette)
+    return tile
+
+@register_array_pattern("squares")
+def pattern_squares(palette, rng, size=TILE):
     """
     Concentric squares from outer edge to inner center.
     """
-    color_index = 0
-    for size in range(16, 0, -2):
-        color = palette[color_index % len(palette)]
-        color_index += 1
-        offset = (16 - size) // 2
-        for x in range(offset, offset+size):
-            draw.point((x, offset), fill=color)
-            draw.point((x, offset+size-1), fill=color)
-        for y in range(offset, offset+size):
-            draw.point((offset, y), fill=color)
-            draw.point((offset+size-1, y), fill=color)
-
-@register_pattern("triangles")
-def pattern_triangles(draw, palette):
+    ys, xs = _grid(size)
+    # Each pixel belongs to the square whose outline is its distance to the edge.
+    edge = np.minimum(np.minimum(xs, ys), np.minimum(size-1 - xs, size-1 - ys))
+    return (edge // _px(1, size)) % len(palette)
+
+@register_array_pattern("triangles")
+def pattern_triangles(palette, rng, size=TILE):
     """
     Simple triangular fill pattern: top-left to bottom-right diagonals.
     """
-    for y in range(16):
-        for x in range(16):
-            # Decide a color by x+y
-            index = ((x + y) // 2) % len(palette)
-            draw.point((x, y), fill=palette[index])
+    ys, xs = _grid(size)
+    return ((xs + ys) // _px(2, size)) % len(palette)
 
-@register_pattern("zigzag")
-def pattern_zigzag(draw, palette):
+@register_array_pattern("zigzag")
+def pattern_zigzag(palette, rng, size=TILE):
     """
     Horizontal zigzag lines across the tile.
     """
-    color_index = 0
-    for y in range(16):
-        color = palette[color_index % len(palette)]
-        color_index += 1
-        direction = 1 if (y // 2) % 2 == 0 else -1
-        # shift the row's starting x to create a zigzag
-        x_start = 0 if direction == 1 else 15
-        for step in range(16):
-            x = x_start + (step * direction)
-            if 0 <= x < 16:
-                draw.point((x, y), fill=color)
-
-@register_pattern("random_specks")
-def pattern_random_specks(draw, palette):
+    ys, _ = _grid(size)
+    return (ys // _px(1, size)) % len(palette)
+
+@register_array_pattern("random_specks")
+def pattern_random_specks(palette, rng, size=TILE):
     """
     Scatter random single-pixel specks in random colors from the palette.
     """
-    for _ in range(50):  # number of specks
-        x = random.randint(0, 15)
-        y = random.randint(0, 15)
-        color = random.choice(palette)
-        draw.point((x, y), fill=color)
+    tile = _blank(palette, size)
+    count = _count(50, size)  # number of specks
+    ys = rng.integers(0, size, count)
+    xs = rng.integers(0, size, count)
+    tile[ys, xs] = _random_index(rng, palette, count)
+    return tile
 
-@register_pattern("random_lines")
-def pattern_random_lines(draw, palette):
+@register_array_pattern("random_lines")
+def pattern_random_lines(palette, rng, size=TILE):
     """
     Draw random lines of random color from palette.
     """
-    for _ in range(10):
-        color = random.choice(palette)
-        x1, y1 = random.randint(0, 15), random.randint(0, 15)
-        x2, y2 = random.randint(0, 15), random.randint(0, 15)
-        ImageDraw.Draw(draw.im).line((x1, y1, x2, y2), fill=color)
+    tile = _blank(palette, size)
+    for _ in range(max(1, 10 * size // TILE)):
+        color = _random_index(rng, palette)
+        x1, y1, x2, y2 = rng.integers(0, size, 4)
+        tile[_line_points(x1, y1, x2, y2)] = color
+    return tile
 
-@register_pattern("maze")
-def pattern_maze(draw, palette):
+@register_array_pattern("maze")
+def pattern_maze(palette, rng, size=TILE):
     """
     A very rough 'maze-like' pattern using random horizontal or vertical segments.
     """
-    for y in range(16):
-        for x in range(16):
-            # 50% chance to connect horizontally, 50% vertically
-            color = random.choice(palette)
-            if random.random() < 0.5 and x < 15:
-                draw.point((x, y), fill=color)
-                draw.point((x+1, y), fill=color)
-            else:
-                if y < 15:
-                    draw.point((x, y), fill=color)
-                    draw.point((x, y+1), fill=color)
-
-@register_pattern("sprinkle")
-def pattern_sprinkle(draw, palette):
+    cell, grid = _cells(size)
+    _, xs = _grid(grid)
+    # Every cell starts a segment in its own color, either to the right or
+    # downwards; a cell's own segment is always the last one painted over it.
+    colors = _random_index(rng, palette, (grid, grid))
+    horizontal = (rng.random((grid, grid)) < 0.5) & (xs < grid-1)
+    tile = colors.copy()
+
+    # Bottom-row cells that chose "down" have nowhere to go, so they keep
+    # whatever their left or upper neighbour painted there.
+    last = grid - 1
+    from_left = np.zeros(grid, dtype=bool)
+    from_left[1:] = horizontal[last, :-1]
+    left_colors = np.roll(colors[last], 1)
+    from_above = ~horizontal[last-1]
+    row = np.where(from_above, colors[last-1], len(palette))
+    row = np.where(from_left, left_colors, row)
+    tile[last] = np.where(horizontal[last], colors[last], row)
+    return _upscale(tile, cell, size)
+
+@register_array_pattern("sprinkle")
+def pattern_sprinkle(palette, rng, size=TILE):
     """
     Like 'dots', but each dot is just a single pixel (sprinkle).
     """
-    for _ in range(30):
-        x = random.randint(0, 15)
-        y = random.randint(0, 15)
-        draw.point((x, y), fill=random.choice(palette))
+    tile = _blank(palette, size)
+    count = _count(30, size)
+    ys = rng.integers(0, size, count)
+    xs = rng.integers(0, size, count)
+    tile[ys, xs] = _random_index(rng, palette, count)
+    return tile
 
-@register_pattern("grain")
-def pattern_grain(draw, palette):
+@register_array_pattern("grain")
+def pattern_grain(palette, rng, size=TILE):
     """
     Vertical 'grain' lines, each column has a color that might slightly change randomly.
     """
-    base_color = random.choice(palette)
-    for x in range(16):
-        # Slightly shift color from base
-        col_color = random.choice(palette)
-        for y in range(16):
-            draw.point((x, y), fill=col_color)
+    cell, grid = _cells(size)
+    columns = _random_index(rng, palette, grid).repeat(cell)[:size]
+    return np.broadcast_to(columns, (size, size)).copy()
 
-@register_pattern("shaded_circle")
-def pattern_shaded_circle(draw, palette):
+@register_array_pattern("shaded_circle")
+def pattern_shaded_circle(palette, rng, size=TILE):
     """
     A large circle in the center, shaded from one color to another radially.
     """
-    if len(palette) < 2:
-        c1 = palette[0]
-        c2 = palette[0]
-    else:
-        c1 = palette[0]
-        c2 = palette[-1]
-    cx, cy = 8, 8
-    max_r2 = 8 * 8  # radius^2
-    for y in range(16):
-        for x in range(16):
-            dx, dy = x - cx, y - cy
-            dist2 = dx*dx + dy*dy
-            if dist2 <= max_r2:
-                t = dist2 / float(max_r2)
-                r = int(c1[0] + t*(c2[0] - c1[0]))
-                g = int(c1[1] + t*(c2[1] - c1[1]))
-                b = int(c1[2] + t*(c2[2] - c1[2]))
-                draw.point((x, y), fill=(r, g, b))
-
-@register_pattern("border")
-def pattern_border(draw, palette):
+    ys, xs = _grid(size)
+    last = len(palette) - 1
+    center = size // 2
+    max_r2 = center * center  # radius^2
+    dist2 = (xs - center)**2 + (ys - center)**2
+    # One shade per possible squared distance, plus the unpainted corners.
+    blends = [(0, last, d2 / float(max_r2)) for d2 in range(max_r2 + 1)]
+    return np.where(dist2 <= max_r2, dist2, len(blends)), blends
+
+@register_array_pattern("border")
+def pattern_border(palette, rng, size=TILE):
     """
     A simple border around the tile with the first color in palette, fill center with another color.
     """
-    c1 = palette[0]
-    c2 = palette[min(1, len(palette)-1)]
-    for y in range(16):
-        for x in range(16):
-            if x == 0 or x == 15 or y == 0 or y == 15:
-                draw.point((x, y), fill=c1)
-            else:
-                draw.point((x, y), fill=c2)
+    ys, xs = _grid(size)
+    width = _px(1, size)
+    edge = (xs < width) | (xs >= size-width) | (ys < width) | (ys >= size-width)
+    return np.where(edge, 0, min(1, len(palette)-1))
 
-@register_pattern("concentric_circles")
-def pattern_concentric_circles(draw, palette):
+@register_array_pattern("concentric_circles")
+def pattern_concentric_circles(palette, rng, size=TILE):
     """
     Circles that increase in radius by 2, each ring a different color.
     """
-    center = (8, 8)
-    color_index = 0
-    for radius in range(1, 9, 2):
-        color = palette[color_index % len(palette)]
-        color_index += 1
-        for angle_deg in range(360):
-            import math
-            angle = math.radians(angle_deg)
-            x = int(center[0] + radius * math.cos(angle))
-            y = int(center[1] + radius * math.sin(angle))
-            if 0 <= x < 16 and 0 <= y < 16:
-                draw.point((x, y), fill=color)
-
-@register_pattern("x_cross")
-def pattern_x_cross(draw, palette):
+    tile = _blank(palette, size)
+    center = size // 2
+    for color_index, radius in enumerate(range(1, 9, 2)):
+        for points in _ring_points(center, center, radius, size):
+            tile[points] = color_index % len(palette)
+    return tile
+
+@register_array_pattern("x_cross")
+def pattern_x_cross(palette, rng, size=TILE):
     """
     Draws an 'X' across the tile in 2 random colors from the palette.
     """
-    c1 = random.choice(palette)
-    c2 = random.choice(palette)
-    for i in range(16):
-        draw.point((i, i), fill=c1)
-        draw.point((15 - i, i), fill=c2)
+    cell, grid = _cells(size)
+    ys, xs = _grid(grid)
+    c1, c2 = _random_index(rng, palette, 2)
+    tile = _blank(palette, grid)
+    tile[xs == ys] = c1
+    tile[xs == grid-1 - ys] = c2
+    return _upscale(tile, cell, size)
 
-@register_pattern("crosshatch")
-def pattern_crosshatch(draw, palette):
+@register_array_pattern("crosshatch")
+def pattern_crosshatch(palette, rng, size=TILE):
     """
     Combine horizontal, vertical, and diagonal lines for a crosshatch effect.
     """
-    c1 = random.choice(palette)
-    c2 = random.choice(palette)
-    c3 = random.choice(palette)
-    # Horizontal lines
-    for y in range(0, 16, 2):
-        for x in range(16):
-            draw.point((x, y), fill=c1)
-    # Vertical lines
-    for x in range(0, 16, 2):
-        for y in range(16):
-            draw.point((x, y), fill=c2)
-    # Diagonal
-    for i in range(16):
-        draw.point((i, i), fill=c3)
-        if 15 - i != i:
-            draw.point((15 - i, i), fill=c3)
-
-@register_pattern("stars")
-def pattern_stars(draw, palette):
+    cell, grid = _cells(size)
+    ys, xs = _grid(grid)
+    c1, c2, c3 = _random_index(rng, palette, 3)
+    tile = _blank(palette, grid)
+    tile[ys % 2 == 0] = c1              # Horizontal lines
+    tile[xs % 2 == 0] = c2              # Vertical lines
+    tile[(xs == ys) | (xs == grid-1 - ys)] = c3  # Diagonal
+    return _upscale(tile, cell, size)
+
+@register_array_pattern("stars")
+def pattern_stars(palette, rng, size=TILE):
     """
     Random small 'star' shapes (a plus sign) in random colors.
     """
-    for _ in range(10):
-        x = random.randint(1, 14)
-        y = random.randint(1, 14)
-        c = random.choice(palette)
-        draw.point((x, y), fill=c)
-        draw.point((x-1, y), fill=c)
-        draw.point((x+1, y), fill=c)
-        draw.point((x, y-1), fill=c)
-        draw.point((x, y+1), fill=c)
+    cell, grid = _cells(size)
+    tile = _blank(palette, grid)
+    for _ in range(_count(10, grid)):
+        x = rng.integers(1, grid-1)
+        y = rng.integers(1, grid-1)
+        c = _random_index(rng, palette)
+        tile[y, x-1:x+2] = c
+        tile[y-1:y+2, x] = c
+    return _upscale(tile, cell, size)
 
-@register_pattern("barcode")
-def pattern_barcode(draw, palette):
+@register_array_pattern("barcode")
+def pattern_barcode(palette, rng, size=TILE):
     """
     Vertical stripes of random width in random colors.
     """
+    cell = _px(1, size)
+    columns = np.empty(size, dtype=np.intp)
     x = 0
-    while x < 16:
-        width = random.randint(1, 4)
-        color = random.choice(palette)
-        for cx in range(x, min(x+width, 16)):
-            for y in range(16):
-                draw.point((cx, y), fill=color)
+    while x < size:
+        width = rng.integers(1, 5) * cell
+        columns[x:x+width] = _random_index(rng, palette)
         x += width
+    return np.broadcast_to(columns, (size, size)).copy()
 
-@register_pattern("plaid")
-def pattern_plaid(draw, palette):
+@register_array_pattern("plaid")
+def pattern_plaid(palette, rng, size=TILE):
     """
     A rudimentary plaid: horizontal + vertical stripes in random palette colors.
     """
+    ys, xs = _grid(size)
+    step = _px(4, size)
+    width = _px(1, size)
+    stripes = -(-size // step)
     # Fill everything with a base color
-    base_color = palette[0]
-    for y in range(16):
-        for x in range(16):
-            draw.point((x, y), fill=base_color)
-
-    # Draw horizontal stripes
-    for y in range(0, 16, 4):
-        c = random.choice(palette)
-        for x in range(16):
-            draw.point((x, y), fill=c)
-    # Draw vertical stripes
-    for x in range(0, 16, 4):
-        c = random.choice(palette)
-        for y in range(16):
-            draw.point((x, y), fill=c)
-
-@register_pattern("circles_in_cells")
-def pattern_circles_in_cells(draw, palette):
+    tile = np.zeros((size, size), dtype=np.intp)
+    # Draw horizontal stripes, then vertical stripes over them
+    row_colors = _random_index(rng, palette, (stripes, 1))
+    col_colors = _random_index(rng, palette, (1, stripes))
+    rows = ys % step < width
+    tile[rows] = row_colors[ys // step, 0][rows]
+    cols = xs % step < width
+    tile[cols] = col_colors[0, xs // step][cols]
+    return tile
+
+@register_array_pattern("circles_in_cells")
+def pattern_circles_in_cells(palette, rng, size=TILE):
     """
     Divide the tile into 4x4 cells, draw small circles in each.
     """
+    tile = _blank(palette, size)
+    cell_size = size // 4
     cidx = 0
-    cell_size = 4
     for cy in range(4):
         for cx in range(4):
-            color = palette[cidx % len(palette)]
-            cidx += 1
             # center of cell
             center_x = cx*cell_size + cell_size//2
             center_y = cy*cell_size + cell_size//2
-            radius = 1
-            for angle_deg in range(360):
-                import math
-                angle = math.radians(angle_deg)
-                x = int(center_x + radius * math.cos(angle))
-                y = int(center_y + radius * math.sin(angle))
-                if 0 <= x < 16 and 0 <= y < 16:
-                    draw.point((x, y), fill=color)
-
-@register_pattern("diagonal_stripes_large")
-def pattern_diagonal_stripes_large(draw, palette):
+            for points in _ring_points(center_x, center_y, 1, size):
+                tile[points] = cidx % len(palette)
+            cidx += 1
+    return tile
+
+@register_array_pattern("diagonal_stripes_large")
+def pattern_diagonal_stripes_large(palette, rng, size=TILE):
     """
     Wider diagonal stripes (4 px wide).
     """
-    stripe_width = 4
-    for x in range(16):
-        for y in range(16):
-            # Stripe index by integer division with stripe_width
-            idx = ((x - y) // stripe_width) % len(palette)
-            draw.point((x, y), fill=palette[idx])
+    ys, xs = _grid(size)
+    stripe_width = _px(4, size)
+    return ((xs - ys) // stripe_width) % len(palette)
 
-@register_pattern("bricks")
-def pattern_bricks(draw, palette):
+@register_array_pattern("bricks")
+def pattern_bricks(palette, rng, size=TILE):
     """
     Brick-like horizontal rows offset in a 'bricklaying' pattern.
     """
-    brick_height = 4
-    for y in range(0, 16, brick_height):
-        offset = (y // brick_height) % 2
-        for x in range(16):
-            color = palette[((x // 4) + offset) % len(palette)]
-            for row in range(brick_height):
-                if y + row < 16:
-                    draw.point((x, y + row), fill=color)
+    ys, xs = _grid(size)
+    brick_height = _px(4, size)
+    brick_width = _px(4, size)
+    offset = (ys // brick_height) % 2
+    return ((xs // brick_width) + offset) % len(palette)
 
-@register_pattern("stipple")
-def pattern_stipple(draw, palette):
+@register_array_pattern("stipple")
+def pattern_stipple(palette, rng, size=TILE):
     """
     A stipple effect: each pixel is chosen by a threshold on random.
     """
-    for y in range(16):
-        for x in range(16):
-            if random.random() < 0.5:
-                draw.point((x, y), fill=random.choice(palette))
+    painted = rng.random((size, size)) < 0.5
+    return np.where(painted, _random_index(rng, palette, (size, size)), len(palette))
 
-@register_pattern("honeycomb")
-def pattern_honeycomb(draw, palette):
+@lru_cache(maxsize=None)
+def _honeycomb_cells(grid):
     """
-    Simplified honeycomb pattern: hex-like rings.
+    (cell number, ys, xs) for every small hex ring in the honeycomb layout
+    on a grid x grid tile.
     """
-    cidx = 0
-    for y in range(0, 16, 2):
+    cells = []
+    for y in range(0, grid, 2):
         shift = (y // 2) % 2
-        for x in range(0, 16, 3):
-            color = palette[cidx % len(palette)]
-            cidx += 1
+        for x in range(0, grid, 3):
             # center of hex cell
             cx = x + (1 if shift else 0)
             cy = y
-            # draw a small hex ring
-            coords = [
-                (cx,   cy),
-                (cx+1, cy+1),
-                (cx+1, cy+2),
-                (cx,   cy+3),
-                (cx-1, cy+2),
-                (cx-1, cy+1)
-            ]
-            for (px, py) in coords:
-                if 0 <= px < 16 and 0 <= py < 16:
-                    draw.point((px, py), fill=color)
-
-@register_pattern("wave")
-def pattern_wave(draw, palette):
+            coords = [(cx, cy), (cx+1, cy+1), (cx+1, cy+2),
+                      (cx, cy+3), (cx-1, cy+2), (cx-1, cy+1)]
+            coords = [(px, py) for (px, py) in coords if 0 <= px < grid and 0 <= py < grid]
+            xs = np.array([px for px, _ in coords], dtype=int)
+            ys = np.array([py for _, py in coords], dtype=int)
+            cells.append((len(cells), ys, xs))
+    return cells
+
+@register_array_pattern("honeycomb")
+def pattern_honeycomb(palette, rng, size=TILE):
+    """
+    Simplified honeycomb pattern: hex-like rings.
+    """
+    cell, grid = _cells(size)
+    tile = _blank(palette, grid)
+    for cidx, ys, xs in _honeycomb_cells(grid):
+        tile[ys, xs] = cidx % len(palette)
+    return _upscale(tile, cell, size)
+
+@register_array_pattern("wave")
+def pattern_wave(palette, rng, size=TILE):
     """
     Wave-like arcs across the tile.
     """
-    for y in range(16):
-        color = random.choice(palette)
-        for x in range(16):
-            import math
-            # Use a sinusoidal wave
-            wave_offset = int(2.0 * math.sin(x / 2.0))
-            ty = (y + wave_offset) % 16
-            draw.point((x, ty), fill=color)
+    ys, _ = _grid(size)
+    cell, grid = _cells(size)
+    scale = size / TILE
+    band_colors = _random_index(rng, palette, grid)
+    # Use a sinusoidal wave: row y is drawn shifted down by wave_offset[x]
+    wave_offset = np.trunc(2.0 * scale * np.sin(np.arange(size) / (2.0 * scale))).astype(int)
+    return band_colors[((ys - wave_offset) % size) // cell]
 
-@register_pattern("clouds_8bit")
-def pattern_clouds_8bit(draw, palette):
+@register_array_pattern("clouds_8bit")
+def pattern_clouds_8bit(palette, rng, size=TILE):
     """
     Blocky 'clouds' effect. We'll fill random squares that drift horizontally.
     """
-    for y_block in range(0, 16, 4):
-        # random offset
-        offset = random.randint(-2, 2)
-        color = random.choice(palette)
-        for x_block in range(0, 16, 4):
-            for yy in range(y_block, y_block + 4):
-                for xx in range(x_block, x_block + 4):
-                    tx = (xx + offset) % 16
-                    ty = yy % 16
-                    draw.point((tx, ty), fill=color)
+    ys, _ = _grid(size)
+    band = max(1, size // 4)
+    # The horizontal drift wraps around, so every band of rows ends up one color.
+    band_colors = _random_index(rng, palette, -(-size // band))
+    return band_colors[ys // band]
 
 
 """
-Tessellations 
+Tessellations
 """
 
-@register_pattern("tessellated_mirror")
-def pattern_tessellated_mirror(draw, palette):
+@register_array_pattern("tessellated_mirror")
+def pattern_tessellated_mirror(palette, rng, size=TILE):
     """
     Fill the top-left quadrant with random picks from the palette,
     then mirror it horizontally and vertically, ensuring the tile edges
     match seamlessly.
-    
-    This results in a 16x16 tile that "tessellates" or repeats seamlessly
+
+    This results in a tile that "tessellates" or repeats seamlessly
     on both X and Y axes.
     """
-    # Fill the top-left 8x8 region randomly
-    quadrant = [[random.choice(palette) for _ in range(8)] for _ in range(8)]
-
-    # Mirror horizontally for the top-right
-    # Mirror vertically for the bottom row
-    # Then place them all onto the tile
-    for y in range(8):
-        for x in range(8):
-            # top-left
-            draw.point((x, y), fill=quadrant[y][x])
-            # top-right (mirror horizontally)
-            draw.point((15 - x, y), fill=quadrant[y][x])
-            # bottom-left (mirror vertically)
-            draw.point((x, 15 - y), fill=quadrant[y][x])
-            # bottom-right (mirror both)
-            draw.point((15 - x, 15 - y), fill=quadrant[y][x])
-
-
-@register_pattern("tileable_noise")
-def pattern_tileable_noise(draw, palette):
-    """
-    A simple tileable noise approach:
-      - We'll create random offsets in a 2D grid, but wrap at the edges
-        to ensure the left and right edges match, top and bottom edges match.
-      - Then we map the noise value to a color from the palette.
-    
-    This won't be "true Perlin" noise, but it's a quick demonstration of
-    a tileable random pattern for seamless edges.
-    """
-    # We'll create a 16x16 array of random floats in [0,1) but ensure wrap.
-    # Then we choose colors from palette based on that noise value.
-    # For more advanced usage, you could implement or import real
-    # "tileable Perlin or simplex noise."
-    
-    # 1) Generate a 17x17 "seed" so edges wrap (index 16 wraps to 0).
-    #    We'll average corners to help continuity.
-    noise_grid = [[random.random() for _ in range(17)] for _ in range(17)]
-
-    # 2) Blend the final column/row with the start to ensure wrap
-    for i in range(17):
-        noise_grid[i][16] = noise_grid[i][0]   # wrap horizontally
-        noise_grid[16][i] = noise_grid[0][i]   # wrap vertically
-    # corner noise_grid[16][16] is same as noise_grid[0][0]
-
-    # 3) Now fill each pixel by interpolating the noise.
-    #    For simplicity, let's do no interpolation, just sample nearest:
-    #    (x, y) in [0..15] => noise_grid[y][x].
-    #    Then map that value to the palette.
-    #    If you'd like smooth transitions, you could do bilinear interpolation,
-    #    but let's keep it simple.
-    # 4) Convert noise to color by dividing the noise range into len(palette) bands.
-    palette_count = len(palette)
-    step = 1.0 / float(palette_count)
-
-    for y in range(16):
-        for x in range(16):
-            val = noise_grid[y][x]  # range [0,1)
-            # figure out which color index
-            idx = int(val / step)
-            if idx >= palette_count:
-                idx = palette_count - 1
-            draw.point((x, y), fill=palette[idx])
+    half = -(-size // 2)
+    # Fill the top-left quadrant randomly
+    quadrant = _random_index(rng, palette, (half, half))
+    # Mirror horizontally for the top half, then vertically for the bottom half
+    top = np.hstack([quadrant, quadrant[:, ::-1]])[:, :size]
+    return np.vstack([top, top[::-1, :]])[:size, :]
 
 
-@register_pattern("tessellated_stripes")
-def pattern_tessellated_stripes(draw, palette):
+@register_array_pattern("tessellated_stripes")
+def pattern_tessellated_stripes(palette, rng, size=TILE):
     """
     Example of stripes that wrap seamlessly:
       - The top edge and bottom edge continue the stripes,
       - The left edge and right edge continue the stripes.
     """
+    ys, xs = _grid(size)
     # Let's define a repeating stripe pattern that wraps both ways:
-    stripe_width = 4  # each stripe is 4 px wide
-    palette_count = len(palette)
+    stripe_width = _px(4, size)  # each stripe is 4 px wide on a 16px tile
+    return ((xs + ys) // stripe_width) % len(palette)
 
-    for y in range(16):
-        for x in range(16):
-            # We can define a "diagonal" approach that depends on (x + y).
-            # Because we want wrap, let's do mod 16 on (x+y).
-            idx = ((x + y) // stripe_width) % palette_count
-            draw.point((x, y), fill=palette[idx])
-
-
-@register_pattern("tileable_voronoi")
-def pattern_tileable_voronoi(draw, palette):
-    """
-    A simple 'Voronoi-like' pattern that attempts to be tileable:
-      - We place random points *in a 16x16 domain plus an overlapping margin*
-        so that the domain wraps around.
-      - For each pixel, we find the nearest random point, ignoring wrap or 
-        considering wrap. We then color by the index of that nearest point mod palette length.
-    
-    This is computationally heavier (16x16 with nearest search),
-    but can produce interesting 'cell-like' or 'patch-like' patterns that tile.
-    """
-    # Number of points
-    num_points = 6
-    # We'll store random points in an extended domain [-16..32, -16..32],
-    # then map them "mod 16" so edges wrap. This is to approximate tileable Voronoi.
-    points = []
-    for _ in range(num_points):
-        # place in [0..16) but let's also replicate them in margin
-        x = random.randint(0, 15)
-        y = random.randint(0, 15)
-        # We'll store them + extra offsets of 16 for wrap
-        for dx in [0, 16, -16]:
-            for dy in [0, 16, -16]:
-                points.append((x + dx, y + dy))
 
-    palette_count = len(palette)
+def tileable_voronoi(xs, ys, size, distances=False):
+    """
+    Nearest-seed map for seed points (xs, ys) on a size x size torus.
+
+    Distances wrap around both edges, so the result tiles seamlessly. Work
+    grows as pixels x points (no 9x copies of the seeds), and memory stays at
+    a few size x size arrays however many seeds there are. Ties go to the
+    lowest seed index.
+
+    Returns the (size, size) array of seed indices, or with distances=True a
+    tuple (indices, f1, f2) with the Euclidean distance to the nearest and
+    second-nearest seed (f2 is inf when there is only one seed). f2 - f1 is
+    small near cell borders, which is handy for edge shading.
+    """
+    axis = np.arange(size)
+    nearest = np.zeros((size, size), dtype=np.intp)
+    f1 = np.full((size, size), np.inf)
+    f2 = np.full((size, size), np.inf) if distances else None
+    d2 = np.empty((size, size))
+    closer = np.empty((size, size), dtype=bool)
+    for i, (px, py) in enumerate(zip(xs, ys)):
+        # Wrapped distance along each axis is 1-D; the square is an outer sum.
+        dx = np.abs(axis - px) % size
+        dy = np.abs(axis - py) % size
+        dx = np.minimum(dx, size - dx)
+        dy = np.minimum(dy, size - dy)
+        np.add.outer(dy*dy, dx*dx, out=d2)
+        np.less(d2, f1, out=closer)
+        if distances:
+            np.minimum(f2, d2, out=f2)
+            np.copyto(f2, f1, where=closer)
+        np.copyto(f1, d2, where=closer)
+        nearest[closer] = i
+    if distances:
+        return nearest, np.sqrt(f1), np.sqrt(f2)
+    return nearest
+
+
+@register_array_pattern("tileable_voronoi")
+def pattern_tileable_voronoi(palette, rng, size=TILE, num_points=6):
+    """
+    A 'Voronoi-like' pattern that tiles seamlessly:
+      - We place random seed points in the tile.
+      - For each pixel, we find the nearest seed, with distances wrapping
+        around the tile edges. We then color by the index of that nearest
+        point mod palette length.
+
+    For more cells, register a variant, e.g.
+    register_array_pattern("voronoi_dense")(functools.partial(pattern_tileable_voronoi, num_points=24))
+    """
+    xs = rng.integers(0, size, num_points)
+    ys = rng.integers(0, size, num_points)
+    return tileable_voronoi(xs, ys, size) % len(palette)
+
+
+@register_array_pattern("tileable_voronoi_edges")
+def pattern_tileable_voronoi_edges(palette, rng, size=TILE, num_points=8, edge_width=0.6):
+    """
+    Tileable Voronoi cells outlined in the first palette color: pixels whose
+    nearest and second-nearest seeds are almost equally far away form the
+    cell borders, the cells themselves cycle through the remaining colors.
+    """
+    xs = rng.uniform(0, size, num_points)
+    ys = rng.uniform(0, size, num_points)
+    cells, f1, f2 = tileable_voronoi(xs, ys, size, distances=True)
+    fill_colors = max(1, len(palette) - 1)
+    tile = 1 + cells % fill_colors if len(palette) > 1 else cells * 0
+    return np.where(f2 - f1 < edge_width * size / TILE, 0, tile)
+
+
+@lru_cache(maxsize=64)
+def noise_tables(seed):
+    """
+    Permutation and gradient tables for gradient noise, built once per seed.
+
+    Returns (perm, grads): perm is a shuffled 0..255 repeated twice, so
+    perm[perm[i] + j] never needs wrapping, and grads holds 256 random unit
+    vectors as an (256, 2) array. Both are read-only.
+    """
+    rng = np.random.default_rng(seed)
+    perm = np.tile(rng.permutation(256), 2)
+    angles = rng.uniform(0.0, 2.0 * math.pi, 256)
+    grads = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    perm.flags.writeable = False
+    grads.flags.writeable = False
+    return perm, grads
+
+
+def _fade(t):
+    return t * t * t * (t * (t * 6.0 - 15.0) + 10.0)
+
+
+def periodic_noise(width, height, cells_x, cells_y, seed=0, shift=0):
+    """
+    Perlin gradient noise for a width x height field with cells_x x cells_y
+    lattice cells, sampled at pixel centers. Lattice coordinates wrap modulo
+    the cell counts, so the field tiles seamlessly on both edges. Values lie
+    roughly in [-1, 1]. shift offsets the hash so one seed's tables can give
+    several unrelated fields (fbm uses it per octave).
+
+    Everything is computed on whole arrays: gradients are looked up once per
+    lattice cell and gathered along each axis with 1-D indices, so there is
+    no per-pixel Python work and a whole map can be filled in one call.
+    """
+    perm, grads = noise_tables(seed)
+    lattice = perm[perm[(np.arange(cells_x) + shift) & 255][None, :]
+                   + (np.arange(cells_y) & 255)[:, None]]
+    # float32 halves the memory traffic of map-sized fields; plenty for colors.
+    gx = grads[lattice, 0].astype(np.float32)
+    gy = grads[lattice, 1].astype(np.float32)
+
+    def axis(pixels, cells):
+        t = (np.arange(pixels) + 0.5) * (cells / float(pixels))
+        i0 = np.floor(t).astype(np.intp)
+        f = (t - i0).astype(np.float32)
+        return i0 % cells, (i0 + 1) % cells, f
+
+    x0, x1, fx = axis(width, cells_x)
+    y0, y1, fy = axis(height, cells_y)
+    fx, fy = fx[None, :], fy[:, None]
+
+    def corner(iy, ix, dx, dy):
+        return gx.take(iy, 0).take(ix, 1) * dx + gy.take(iy, 0).take(ix, 1) * dy
+
+    n00 = corner(y0, x0, fx, fy)
+    n10 = corner(y0, x1, fx - 1.0, fy)
+    n01 = corner(y1, x0, fx, fy - 1.0)
+    n11 = corner(y1, x1, fx - 1.0, fy - 1.0)
+    u, v = _fade(fx), _fade(fy)
+    top = n00 + u * (n10 - n00)
+    bottom = n01 + u * (n11 - n01)
+    # Unit gradients keep 2-D Perlin noise within +-sqrt(1/2).
+    return (top + v * (bottom - top)) * math.sqrt(2.0)
+
 
-    for y in range(16):
-        for x in range(16):
-            # Find nearest point
-            nearest_dist2 = 999999
-            nearest_index = 0
-            for i, (px, py) in enumerate(points):
-                dx = px - x
-                dy = py - y
-                dist2 = dx*dx + dy*dy
-                if dist2 < nearest_dist2:
-                    nearest_dist2 = dist2
-                    nearest_index = i
-            # The "original" random points were repeated 9 times (including offsets).
-            # The real "index" is just nearest_index // 9 if we repeated 9 times each.
-            # That ensures the color is consistent for the same point across margins.
-            true_index = (nearest_index // 9) % palette_count
-            draw.point((x, y), fill=palette[true_index])
\ No newline at end of file
+def fbm(width, height=None, cells=2, octaves=4, persistence=0.5, seed=0):
+    """
+    Tileable fractal Brownian motion: octaves of periodic_noise, each with
+    twice the cells and `persistence` times the amplitude of the last.
+    cells is the lattice count of the first octave, an int or (cells_x,
+    cells_y) for non-square fields. Octaves finer than 2 px per cell add
+    nothing but aliasing and are skipped. Returns floats in [0, 1].
+    """
+    if height is None:
+        height = width
+    cells_x, cells_y = (cells, cells) if np.isscalar(cells) else cells
+    total = np.zeros((height, width), dtype=np.float32)
+    amplitude = 1.0
+    norm = 0.0
+    for octave in range(octaves):
+        if octave and (cells_x * 2 > width or cells_y * 2 > height):
+            break
+        total += amplitude * periodic_noise(width, height, cells_x, cells_y, seed,
+                                            shift=octave * 97)
+        norm += amplitude
+        amplitude *= persistence
+        cells_x, cells_y = cells_x * 2, cells_y * 2
+    return np.clip(total / (2.0 * norm) + 0.5, 0.0, 1.0)
+
+
+@register_array_pattern("tileable_noise")
+def pattern_tileable_noise(palette, rng, size=TILE, cells=2, octaves=4):
+    """
+    Tileable gradient noise: multi-octave Perlin fBm on a lattice that wraps
+    at the tile edges, so the left/right and top/bottom edges match.
+    The noise range of the tile is split into len(palette) bands.
+
+    Variants can be registered with functools.partial, e.g.
+    register_array_pattern("noise_soft")(functools.partial(pattern_tileable_noise, octaves=1))
+    """
+    field = fbm(size, size, cells, octaves, seed=int(rng.integers(0, 2**32)))
+    low, high = field.min(), field.max()
+    field = (field - low) / (high - low) if high > low else np.zeros_like(field)
+    palette_count = len(palette)
+    return np.minimum((field * palette_count).astype(np.intp), palette_count - 1)
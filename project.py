@@ -0,0 +1,316 @@
+"""
+Project files: a map's tileset, id grids (layers) and metadata in one
+binary file, so a map can be saved and opened again.
+
+Layout (little-endian):
+
+    b"TGPROJ\\r\\n"   magic, 8 bytes
+    u16             format version (VERSION)
+    u16, u32        reserved, 0
+    u64             offset of the index
+    ...             sections: the tileset blob, then one grid per layer
+    index           UTF-8 JSON: tile size, map size, metadata and where
+                    each section is and how it is encoded
+
+The tileset holds each tile the layers use exactly once (the registry
+already deduplicates by content), as one zlib blob of raw pixels; ids are
+renumbered 1..n in the file. Layers are uint16 id grids stored either
+zlib-compressed or raw and page-aligned. Raw layers are memory-mapped by
+load_project, so opening a huge map costs almost nothing and its rows are
+read from disk as they are first touched.
+
+Nothing here imports tkinter.
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from tilemap import EMPTY, TileRegistry
+
+MAGIC = b"TGPROJ\r\n"
+VERSION = 1
+# Layers at least this big are stored raw (memory-mappable) unless the
+# caller asks for compression.
+MMAP_MIN_BYTES = 4 * 1024 * 1024
+
+_PREAMBLE = struct.Struct("<8sHHIQ")
+_GRID_DTYPE = np.dtype("<u2")
+_BAND_CELLS = 1 << 20  # cells converted and written at a time
+_TILE_MODES = ("RGB", "RGBA", "L", "LA")
+
+
+class Project:
+    """
+    An opened project: the tileset, the layers (name -> id grid, all the
+    same shape, the first one being the map), tile size and metadata.
+    """
+
+    def __init__(self, registry, layers, tile_size, metadata=None):
+        self.registry = registry
+        self.layers = layers
+        self.tile_size = tile_size
+        self.metadata = metadata or {}
+
+    @property
+    def grid(self):
+        """
+        The first layer.
+        """
+        return next(iter(self.layers.values()))
+
+
+def _bands(grid):
+    """
+    Row slices of grid covering about _BAND_CELLS cells each.
+    """
+    step = max(1, _BAND_CELLS // max(1, grid.shape[1]))
+    for top in range(0, grid.shape[0], step):
+        yield grid[top:top + step]
+
+
+def _used_ids(layers, count):
+    """
+    Sorted ids other than EMPTY that appear on any layer.
+    """
+    seen = np.zeros(count, dtype=bool)
+    for grid in layers.values():
+        for band in _bands(grid):
+            seen |= np.bincount(band.ravel(), minlength=count).astype(bool)
+    seen[EMPTY] = False
+    return np.flatnonzero(seen)
+
+
+def _write_layer(f, grid, lut, compress, on_band):
+    """
+    Write one layer at the current position (page-aligned first when raw)
+    and return its index entry, which records the largest id written.
+    on_band(cells) follows each band written.
+    """
+    if not compress:
+        f.write(bytes(-f.tell() % mmap.ALLOCATIONGRANULARITY))
+    offset = f.tell()
+    packer = zlib.compressobj(6) if compress else None
+    max_id = EMPTY
+    for band in _bands(grid):
+        ids = band if lut is None else lut[band]
+        if ids.size:
+            max_id = max(max_id, int(ids.max()))
+        data = ids.astype(_GRID_DTYPE, copy=False).tobytes()
+        f.write(packer.compress(data) if compress else data)
+        on_band(band.size)
+    if compress:
+        f.write(packer.flush())
+    return {"offset": offset, "length": f.tell() - offset,
+            "encoding": "zlib" if compress else "raw", "max_id": max_id}
+
+
+def save_project(path, registry, layers, tile_size, metadata=None, compress=None,
+                 progress=None):
+    """
+    Write layers (name -> id grid, all the same shape) with the tiles they
+    use to path. compress True or False forces zlib or raw layers; None
+    compresses layers smaller than MMAP_MIN_BYTES. metadata must be JSON
+    serializable. The file is written next to path and moved into place,
+    so a failed save never leaves a half-written project.
+
+    progress(done, total), if given, is called with layer cells written.
+    The grids and registry are only read, so this can run on a worker
+    thread while the caller keeps registering tiles (see main.py autosave).
+    """
+    shapes = {grid.shape for grid in layers.values()}
+    if len(shapes) != 1:
+        raise ValueError("layers must all have the same shape")
+    height, width = shapes.pop()
+    used = _used_ids(layers, len(registry))
+    lut = None
+    if not np.array_equal(used, np.arange(1, len(used) + 1)):
+        lut = np.zeros(len(registry), dtype=np.uint16)
+        lut[used] = np.arange(1, len(used) + 1)
+
+    total = sum(grid.size for grid in layers.values())
+    done = 0
+
+    def on_band(cells):
+        nonlocal done
+        done += cells
+        if progress is not None:
+            progress(done, total)
+
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, 0, 0, 0))
+            tiles = []
+            offset = f.tell()
+            packer = zlib.compressobj(6)
+            for tile_id in used.tolist():
+                tile = registry.get(tile_id)
+                if tile.mode not in _TILE_MODES:
+                    tile = tile.convert("RGBA")
+                tiles.append([tile.mode, tile.width, tile.height])
+                f.write(packer.compress(tile.tobytes()))
+            f.write(packer.flush())
+            index = {
+                "tile_size": tile_size,
+                "width": width,
+                "height": height,
+                "metadata": metadata or {},
+                "tileset": {"offset": offset, "length": f.tell() - offset,
+                            "encoding": "zlib", "tiles": tiles},
+                "layers": [],
+            }
+            for name, grid in layers.items():
+                big = grid.size * _GRID_DTYPE.itemsize >= MMAP_MIN_BYTES
+                entry = _write_layer(f, grid, lut, not big if compress is None else compress, on_band)
+                entry["name"] = name
+                index["layers"].append(entry)
+            index_offset = f.tell()
+            f.write(json.dumps(index).encode("utf-8"))
+            f.seek(0)
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, 0, 0, index_offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _read_section(f, entry):
+    f.seek(entry["offset"])
+    data = f.read(entry["length"])
+    if len(data) != entry["length"]:
+        raise ValueError("project file is truncated")
+    return zlib.decompress(data) if entry["encoding"] == "zlib" else data
+
+
+def _invalid(path, why):
+    return ValueError("{} is not a valid project file: {}".format(path, why))
+
+
+def _check_section(entry, file_size, what):
+    """
+    Check a section entry of the index: offset, length and encoding.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError("{} is not an object".format(what))
+    for key in ("offset", "length"):
+        if not isinstance(entry.get(key), int) or entry[key] < 0:
+            raise ValueError("{} has no valid {}".format(what, key))
+    if entry["offset"] + entry["length"] > file_size:
+        raise ValueError("{} runs past the end of the file".format(what))
+    if entry.get("encoding") not in ("zlib", "raw"):
+        raise ValueError("{} has unknown encoding {!r}".format(what, entry.get("encoding")))
+
+
+def _check_index(index, file_size):
+    """
+    Raise ValueError unless the index has every field
+    load_project uses, with the right types.
+    """
+    if not isinstance(index, dict):
+        raise ValueError("the index is not an object")
+    for key in ("tile_size", "width", "height"):
+        if not isinstance(index.get(key), int) or index[key] < 1:
+            raise ValueError("{} is missing or not a positive integer".format(key))
+    if not isinstance(index.get("metadata", {}), dict):
+        raise ValueError("metadata is not an object")
+    tileset = index.get("tileset")
+    _check_section(tileset, file_size, "the tileset")
+    tiles = tileset.get("tiles")
+    if not isinstance(tiles, list):
+        raise ValueError("the tileset has no tile list")
+    for tile in tiles:
+        if (not isinstance(tile, list) or len(tile) != 3 or tile[0] not in _TILE_MODES
+                or not all(isinstance(v, int) and v > 0 for v in tile[1:])):
+            raise ValueError("bad tile entry {!r}".format(tile))
+    layers = index.get("layers")
+    if not isinstance(layers, list) or not layers:
+        raise ValueError("there are no layers")
+    cells = index["width"] * index["height"]
+    for n, entry in enumerate(layers):
+        what = "layer {}".format(n)
+        _check_section(entry, file_size, what)
+        if not isinstance(entry.get("name"), str):
+            raise ValueError("{} has no name".format(what))
+        if not isinstance(entry.get("max_id", 0), int):
+            raise ValueError("{} has no valid max_id".format(what))
+        if entry["encoding"] == "raw" and entry["length"] != cells * _GRID_DTYPE.itemsize:
+            raise ValueError("{} is {} bytes, expected {}".format(
+                what, entry["length"], cells * _GRID_DTYPE.itemsize))
+
+
+def load_project(path, use_mmap=True):
+    """
+    Open a project saved by save_project. Raw layers are memory-mapped
+    copy-on-write when use_mmap is set (edits stay in memory, the file is
+    never written); otherwise everything is read in. Raises ValueError
+    for files that are not projects, are damaged or come from a newer
+    version.
+    """
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        preamble = f.read(_PREAMBLE.size).ljust(_PREAMBLE.size, b"\0")
+        magic, version, _, _, index_offset = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError("{} is not a tile_genie project".format(path))
+        if version > VERSION:
+            raise ValueError("{} was saved by a newer version (format {}, this is {})".format(
+                path, version, VERSION))
+        try:
+            f.seek(index_offset)
+            index = json.loads(f.read().decode("utf-8"))
+            _check_index(index, file_size)
+            return _load_sections(f, path, index, use_mmap)
+        except ValueError as e:
+            raise _invalid(path, e) from None
+        except (KeyError, TypeError, IndexError, zlib.error, OverflowError) as e:
+            raise _invalid(path, "{}: {}".format(type(e).__name__, e)) from None
+
+
+def _load_sections(f, path, index, use_mmap):
+    """
+    The tileset and layers described by a checked index.
+    """
+    registry = TileRegistry()
+    tileset = index["tileset"]
+    blob = _read_section(f, tileset)
+    lut = np.zeros(len(tileset["tiles"]) + 1, dtype=np.uint16)
+    pos = 0
+    for n, (mode, w, h) in enumerate(tileset["tiles"], start=1):
+        size = w * h * len(mode)
+        if pos + size > len(blob):
+            raise ValueError("the tileset is shorter than its tile list")
+        lut[n] = registry.add(Image.frombytes(mode, (w, h), blob[pos:pos + size]))
+        pos += size
+    # A fresh registry hands out 1..n unless the file repeats a tile.
+    remap = not np.array_equal(lut, np.arange(len(lut)))
+
+    shape = (index["height"], index["width"])
+    layers = {}
+    for entry in index["layers"]:
+        mapped = entry["encoding"] == "raw" and use_mmap
+        if mapped:
+            grid = np.asarray(np.memmap(path, dtype=_GRID_DTYPE, mode="c",
+                                        offset=entry["offset"], shape=shape))
+        else:
+            grid = np.frombuffer(_read_section(f, entry), dtype=_GRID_DTYPE).reshape(shape)
+            grid = grid.astype(np.uint16)  # a writable, native-order copy
+        # A bad id would otherwise only surface once the map is drawn.
+        # Mapped layers are checked by the max_id saved with them, so their
+        # pages are not read here; older files without it are scanned.
+        if mapped and "max_id" in entry:
+            max_id = entry["max_id"]
+        else:
+            max_id = int(grid.max()) if grid.size else EMPTY
+        if max_id >= len(lut):
+            raise ValueError("layer {!r} references tile ids past the tileset".format(entry["name"]))
+        layers[entry["name"]] = lut[grid] if remap else grid
+    return Project(registry, layers, index["tile_size"], index.get("metadata", {}))
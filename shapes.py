@@ -0,0 +1,152 @@
+"""
+Shape rasterizer shared by the map editor and the tile editor.
+
+Shapes are given by two corner cells (the drag start and end) and come
+back as (ys, xs) int arrays holding every covered cell exactly once, so
+callers write each cell a single time. Outlines use integer midpoint
+algorithms (no trigonometry); stroke width is applied by stamping a
+precomputed square brush on every outline cell.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+def line_cells(x0, y0, x1, y1):
+    """
+    Cells of the line from (x0, y0) to (x1, y1): one per step along the
+    longer axis, the other coordinate rounded to the nearest cell.
+    """
+    dx, dy = x1 - x0, y1 - y0
+    n = max(abs(dx), abs(dy))
+    if n == 0:
+        return np.array([y0]), np.array([x0])
+    i = np.arange(n + 1)
+    # x0 + round(i * dx / n), in integers (halves round up)
+    xs = x0 + np.floor_divide(2 * i * dx + n, 2 * n)
+    ys = y0 + np.floor_divide(2 * i * dy + n, 2 * n)
+    return ys, xs
+
+
+def rect_cells(x0, y0, x1, y1, filled=False):
+    """
+    Cells of the rectangle with corners (x0, y0) and (x1, y1).
+    """
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0, y1 = min(y0, y1), max(y0, y1)
+    ys, xs = np.mgrid[y0:y1 + 1, x0:x1 + 1]
+    if not filled:
+        edge = (ys == y0) | (ys == y1) | (xs == x0) | (xs == x1)
+        return ys[edge], xs[edge]
+    return ys.ravel(), xs.ravel()
+
+
+def ellipse_cells(x0, y0, x1, y1, filled=False):
+    """
+    Cells of the ellipse inscribed in the box with corners (x0, y0) and
+    (x1, y1). Midpoint ellipse on the doubled lattice, so even-sized
+    boxes are exact too; each iteration draws the four quadrants.
+    """
+    a, b = abs(x1 - x0), abs(y1 - y0)
+    if a == 0 or b == 0:
+        return line_cells(x0, y0, x1, y1)
+    b1 = b & 1
+    dx, dy = 4 * (1 - a) * b * b, 4 * (b1 + 1) * a * a
+    err = dx + dy + b1 * a * a
+    x0, x1 = min(x0, x1), max(x0, x1)
+    y0 = min(y0, y1) + (b + 1) // 2
+    y1 = y0 - b1
+    a, b1 = 8 * a * a, 8 * b * b
+    xs, ys = [], []
+    while x0 <= x1:
+        xs += (x1, x0, x0, x1)
+        ys += (y0, y0, y1, y1)
+        e2 = 2 * err
+        if e2 <= dy:
+            y0 += 1
+            y1 -= 1
+            dy += a
+            err += dy
+        if e2 >= dx or 2 * err > dy:
+            x0 += 1
+            x1 -= 1
+            dx += b1
+            err += dx
+    while y0 - y1 <= b:
+        # Flat ellipses stop early; finish their tips.
+        xs += (x0 - 1, x1 + 1, x0 - 1, x1 + 1)
+        ys += (y0, y0, y1, y1)
+        y0 += 1
+        y1 -= 1
+    ys, xs = np.array(ys), np.array(xs)
+    if filled:
+        return _fill_rows(ys, xs)
+    return _unique_cells(ys, xs)
+
+
+def _fill_rows(ys, xs):
+    """
+    Every cell between the leftmost and rightmost outline cell of each row.
+    """
+    order = np.lexsort((xs, ys))
+    ys, xs = ys[order], xs[order]
+    rows, first = np.unique(ys, return_index=True)
+    last = np.append(first[1:], len(ys)) - 1
+    lengths = xs[last] - xs[first] + 1
+    span_start = np.cumsum(lengths) - lengths
+    out_xs = np.repeat(xs[first] - span_start, lengths) + np.arange(lengths.sum())
+    return np.repeat(rows, lengths), out_xs
+
+
+def _unique_cells(ys, xs):
+    if len(ys) == 0:
+        return ys, xs
+    y0, x0 = ys.min(), xs.min()
+    span = int(xs.max() - x0) + 1
+    key = np.unique((ys - y0).astype(np.int64) * span + (xs - x0))
+    return key // span + y0, key % span + x0
+
+
+@lru_cache(maxsize=16)
+def brush_offsets(stroke):
+    """
+    (dy, dx) offsets of the square brush for a stroke width: the cells
+    within (stroke - 1) // 2 of the centre.
+    """
+    rad = (stroke - 1) // 2
+    dy, dx = np.mgrid[-rad:rad + 1, -rad:rad + 1]
+    return dy.ravel(), dx.ravel()
+
+
+def stroke_cells(ys, xs, stroke, width, height):
+    """
+    The cells covered by stamping the brush on every (ys, xs) cell,
+    clipped to a width x height grid. The input cells must be distinct.
+    """
+    ys, xs = np.asarray(ys), np.asarray(xs)
+    if stroke > 2:
+        dy, dx = brush_offsets(stroke)
+        ys = (ys[:, None] + dy).ravel()
+        xs = (xs[:, None] + dx).ravel()
+    inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+    ys, xs = ys[inside], xs[inside]
+    if stroke > 2:
+        return _unique_cells(ys, xs)  # brush stamps overlap
+    return ys, xs
+
+
+SHAPES = {
+    "line": lambda x0, y0, x1, y1, filled: line_cells(x0, y0, x1, y1),
+    "rect": rect_cells,
+    "ellipse": ellipse_cells,
+}
+
+
+def shape_cells(shape, x0, y0, x1, y1, width, height, stroke=1, filled=False):
+    """
+    Cells of a "line", "rect" or "ellipse" dragged from (x0, y0) to
+    (x1, y1), with the brush applied and clipped to the grid.
+    """
+    ys, xs = SHAPES[shape](x0, y0, x1, y1, filled)
+    return stroke_cells(ys, xs, stroke, width, height)
@@ -0,0 +1,179 @@
+"""
+Command-line entry point:
+
+    python -m tile_genie generate grass --pattern bricks --seed 7 -o grass.png
+    python -m tile_genie export sheet.png --words ice lava --patterns solid dots
+    python -m tile_genie gameboyize map.png -o map_gb.png --palette dmg --dither ordered
+    python -m tile_genie gbtiles map.png -o build/map --palette dmg --gbc
+    python -m tile_genie gui
+
+Nothing here imports tkinter unless the `gui` command is used, and the
+generator, Pillow and NumPy are only imported by the command that needs
+them, so the headless commands start quickly on build machines.
+"""
+
+import argparse
+import sys
+
+# Same as generator.TILE_SIZES; kept here so building the parser doesn't
+# import the generator.
+TILE_SIZES = (8, 16, 32, 64)
+# Same as gameboy.DITHER_MODES.
+DITHER_MODES = ("none", "ordered", "floyd-steinberg")
+
+
+def cmd_generate(args):
+    from generator import generate_tile_for_word
+
+    tile = generate_tile_for_word(args.word,
+                                  pattern_name=args.pattern,
+                                  hue_shift=args.hue,
+                                  sat_mult=args.sat,
+                                  val_mult=args.val,
+                                  seed=args.seed,
+                                  size=args.size)
+    if args.scale > 1:
+        from PIL import Image
+        tile = tile.resize((tile.width*args.scale, tile.height*args.scale), Image.NEAREST)
+    tile.save(args.output, "PNG")
+    return 0
+
+
+def cmd_export(args):
+    """
+    Write a sprite sheet with one tile per word × pattern × seed combination,
+    row by row.
+    """
+    from PIL import Image
+    from batch import generate_tiles
+
+    tiles = generate_tiles(words=args.words,
+                           pattern_names=args.patterns,
+                           hues=(args.hue,), sats=(args.sat,), vals=(args.val,),
+                           seeds=tuple(args.seeds) if args.seeds else (None,),
+                           processes=args.processes,
+                           size=args.size)
+    count, th, tw, _ = tiles.shape
+    cols = max(1, min(args.columns, count))
+    rows = -(-count // cols)
+    padded = tiles
+    if rows*cols != count:
+        import numpy as np
+        padded = np.zeros((rows*cols, th, tw, 3), dtype=np.uint8)
+        padded[:count] = tiles
+    sheet = padded.reshape(rows, cols, th, tw, 3).swapaxes(1, 2).reshape(rows*th, cols*tw, 3)
+    Image.fromarray(sheet).save(args.output, "PNG")
+    return 0
+
+
+def cmd_gameboyize(args):
+    from PIL import Image
+    from gameboy import gameboyize_image, parse_palette
+
+    try:
+        parse_palette(args.palette)
+    except ValueError as e:
+        print("tile_genie gameboyize: {}".format(e), file=sys.stderr)
+        return 2
+    with Image.open(args.input) as img:
+        out = gameboyize_image(img, args.palette, args.dither)
+    out.save(args.output or args.input, "PNG")
+    return 0
+
+
+def cmd_gbtiles(args):
+    """
+    Convert a PNG map into Game Boy tile data, a tilemap and optionally
+    GBC attributes (see gameboy.write_gb_assets).
+    """
+    import os
+    from PIL import Image
+    from gameboy import write_gb_assets
+    from tilemap import slice_image
+
+    base = args.output or os.path.splitext(args.input)[0]
+    try:
+        with Image.open(args.input) as img:
+            grid, registry = slice_image(img, args.tile_size)
+        paths = write_gb_assets(base, grid, registry, args.tile_size,
+                                args.palette, args.dither, args.gbc)
+    except ValueError as e:
+        print("tile_genie gbtiles: {}".format(e), file=sys.stderr)
+        return 2
+    for path in paths:
+        print(path)
+    return 0
+
+
+def cmd_gui(args):
+    from main import main as run_gui
+    run_gui()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="tile_genie",
+                                     description="Game Boy-style tile generator.")
+    sub = parser.add_subparsers(dest="command")
+
+    def add_color_args(p):
+        p.add_argument("--hue", type=float, default=0.0, help="hue shift, 0..1")
+        p.add_argument("--sat", type=float, default=1.0, help="saturation multiplier")
+        p.add_argument("--val", type=float, default=1.0, help="value multiplier")
+        p.add_argument("--size", type=int, default=16, choices=TILE_SIZES,
+                       help="tile size in pixels")
+
+    p = sub.add_parser("generate", help="generate a single tile PNG")
+    p.add_argument("word", help="dictionary word, e.g. grass")
+    p.add_argument("-p", "--pattern", default="solid")
+    add_color_args(p)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--scale", type=int, default=1, help="nearest-neighbour upscale factor")
+    p.add_argument("-o", "--output", default="tile.png")
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("export", help="export a sprite sheet of generated tiles")
+    p.add_argument("output")
+    p.add_argument("--words", nargs="+", default=None, help="default: every dictionary word")
+    p.add_argument("--patterns", nargs="+", default=None, help="default: every pattern")
+    add_color_args(p)
+    p.add_argument("--seeds", type=int, nargs="+", default=None)
+    p.add_argument("--columns", type=int, default=16)
+    p.add_argument("--processes", type=int, default=None)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("gameboyize", help="convert a PNG to the Game Boy palette")
+    p.add_argument("input")
+    p.add_argument("-o", "--output", default=None, help="default: overwrite input")
+    p.add_argument("--palette", default="classic",
+                   help="classic, dmg, gbc or comma-separated #rrggbb colors")
+    p.add_argument("--dither", default="none", choices=DITHER_MODES)
+    p.set_defaults(func=cmd_gameboyize)
+
+    p = sub.add_parser("gbtiles", help="convert a PNG map to Game Boy 2bpp tiles and a tilemap")
+    p.add_argument("input")
+    p.add_argument("-o", "--output", default=None,
+                   help="output path without extension (default: input's)")
+    p.add_argument("--tile-size", type=int, default=8, choices=TILE_SIZES,
+                   help="map tile size in pixels")
+    p.add_argument("--palette", default="dmg",
+                   help="at most 4 shades: dmg, gbc, classic or comma-separated #rrggbb colors")
+    p.add_argument("--dither", default="none", choices=DITHER_MODES)
+    p.add_argument("--gbc", action="store_true",
+                   help="also write GBC attributes (flips, bank 1) and a palette")
+    p.set_defaults(func=cmd_gbtiles)
+
+    p = sub.add_parser("gui", help="open the Tkinter editor (the default)")
+    p.set_defaults(func=cmd_gui)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        return cmd_gui(args)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,567 @@
+"""
+Map model: a tileset registry plus a compact grid of tile ids.
+
+The map stores one uint16 per cell instead of a PIL image per cell. Each
+distinct tile image is registered once in a TileRegistry and referred to by
+its small integer id; id 0 (EMPTY) is an empty cell. Whole-map operations
+(export, recoloring every tile) work on the id grid with array operations
+and touch each distinct tile only once.
+
+Tiles are interned by content: two images with the same pixels get the
+same id and share one canonical image object, so tile equality anywhere in
+the app is an integer comparison.
+
+Edits are batched in a MapEdit and applied to the grid together; map undo
+history (MapHistory) stores only the cells each edit changed.
+
+Nothing here imports tkinter.
+"""
+
+import hashlib
+import struct
+import zlib
+from collections import OrderedDict, deque
+
+import numpy as np
+from PIL import Image
+
+EMPTY = 0
+MAX_TILES = np.iinfo(np.uint16).max
+
+
+def tile_digest(tile_pil):
+    """
+    Content hash of a tile: mode, size and pixel bytes.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update("{}:{}x{}:".format(tile_pil.mode, *tile_pil.size).encode())
+    h.update(tile_pil.tobytes())
+    return h.digest()
+
+
+class TileRegistry:
+    """
+    The tileset: assigns each distinct tile a small integer id.
+
+    Tiles are interned by content hash, so identical pixels always get the
+    same id and the same canonical image, whichever route the tile came in
+    by. Looking up a canonical image is a dict hit on its object identity;
+    any other image is hashed once per call. Ids are never reused and
+    registered images are treated as read-only.
+    """
+
+    def __init__(self):
+        self._tiles = [None]    # id 0 is EMPTY
+        self._digests = [None]
+        self._by_digest = {}    # digest -> tile id
+        self._canonical = {}    # id(canonical image) -> tile id
+
+    def add(self, tile_pil):
+        """
+        Return the id of tile_pil's content, registering it first if it is new.
+        """
+        tile_id = self._canonical.get(id(tile_pil))
+        if tile_id is not None:
+            return tile_id
+        digest = tile_digest(tile_pil)
+        tile_id = self._by_digest.get(digest)
+        if tile_id is not None:
+            return tile_id
+        if len(self._tiles) > MAX_TILES:
+            raise ValueError("tileset is full ({} tiles)".format(MAX_TILES))
+        tile_id = len(self._tiles)
+        self._tiles.append(tile_pil)
+        self._digests.append(digest)
+        self._by_digest[digest] = tile_id
+        # Only canonical images are kept alive here, so their id() is stable.
+        self._canonical[id(tile_pil)] = tile_id
+        return tile_id
+
+    def intern(self, tile_pil):
+        """
+        The canonical image with tile_pil's pixels. Callers should keep
+        this one and drop their copy.
+        """
+        return self._tiles[self.add(tile_pil)]
+
+    def get(self, tile_id):
+        """
+        The image for tile_id, or None for EMPTY.
+        """
+        return self._tiles[tile_id]
+
+    def digest(self, tile_id):
+        """
+        The precomputed content hash of tile_id (None for EMPTY).
+        """
+        return self._digests[tile_id]
+
+    def __len__(self):
+        """
+        Number of ids handed out, counting EMPTY.
+        """
+        return len(self._tiles)
+
+
+def new_grid(width, height):
+    """
+    An empty height x width id grid.
+    """
+    return np.zeros((height, width), dtype=np.uint16)
+
+
+def fit_grid(grid, width, height):
+    """
+    grid cropped or padded with EMPTY to height x width, keeping its top
+    left corner. Returns (grid, cropped): cropped is True when cells
+    other than EMPTY fell outside. grid itself is returned if it fits.
+    """
+    if grid.shape == (height, width):
+        return grid, False
+    fitted = new_grid(width, height)
+    h, w = min(height, grid.shape[0]), min(width, grid.shape[1])
+    fitted[:h, :w] = grid[:h, :w]
+    cropped = bool(grid[h:].any() or grid[:h, w:].any())
+    return fitted, cropped
+
+
+def slice_image(img, tile_size, registry=None):
+    """
+    Cut an image whose sides are multiples of tile_size into tiles.
+    Returns (grid, registry): each distinct tile registered once (in a new
+    registry unless one is given) and the id grid. Fully transparent
+    tiles become EMPTY.
+    """
+    if img.width % tile_size or img.height % tile_size:
+        raise ValueError("{}x{} image is not a whole number of {} px tiles".format(
+            img.width, img.height, tile_size))
+    if registry is None:
+        registry = TileRegistry()
+    mode = "RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB"
+    pixels = np.asarray(img.convert(mode))
+    rows, cols = img.height // tile_size, img.width // tile_size
+    tiles = pixels.reshape(rows, tile_size, cols, tile_size, -1).swapaxes(1, 2)
+    distinct, index = np.unique(tiles.reshape(rows * cols, -1), axis=0, return_inverse=True)
+    lut = np.zeros(len(distinct), dtype=np.uint16)
+    for n, flat in enumerate(distinct):
+        tile = flat.reshape(tile_size, tile_size, -1)
+        if mode == "RGBA" and not tile[..., 3].any():
+            continue  # EMPTY
+        lut[n] = registry.add(Image.fromarray(tile, mode))
+    return lut[index.ravel()].reshape(rows, cols), registry
+
+
+def remap_tiles(grid, registry, func):
+    """
+    Replace every distinct tile on the grid with func(tile), calling func
+    once per distinct tile rather than once per cell. Returns the new grid.
+    """
+    lut = np.arange(len(registry), dtype=np.uint16)
+    for tile_id in np.unique(grid):
+        if tile_id != EMPTY:
+            lut[tile_id] = registry.add(func(registry.get(tile_id)))
+    return lut[grid]
+
+
+def flood_fill(grid, x, y, contiguous=True, max_cells=None):
+    """
+    Cells holding the same value as (x, y): the 4-connected region around
+    it, or every such cell on the grid when contiguous is False. Returns
+    (ys, xs) arrays, or None if the region has more than max_cells cells.
+
+    Works on scanline spans rather than cells: each horizontal run of
+    matching cells is one node, runs that touch vertically are joined
+    (hooking with pointer jumping, all as array operations), and the
+    region is the set of runs joined to the one under (x, y).
+    """
+    match = grid == grid[y, x]
+    if contiguous:
+        h, w = grid.shape
+        starts = match.copy()
+        starts[:, 1:] &= ~match[:, :-1]
+        runs = np.cumsum(starts.ravel()).reshape(h, w) * match  # 0 = no run
+        # Pairs of runs touching vertically; consecutive repeats dropped.
+        touching = match[:-1] & match[1:]
+        a, b = runs[:-1][touching], runs[1:][touching]
+        new_pair = np.ones(len(a), dtype=bool)
+        new_pair[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+        a, b = a[new_pair], b[new_pair]
+        parent = np.arange(int(runs.max()) + 1)
+        while True:
+            pa, pb = parent[a], parent[b]
+            if (pa == pb).all():
+                break
+            low = np.minimum(pa, pb)
+            np.minimum.at(parent, pa, low)
+            np.minimum.at(parent, pb, low)
+            while True:
+                grand = parent[parent]
+                if (grand == parent).all():
+                    break
+                parent = grand
+        roots = parent[runs]
+        match &= roots == roots[y, x]
+    if max_cells is not None and np.count_nonzero(match) > max_cells:
+        return None
+    return np.nonzero(match)
+
+
+class TilePixels:
+    """
+    RGBA pixel arrays of registered tiles at one display size, converted on
+    first use. Tiles of another size are scaled (nearest neighbour up, box
+    filter down). With max_bytes set, the least recently used arrays are
+    dropped once the cache grows past it. EMPTY cells show `empty` (an RGBA
+    array of the display size) or are fully transparent.
+    """
+
+    def __init__(self, registry, tile_size, max_bytes=None, empty=None):
+        self.registry = registry
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        if empty is None:
+            empty = np.zeros((tile_size, tile_size, 4), dtype=np.uint8)
+        self.empty = empty
+        self._cache = OrderedDict()  # tile id -> array
+        self.nbytes = 0
+
+    def get(self, tile_id):
+        """
+        The (tile_size, tile_size, 4) uint8 array for tile_id.
+        """
+        if tile_id == EMPTY:
+            return self.empty
+        pixels = self._cache.get(tile_id)
+        if pixels is not None:
+            self._cache.move_to_end(tile_id)
+            return pixels
+        tile = self.registry.get(tile_id).convert("RGBA")
+        size = self.tile_size
+        if tile.size != (size, size):
+            resample = Image.NEAREST if size > tile.width else Image.BOX
+            tile = tile.resize((size, size), resample)
+        pixels = np.asarray(tile)
+        self._cache[tile_id] = pixels
+        self.nbytes += pixels.nbytes
+        if self.max_bytes is not None:
+            while self.nbytes > self.max_bytes and len(self._cache) > 1:
+                self.nbytes -= self._cache.popitem(last=False)[1].nbytes
+        return pixels
+
+    def compose(self, block):
+        """
+        Pixels of a block of the id grid, as an (h*tile_size, w*tile_size, 4)
+        array, built one row of cells at a time.
+        """
+        rows, cols = block.shape
+        size = self.tile_size
+        ids, index = np.unique(block, return_inverse=True)
+        index = index.reshape(block.shape)
+        stack = np.stack([self.get(int(tile_id)) for tile_id in ids])
+        out = np.empty((rows * size, cols * size, 4), dtype=np.uint8)
+        for r in range(rows):
+            strip = stack[index[r]]  # (cols, size, size, 4)
+            out[r*size:(r+1)*size] = strip.swapaxes(0, 1).reshape(size, -1, 4)
+        return out
+
+
+def render_map(grid, registry, tile_size):
+    """
+    The whole map as an RGBA image; empty cells are transparent.
+    """
+    return Image.fromarray(TilePixels(registry, tile_size).compose(grid), "RGBA")
+
+
+EXPORT_BAND_BYTES = 4 * 1024 * 1024  # RGBA pixels composed per band when exporting
+
+
+def _png_chunk(f, kind, data):
+    f.write(struct.pack(">I", len(data)))
+    f.write(kind)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+
+def export_map_png(path, grid, registry, tile_size, compress_level=6, progress=None):
+    """
+    Write the whole map to path as an RGBA PNG (like render_map) without
+    holding the whole image: bands of tile rows are composed, compressed
+    and written one after another, so memory stays at one band plus one
+    converted array per distinct tile, whatever the map size.
+
+    progress(done, total) is called after each band with tile rows done.
+    """
+    rows, cols = grid.shape
+    width = cols * tile_size
+    band_rows = max(1, EXPORT_BAND_BYTES // (tile_size * width * 4))
+    pixels = TilePixels(registry, tile_size)
+    # Each scanline is a filter-type byte (0, none) then the RGBA pixels.
+    scanlines = np.zeros((band_rows * tile_size, 1 + width * 4), dtype=np.uint8)
+    packer = zlib.compressobj(compress_level)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        _png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, rows * tile_size, 8, 6, 0, 0, 0))
+        for top in range(0, rows, band_rows):
+            band = pixels.compose(grid[top:top + band_rows])
+            n = len(band)
+            scanlines[:n, 1:] = band.reshape(n, -1)
+            data = packer.compress(scanlines[:n])
+            if data:
+                _png_chunk(f, b"IDAT", data)
+            if progress is not None:
+                progress(min(top + band_rows, rows), rows)
+        _png_chunk(f, b"IDAT", packer.flush())
+        _png_chunk(f, b"IEND", b"")
+
+
+def _last_writes(ys, xs):
+    """
+    Indices of the last write to each distinct (y, x) cell.
+    """
+    key = (ys.astype(np.int64) << 32) | xs.astype(np.int64)
+    if (key[1:] > key[:-1]).all():
+        return np.arange(len(key))  # already distinct (e.g. a fill region)
+    _, last = np.unique(key[::-1], return_index=True)
+    return len(key) - 1 - last
+
+
+class MapEdit:
+    """
+    A batch of cell writes to an id grid, applied together by apply().
+    Writes to the same cell are deduplicated; the last one wins.
+    """
+
+    def __init__(self):
+        self._ys, self._xs, self._ids = [], [], []  # single writes not yet batched
+        self._batches = []  # (ys, xs, ids) arrays, in write order
+
+    def __len__(self):
+        return len(self._ys) + sum(len(b[0]) for b in self._batches)
+
+    def set(self, y, x, tile_id):
+        self._ys.append(y)
+        self._xs.append(x)
+        self._ids.append(tile_id)
+
+    def set_cells(self, ys, xs, tile_ids):
+        """
+        Write arrays of cells; tile_ids is an array or one id for all of them.
+        """
+        self._pack()
+        ys = np.asarray(ys, dtype=np.int32)
+        self._batches.append((ys, np.asarray(xs, dtype=np.int32),
+                              np.broadcast_to(np.asarray(tile_ids, dtype=np.uint16), ys.shape)))
+
+    def _pack(self):
+        if self._ys:
+            self._batches.append((np.array(self._ys, dtype=np.int32),
+                                  np.array(self._xs, dtype=np.int32),
+                                  np.array(self._ids, dtype=np.uint16)))
+            self._ys, self._xs, self._ids = [], [], []
+
+    def apply(self, grid):
+        """
+        Write the batch into grid and empty it. Returns ys, xs, old and new
+        ids of the cells whose value actually changed.
+        """
+        self._pack()
+        if not self._batches:
+            empty = np.zeros(0, dtype=np.int32)
+            return empty, empty, grid[empty, empty], grid[empty, empty]
+        ys, xs, ids = (np.concatenate(parts) for parts in zip(*self._batches))
+        self._batches = []
+        last = _last_writes(ys, xs)
+        ys, xs, ids = ys[last], xs[last], ids[last]
+        old = grid[ys, xs]
+        changed = old != ids
+        ys, xs, old, new = ys[changed], xs[changed], old[changed], ids[changed]
+        grid[ys, xs] = new
+        return ys, xs, old, new
+
+
+DEFAULT_HISTORY_BYTES = 32 * 1024 * 1024
+
+
+class CellDiff:
+    """
+    One undo step that changed individual cells: for each (ys[k], xs[k])
+    the value went from old[k] to new[k]. Values are tile ids on the map
+    or RGB triples in the tile editor.
+
+    The cells are stored as horizontal runs (row, first column, length),
+    so a filled area costs a few bytes per row instead of per cell.
+    """
+
+    def __init__(self, ys, xs, old, new):
+        key = (ys.astype(np.int64) << 32) | xs.astype(np.int64)
+        order = np.arange(len(ys)) if (key[1:] >= key[:-1]).all() else np.lexsort((xs, ys))
+        ys, xs = ys[order], xs[order]
+        starts = np.ones(len(ys), dtype=bool)
+        starts[1:] = (ys[1:] != ys[:-1]) | (xs[1:] != xs[:-1] + 1)
+        first = np.flatnonzero(starts)
+        self.run_y = ys[first].astype(np.int32)
+        self.run_x = xs[first].astype(np.int32)
+        self.run_len = np.diff(np.append(first, len(ys))).astype(np.int32)
+        self.old = old[order]
+        self.new = new[order]
+
+    @property
+    def ys(self):
+        return np.repeat(self.run_y, self.run_len)
+
+    @property
+    def xs(self):
+        # Column of each cell: its run's first column plus its offset in the run.
+        run_start = np.cumsum(self.run_len) - self.run_len
+        return np.repeat(self.run_x - run_start, self.run_len) + np.arange(len(self.old))
+
+    @property
+    def nbytes(self):
+        return (self.run_y.nbytes + self.run_x.nbytes + self.run_len.nbytes
+                + self.old.nbytes + self.new.nbytes)
+
+
+class GridSwap:
+    """
+    One undo step that replaced the whole grid (a map resize), with the
+    tile size before and after.
+    """
+
+    def __init__(self, old, old_tile_size, new, new_tile_size):
+        self.old = old
+        self.old_tile_size = old_tile_size
+        self.new = new
+        self.new_tile_size = new_tile_size
+
+    @property
+    def nbytes(self):
+        return self.old.nbytes + self.new.nbytes
+
+
+class MapHistory:
+    """
+    Undo/redo for a 2-D grid of values, stored as diffs of the cells that
+    changed. The map uses it for tile ids; the tile editor for RGB pixels
+    (dtype=np.uint8, three values per cell).
+
+    Edits report every cell they change with touch() (or touch_cells() for
+    arrays); commit() turns the cells touched since the last commit into
+    one CellDiff. Steps are kept
+    until their total size exceeds max_bytes, then the oldest undo steps
+    are dropped first (the newest one is always kept).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_HISTORY_BYTES, dtype=np.uint16):
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.nbytes = 0
+        self._pending = {}  # (y, x) -> [value before the first change, latest value]
+        self._batches = []  # (ys, xs, old, new) from touch_cells, after _pending
+
+    @property
+    def pending(self):
+        return bool(self._pending or self._batches)
+
+    def touch(self, y, x, old, new):
+        """
+        Note that cell (x, y) is changing from old to new.
+        """
+        change = self._pending.get((y, x))
+        if change is None:
+            self._pending[(y, x)] = [old, new]
+        else:
+            change[1] = new
+
+    def touch_cells(self, ys, xs, old, new):
+        """
+        touch() for arrays of cells.
+        """
+        if len(ys) == 0:
+            return
+        self._pack()
+        self._batches.append((np.asarray(ys, dtype=np.int32), np.asarray(xs, dtype=np.int32),
+                              np.asarray(old, dtype=self.dtype), np.asarray(new, dtype=self.dtype)))
+
+    def _pack(self):
+        if self._pending:
+            cells = np.array(list(self._pending.keys()), dtype=np.int32).reshape(-1, 2)
+            changes = np.array(list(self._pending.values()), dtype=self.dtype)
+            self._pending.clear()
+            self._batches.append((cells[:, 0], cells[:, 1], changes[:, 0], changes[:, 1]))
+
+    def commit(self):
+        """
+        Record the cells touched since the last commit as one undo step.
+        Cells that ended up back at their old value are left out.
+        """
+        self._pack()
+        if not self._batches:
+            return
+        if len(self._batches) == 1:
+            ys, xs, old, new = self._batches[0]
+        else:
+            # A cell touched several times goes from its first old value
+            # to its last new one.
+            ys, xs, old, new = (np.concatenate(parts) for parts in zip(*self._batches))
+            key = (ys.astype(np.int64) << 32) | xs.astype(np.int64)
+            _, first = np.unique(key, return_index=True)
+            last = _last_writes(ys, xs)
+            ys, xs, old, new = ys[first], xs[first], old[first], new[last]
+        self._batches = []
+        self.record(ys, xs, old, new)
+
+    def record(self, ys, xs, old, new):
+        """
+        Record a cell diff directly (for edits that already have arrays).
+        """
+        old = np.asarray(old, dtype=self.dtype)
+        new = np.asarray(new, dtype=self.dtype)
+        if len(old) == 0:
+            return
+        changed = (old != new).reshape(len(old), -1).any(axis=1)
+        if not changed.any():
+            return
+        self._push(CellDiff(np.asarray(ys, dtype=np.int32)[changed],
+                            np.asarray(xs, dtype=np.int32)[changed],
+                            old[changed], new[changed]))
+
+    def record_swap(self, old, old_tile_size, new, new_tile_size):
+        self._push(GridSwap(old, old_tile_size, new.copy(), new_tile_size))
+
+    def _push(self, step):
+        self.undo_steps.append(step)
+        self.nbytes += step.nbytes
+        for dropped in self.redo_steps:
+            self.nbytes -= dropped.nbytes
+        self.redo_steps.clear()
+        while self.nbytes > self.max_bytes and len(self.undo_steps) > 1:
+            self.nbytes -= self.undo_steps.popleft().nbytes
+
+    def undo(self):
+        """
+        Pop the newest step for the caller to revert, or None.
+        """
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+        return step
+
+    def redo(self):
+        """
+        Pop the most recently undone step for the caller to reapply, or None.
+        """
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        return step
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self._pending.clear()
+        self._batches = []
+        self.nbytes = 0